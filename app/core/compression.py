@@ -0,0 +1,282 @@
+# app/core/compression.py
+"""
+Middleware ASGI de compresie cu negociere zstd / br / gzip.
+
+- alege encodarea după Accept-Encoding (q-values) și preferința serverului: zstd > br > gzip;
+- nivel de compresie per content-type (NDJSON/CSV streamed → nivel mic, JSON → mediu);
+- comprimă streamed: compresorul primește fiecare body message, dar flush-ul de bloc se face
+  doar după COMPRESSION_FLUSH_BYTES octeți necomprimați (și la final) – un flush per rând
+  NDJSON ar strica ratio-ul de 3–15×; memoria rămâne plafonată la fereastra compresorului;
+- ETag-ul unui răspuns comprimat devine slab (W/"…"): reprezentarea diferă pe octet de cea
+  necomprimată, dar If-None-Match (comparație slabă) continuă să producă 304;
+- sare peste payload-uri deja comprimate (Content-Encoding setat, PDF, imagini, zip, parquet);
+- răspunsurile mici (sub `minimum_size` în total, chiar dacă vin în mai multe body messages,
+  ca prin BaseHTTPMiddleware; inclusiv HEAD) pleacă necomprimate.
+
+zstandard și brotli sunt opționale; gzip (zlib) e mereu disponibil.
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:  # opțional
+    import zstandard as _zstd
+except Exception:  # pragma: no cover
+    _zstd = None  # type: ignore[assignment]
+
+try:  # opțional (pachetul `brotli`)
+    import brotli as _brotli
+except Exception:  # pragma: no cover
+    _brotli = None  # type: ignore[assignment]
+
+Scope = dict
+Message = dict
+Receive = Callable
+Send = Callable
+
+# Nivele implicite per encodare; suprascrie cu COMPRESSION_{ZSTD,BR,GZIP}_LEVEL
+DEFAULT_LEVELS: Dict[str, int] = {
+    "zstd": int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3")),
+    "br": int(os.getenv("COMPRESSION_BR_LEVEL", "4")),
+    "gzip": int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+}
+
+# Nivele per content-type (exporturile streamed preferă CPU mic, JSON-ul mic → ratio mai bun)
+TYPE_LEVELS: Dict[str, Dict[str, int]] = {
+    "application/x-ndjson": {"zstd": 1, "br": 2, "gzip": 4},
+    "text/csv": {"zstd": 3, "br": 4, "gzip": 5},
+    "application/vnd.apache.arrow.stream": {"zstd": 1, "br": 2, "gzip": 4},
+    "application/json": {"zstd": 3, "br": 5, "gzip": 6},
+}
+
+# Tipuri deja comprimate sau pentru care compresia nu ajută / strică semantica
+SKIP_TYPES = {
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/zstd",
+    "application/x-7z-compressed",
+    "application/vnd.apache.parquet",
+    "text/event-stream",
+}
+SKIP_PREFIXES = ("image/", "audio/", "video/")
+
+SERVER_PREFERENCE: Tuple[str, ...] = ("zstd", "br", "gzip")
+
+# octeți necomprimați acumulați în compresor înainte de un flush de bloc (latență vs. ratio)
+FLUSH_BYTES = int(os.getenv("COMPRESSION_FLUSH_BYTES", "65536"))
+
+
+def available_encodings() -> List[str]:
+    out = []
+    if _zstd is not None:
+        out.append("zstd")
+    if _brotli is not None:
+        out.append("br")
+    out.append("gzip")
+    return out
+
+
+def _parse_accept_encoding(value: str) -> Dict[str, float]:
+    prefs: Dict[str, float] = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        prefs[name.strip().lower()] = q
+    return prefs
+
+
+def choose_encoding(accept_encoding: str, enabled: Tuple[str, ...]) -> Optional[str]:
+    prefs = _parse_accept_encoding(accept_encoding)
+    star = prefs.get("*")
+    best: Optional[str] = None
+    best_q = 0.0
+    for enc in enabled:
+        q = prefs.get(enc, star if star is not None else 0.0)
+        # la q egal câștigă ordinea serverului (enabled e deja ordonat)
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+class _Encoder:
+    """Interfață comună: compress(chunk), flush() (de bloc, stream-ul continuă) și finish()."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._c = _zstd.ZstdCompressor(level=level).compressobj()
+        elif encoding == "br":
+            self._c = _brotli.Compressor(quality=max(0, min(11, level)))
+        else:
+            self._c = zlib.compressobj(max(1, min(9, level)), zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data)
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "zstd":
+            return self._c.flush(_zstd.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self._c.flush()
+        return self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "zstd":
+            return self._c.compress(data) + self._c.flush()
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.finish()
+        return self._c.compress(data) + self._c.flush()
+
+
+def _level_for(content_type: str, encoding: str) -> int:
+    base = content_type.split(";", 1)[0].strip().lower()
+    return TYPE_LEVELS.get(base, {}).get(encoding, DEFAULT_LEVELS[encoding])
+
+
+def _should_skip(content_type: str) -> bool:
+    base = content_type.split(";", 1)[0].strip().lower()
+    return base in SKIP_TYPES or base.startswith(SKIP_PREFIXES)
+
+
+class CompressionMiddleware:
+    """
+    Înlocuiește GZipMiddleware. Utilizare:
+        app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, encodings: Optional[List[str]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        allowed = set(encodings or available_encodings()) & set(available_encodings())
+        self.encodings: Tuple[str, ...] = tuple(e for e in SERVER_PREFERENCE if e in allowed)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for k, v in scope.get("headers") or []:
+            if k == b"accept-encoding":
+                accept = v.decode("latin-1")
+                break
+        encoding = choose_encoding(accept, self.encodings) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+
+def _weak_etag(value: bytes) -> bytes:
+    return value if value.startswith(b"W/") else b"W/" + value
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int, flush_bytes: int = FLUSH_BYTES):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.flush_bytes = flush_bytes
+        self.pending = 0  # octeți necomprimați de la ultimul flush
+        self.head = bytearray()  # body-ul reținut până decidem (sub minimum_size)
+        self.start: Optional[Message] = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    def _headers(self) -> List[Tuple[bytes, bytes]]:
+        return list(self.start.get("headers") or []) if self.start else []
+
+    async def __call__(self, message: Message) -> None:
+        mtype = message["type"]
+
+        if mtype == "http.response.start":
+            self.start = message
+            headers = {k.lower(): v for k, v in self._headers()}
+            status = message.get("status", 200)
+            ctype = headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                b"content-encoding" in headers
+                or status in (204, 304)
+                or status < 200
+                or _should_skip(ctype)
+            ):
+                self.passthrough = True
+                await self.send(message)
+            return
+
+        if mtype != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more = message.get("more_body", False)
+
+        if self.encoder is None:
+            # reținem începutul body-ului până la minimum_size: abia atunci știm dacă merită comprimat
+            self.head += body
+            if len(self.head) < self.minimum_size:
+                if more:
+                    return
+                self.passthrough = True
+                await self.send(self._with_vary(self.start))
+                await self.send({"type": "http.response.body", "body": bytes(self.head), "more_body": False})
+                return
+            body, self.head = bytes(self.head), bytearray()
+
+            headers = {k.lower(): v for k, v in self._headers()}
+            ctype = headers.get(b"content-type", b"").decode("latin-1")
+            self.encoder = _Encoder(self.encoding, _level_for(ctype, self.encoding))
+
+            new_headers = [
+                (k, _weak_etag(v) if k.lower() == b"etag" else v)
+                for (k, v) in self._headers()
+                if k.lower() != b"content-length"
+            ]
+            new_headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+            start = dict(self.start)
+            start["headers"] = new_headers
+            await self.send(self._with_vary(start))
+
+        if more:
+            chunk = self.encoder.compress(body)
+            self.pending += len(body)
+            if self.pending >= self.flush_bytes:
+                chunk += self.encoder.flush()
+                self.pending = 0
+            if chunk:
+                await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.encoder.finish(body), "more_body": False})
+
+    @staticmethod
+    def _with_vary(start: Message) -> Message:
+        headers = list(start.get("headers") or [])
+        for i, (k, v) in enumerate(headers):
+            if k.lower() == b"vary":
+                if b"accept-encoding" not in v.lower():
+                    headers[i] = (k, v + b", Accept-Encoding")
+                break
+        else:
+            headers.append((b"vary", b"Accept-Encoding"))
+        out = dict(start)
+        out["headers"] = headers
+        return out
+
+
+__all__ = ["CompressionMiddleware", "available_encodings", "choose_encoding"]
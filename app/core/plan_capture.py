@@ -0,0 +1,210 @@
+# app/core/plan_capture.py
+"""
+Captură automată de planuri pentru interogările lente ale aplicației (opt-in).
+
+Când QUERY_PLAN_CAPTURE=1, orice interogare executată într-un request HTTP care durează
+peste QUERY_PLAN_MIN_MS este, cu probabilitatea QUERY_PLAN_SAMPLE, pusă într-o coadă
+mărginită. Un thread de fundal rulează EXPLAIN pe același text SQL + aceiași parametri
+și salvează planul în app.query_plans, cheie (fingerprint, rută) – ultima captură câștigă.
+
+- implicit EXPLAIN (VERBOSE, FORMAT JSON): nu re-execută interogarea;
+- QUERY_PLAN_ANALYZE=1 → EXPLAIN (ANALYZE, BUFFERS) doar pentru SELECT-uri, într-o
+  tranzacție READ ONLY cu statement_timeout propriu (QUERY_PLAN_TIMEOUT_MS), apoi rollback;
+- queryid vine din "Query Identifier" (PG14+, compute_query_id activ odată cu
+  pg_stat_statements) → se poate corela cu /observability/top-queries;
+- aceeași (interogare, rută) nu e recapturată mai des de QUERY_PLAN_COOLDOWN_S;
+- tabela e ținută sub QUERY_PLAN_MAX_ROWS (cele mai vechi capturi se șterg).
+
+EXPLAIN-ul rulează pe engine-ul primar (și pentru interogările servite de replici).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app.core import request_metrics, session_stats
+
+logger = logging.getLogger("emag-db-api.plan_capture")
+
+ENABLED = os.getenv("QUERY_PLAN_CAPTURE", "0").strip().lower() in {"1", "true", "yes", "on"}
+MIN_MS = float(os.getenv("QUERY_PLAN_MIN_MS", "200"))
+SAMPLE = float(os.getenv("QUERY_PLAN_SAMPLE", "0.2"))
+ANALYZE = os.getenv("QUERY_PLAN_ANALYZE", "0").strip().lower() in {"1", "true", "yes", "on"}
+TIMEOUT_MS = int(os.getenv("QUERY_PLAN_TIMEOUT_MS", "5000"))
+COOLDOWN_S = float(os.getenv("QUERY_PLAN_COOLDOWN_S", "600"))
+MAX_ROWS = int(os.getenv("QUERY_PLAN_MAX_ROWS", "500"))
+QUEUE_SIZE = int(os.getenv("QUERY_PLAN_QUEUE", "100"))
+SCHEMA = os.getenv("DB_SCHEMA", "app")
+
+_T0_KEY = "plan_capture_t0"
+# doar interogări de date; EXPLAIN-urile proprii și tabela de planuri sunt excluse
+_EXPLAINABLE_RX = re.compile(r"^\s*(?:select|with|insert|update|delete)\b", re.I)
+_READ_ONLY_RX = re.compile(r"^\s*select\b", re.I)
+_SELF_RX = re.compile(r"\bquery_plans\b", re.I)
+
+_UPSERT_SQL = text(f"""
+INSERT INTO "{SCHEMA}".query_plans
+  (fingerprint, route, queryid, query, duration_ms, analyzed, plan, captures, captured_at)
+VALUES
+  (:fingerprint, :route, :queryid, :query, :duration_ms, :analyzed, CAST(:plan AS jsonb), 1, now())
+ON CONFLICT (fingerprint, route) DO UPDATE
+   SET queryid     = coalesce(EXCLUDED.queryid, query_plans.queryid),
+       duration_ms = EXCLUDED.duration_ms,
+       analyzed    = EXCLUDED.analyzed,
+       plan        = EXCLUDED.plan,
+       captures    = query_plans.captures + 1,
+       captured_at = EXCLUDED.captured_at
+""")
+_PRUNE_SQL = text(f"""
+DELETE FROM "{SCHEMA}".query_plans
+ WHERE id IN (SELECT id FROM "{SCHEMA}".query_plans ORDER BY captured_at DESC OFFSET :keep)
+""")
+
+
+class _Job(NamedTuple):
+    statement: str
+    parameters: Any
+    route: str
+    duration_ms: float
+
+
+_queue: "queue.Queue[_Job]" = queue.Queue(maxsize=max(1, QUEUE_SIZE))
+_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+# (fingerprint, route) -> monotonic-ul ultimei programări
+_last: Dict[Tuple[str, str], float] = {}
+_stats = {"queued": 0, "captured": 0, "dropped": 0, "errors": 0}
+
+
+def fingerprint(statement: str) -> str:
+    # textul de la driver are deja placeholder-e în loc de valori → e „normalizat”
+    return hashlib.sha1(" ".join(statement.split()).encode()).hexdigest()[:16]
+
+
+def _schedule(statement: str, parameters: Any, duration_ms: float) -> None:
+    m = request_metrics.current()
+    route = session_stats.route_label(m.request if m is not None else None)
+    key = (fingerprint(statement), route)
+    now = time.monotonic()
+    with _lock:
+        last = _last.get(key)
+        if last is not None and now - last < COOLDOWN_S:
+            return
+        _last[key] = now
+        if len(_last) > 10_000:
+            _last.clear()
+    try:
+        _queue.put_nowait(_Job(statement, parameters, route, duration_ms))
+    except queue.Full:
+        _stats["dropped"] += 1
+        return
+    _stats["queued"] += 1
+    _ensure_worker()
+
+
+def _ensure_worker() -> None:
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="plan-capture", daemon=True)
+            _worker.start()
+
+
+def _explain(conn, job: _Job, analyze: bool) -> Any:
+    opts = "ANALYZE, BUFFERS, VERBOSE, FORMAT JSON" if analyze else "VERBOSE, FORMAT JSON"
+    if analyze:
+        conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(TIMEOUT_MS)}")
+    raw = conn.exec_driver_sql(f"EXPLAIN ({opts}) {job.statement}", job.parameters or ()).scalar()
+    return json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+
+
+def _capture(job: _Job) -> None:
+    from app.database import engine  # import lazy (database.py importă acest modul)
+
+    analyze = ANALYZE and bool(_READ_ONLY_RX.match(job.statement))
+    with engine.connect() as conn:
+        try:
+            plan = _explain(conn, job, analyze)
+        finally:
+            conn.rollback()  # ANALYZE rulează într-o tranzacție care nu se păstrează
+        queryid = plan[0].get("Query Identifier") if plan else None
+        conn.execute(
+            _UPSERT_SQL,
+            {
+                "fingerprint": fingerprint(job.statement),
+                "route": job.route,
+                "queryid": queryid,
+                "query": job.statement,
+                "duration_ms": round(job.duration_ms, 3),
+                "analyzed": analyze,
+                "plan": json.dumps(plan),
+            },
+        )
+        conn.execute(_PRUNE_SQL, {"keep": MAX_ROWS})
+        conn.commit()
+
+
+def _run() -> None:
+    while True:
+        job = _queue.get()
+        try:
+            _capture(job)
+            _stats["captured"] += 1
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.warning("EXPLAIN eșuat pentru %s (%.0fms): %s", job.route, job.duration_ms, e)
+        finally:
+            _queue.task_done()
+
+
+def attach(eng: Engine) -> None:
+    """Măsoară interogările din request-uri și programează EXPLAIN pentru cele lente."""
+    if not ENABLED:
+        return
+
+    @event.listens_for(eng, "before_cursor_execute")
+    def _before(conn, _cursor, _statement, _parameters, _context, executemany) -> None:
+        if not executemany and request_metrics.current() is not None:
+            conn.info[_T0_KEY] = time.perf_counter()
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _after(conn, _cursor, statement, parameters, _context, executemany) -> None:
+        t0 = conn.info.pop(_T0_KEY, None)
+        if t0 is None or executemany:
+            return
+        ms = (time.perf_counter() - t0) * 1000.0
+        if ms < MIN_MS or random.random() >= SAMPLE:
+            return
+        if not _EXPLAINABLE_RX.match(statement) or _SELF_RX.search(statement):
+            return
+        _schedule(statement, parameters, ms)
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "enabled": ENABLED,
+        "min_ms": MIN_MS,
+        "sample": SAMPLE,
+        "analyze": ANALYZE,
+        "cooldown_s": COOLDOWN_S,
+        "max_rows": MAX_ROWS,
+        "queue_depth": _queue.qsize(),
+        **_stats,
+    }
+
+
+__all__ = ["attach", "fingerprint", "stats"]
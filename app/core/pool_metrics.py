@@ -0,0 +1,196 @@
+# app/core/pool_metrics.py
+"""
+Instrumentare pentru pool-ul de conexiuni SQLAlchemy (per engine).
+
+- timpul de așteptare la checkout (histogramă pe bucket-uri ms + sum/max);
+- timeout-uri de pool (QueuePool → sqlalchemy.exc.TimeoutError);
+- gauge-uri: size / checked_out / overflow / checked_in (citite live din pool);
+- conexiuni ținute mai mult de DB_POOL_LEAK_THRESHOLD_S, cu ruta care le ține
+  (ruta vine dintr-un contextvar setat de middleware).
+
+Checkout-ul nu are event „before wait” în SQLAlchemy, așa că măsurăm în `_do_get`
+al unei subclase de QueuePool / AsyncAdaptedQueuePool (creată per engine).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+logger = logging.getLogger("emag-db-api.db.pool")
+
+LEAK_THRESHOLD_S = float(os.getenv("DB_POOL_LEAK_THRESHOLD_S", "30"))
+# limite superioare (ms) pentru histogramă; ultimul bucket e +Inf
+WAIT_BUCKETS_MS: Tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# ruta curentă (METHOD path), setată de middleware-ul HTTP
+_current_route: ContextVar[Optional[str]] = ContextVar("db_pool_route", default=None)
+
+
+def set_current_route(route: Optional[str]):
+    return _current_route.set(route)
+
+
+def reset_current_route(token) -> None:
+    _current_route.reset(token)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.wait_buckets: List[int] = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_count = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.timeouts = 0
+        self.long_held = 0
+        # id(connection record) -> (t0 monotonic, route)
+        self.held: Dict[int, Tuple[float, Optional[str]]] = {}
+        self._pool_getter: Optional[Callable[[], Pool]] = None
+
+    def observe_wait(self, ms: float, *, timed_out: bool) -> None:
+        with self._lock:
+            self.wait_buckets[bisect_left(WAIT_BUCKETS_MS, ms)] += 1
+            self.wait_count += 1
+            self.wait_sum_ms += ms
+            if ms > self.wait_max_ms:
+                self.wait_max_ms = ms
+            if timed_out:
+                self.timeouts += 1
+        if timed_out:
+            logger.warning(
+                "Pool %s: timeout la checkout după %.0fms (route=%s)", self.name, ms, _current_route.get()
+            )
+
+    def on_checkout(self, rec_id: int) -> None:
+        with self._lock:
+            self.held[rec_id] = (time.monotonic(), _current_route.get())
+
+    def on_checkin(self, rec_id: int) -> None:
+        with self._lock:
+            item = self.held.pop(rec_id, None)
+        if item is None:
+            return
+        held_s = time.monotonic() - item[0]
+        if held_s >= LEAK_THRESHOLD_S:
+            with self._lock:
+                self.long_held += 1
+            logger.warning(
+                "Pool %s: conexiune ținută %.1fs (prag %.0fs) de route=%s", self.name, held_s, LEAK_THRESHOLD_S, item[1]
+            )
+
+    def _gauges(self) -> Dict[str, Any]:
+        pool = self._pool_getter() if self._pool_getter else None
+        if pool is None:
+            return {}
+        out: Dict[str, Any] = {"pool_class": type(pool).__name__}
+        for key, attr in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"), ("checked_in", "checkedin")):
+            fn = getattr(pool, attr, None)
+            if callable(fn):
+                try:
+                    out[key] = fn()
+                except Exception:
+                    pass
+        max_overflow = getattr(pool, "_max_overflow", None)
+        if isinstance(out.get("size"), int) and isinstance(max_overflow, int) and max_overflow >= 0:
+            capacity = out["size"] + max_overflow
+            out["capacity"] = capacity
+            if capacity and isinstance(out.get("checked_out"), int):
+                out["saturation"] = round(out["checked_out"] / capacity, 3)
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            buckets = list(self.wait_buckets)
+            held = sorted(((now - t0, route) for (t0, route) in self.held.values()), reverse=True)
+            data = {
+                "name": self.name,
+                "checkout_wait": {
+                    "count": self.wait_count,
+                    "sum_ms": round(self.wait_sum_ms, 3),
+                    "avg_ms": round(self.wait_sum_ms / self.wait_count, 3) if self.wait_count else None,
+                    "max_ms": round(self.wait_max_ms, 3),
+                    # cumulative, ca la Prometheus (le = „less or equal”)
+                    "buckets": [
+                        {"le": le, "count": sum(buckets[: i + 1])}
+                        for i, le in enumerate(list(WAIT_BUCKETS_MS) + ["+Inf"])
+                    ],
+                },
+                "timeouts": self.timeouts,
+                "long_held_total": self.long_held,
+            }
+        data["gauges"] = self._gauges()
+        data["leak_threshold_s"] = LEAK_THRESHOLD_S
+        data["held_over_threshold"] = [
+            {"held_s": round(s, 2), "route": r} for (s, r) in held if s >= LEAK_THRESHOLD_S
+        ]
+        data["oldest_held_s"] = round(held[0][0], 2) if held else None
+        return data
+
+
+_REGISTRY: Dict[str, PoolMetrics] = {}
+
+
+def metrics_for(name: str) -> PoolMetrics:
+    m = _REGISTRY.get(name)
+    if m is None:
+        m = _REGISTRY[name] = PoolMetrics(name)
+    return m
+
+
+def instrumented_pool_class(name: str, base: Type[Pool]) -> Type[Pool]:
+    """
+    Subclasă a pool-ului `base` care cronometrează `_do_get` (așteptare + eventual connect).
+    Metricile stau pe clasă → supraviețuiesc pool.recreate() (dispose / invalidate).
+    """
+    metrics = metrics_for(name)
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        timed_out = False
+        try:
+            return base._do_get(self)
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            metrics.observe_wait((time.perf_counter() - t0) * 1000, timed_out=timed_out)
+
+    return type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get, "_metrics": metrics})
+
+
+def attach(engine: Engine, name: str) -> None:
+    """Leagă event-urile checkout/checkin ale engine-ului (sync sau `.sync_engine`) de metrici."""
+    metrics = metrics_for(name)
+    metrics._pool_getter = lambda: engine.pool
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(_dbapi_conn, record, _proxy):
+        metrics.on_checkout(id(record))
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(_dbapi_conn, record):
+        metrics.on_checkin(id(record))
+
+
+def all_pool_stats() -> List[Dict[str, Any]]:
+    return [m.snapshot() for m in _REGISTRY.values()]
+
+
+__all__ = [
+    "set_current_route",
+    "reset_current_route",
+    "instrumented_pool_class",
+    "attach",
+    "all_pool_stats",
+]
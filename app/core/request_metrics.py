@@ -0,0 +1,193 @@
+# app/core/request_metrics.py
+"""
+Contoare per request pentru header-ul Server-Timing:
+
+- db   → numărul de interogări și timpul petrecut în cursor (before/after_cursor_execute);
+- emag → apelurile către API-ul eMAG (EmagClient._post / _post_stream);
+- ser  → serializarea răspunsului: serialize_response din FastAPI (validarea / dump-ul
+          pydantic pe response_model, `instrument_serialization`) + json.dumps din
+          TimedJSONResponse.render (clasa implicită de răspuns).
+
+Contoarele stau într-un obiect mutabil pus într-un contextvar de middleware; contextul
+e copiat în threadpool (rute sync) și în greenlet-urile SQLAlchemy (AsyncSession),
+deci toate scriu în același obiect.
+
+Opțional, request-urile care depășesc bugetul de interogări (REQUEST_QUERY_BUDGET,
+cu suprascrieri per rută în REQUEST_QUERY_BUDGETS="GET /products=5;GET /categories=3")
+sau de timp DB (REQUEST_DB_MS_BUDGET) sunt logate cu WARNING.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("emag-db-api.request_metrics")
+
+QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", "0"))  # 0 = dezactivat
+DB_MS_BUDGET = float(os.getenv("REQUEST_DB_MS_BUDGET", "0"))  # 0 = dezactivat
+
+
+def _parse_budgets(raw: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for part in raw.split(";"):
+        route, sep, n = part.rpartition("=")
+        if not sep or not route.strip():
+            continue
+        try:
+            out[route.strip()] = int(n)
+        except ValueError:
+            logger.warning("REQUEST_QUERY_BUDGETS: valoare invalidă pentru %r: %r", route.strip(), n)
+    return out
+
+
+ROUTE_QUERY_BUDGETS = _parse_budgets(os.getenv("REQUEST_QUERY_BUDGETS", ""))
+
+_T0_KEY = "request_metrics_t0"
+
+
+class RequestMetrics:
+    __slots__ = ("db_count", "db_ms", "emag_count", "emag_ms", "ser_ms", "request")
+
+    def __init__(self, request: Any = None) -> None:
+        # request-ul HTTP (pentru template-ul rutei, disponibil după routing)
+        self.request = request
+        self.db_count = 0
+        self.db_ms = 0.0
+        self.emag_count = 0
+        self.emag_ms = 0.0
+        self.ser_ms = 0.0
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_ms:.1f};desc="{self.db_count} queries", '
+            f'emag;dur={self.emag_ms:.1f};desc="{self.emag_count} calls", '
+            f"ser;dur={self.ser_ms:.1f}"
+        )
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def start(request: Any = None):
+    """Pornește contoarele pentru request-ul curent; întoarce token-ul pentru `reset`."""
+    return _current.set(RequestMetrics(request))
+
+
+def reset(token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def add_emag(ms: float) -> None:
+    m = _current.get()
+    if m is not None:
+        m.emag_count += 1
+        m.emag_ms += ms
+
+
+def query_budget(route: str) -> int:
+    return ROUTE_QUERY_BUDGETS.get(route, QUERY_BUDGET)
+
+
+def check_budget(m: RequestMetrics, route: str, req_id: str) -> None:
+    """WARNING pentru request-urile peste buget (N+1, liste fără eager loading etc.)."""
+    budget = query_budget(route)
+    over_count = budget > 0 and m.db_count > budget
+    over_ms = DB_MS_BUDGET > 0 and m.db_ms > DB_MS_BUDGET
+    if over_count or over_ms:
+        logger.warning(
+            "Buget DB depășit: %s queries=%d (buget=%s) db_ms=%.1f (buget=%s) rid=%s",
+            route, m.db_count, budget or "-", m.db_ms, DB_MS_BUDGET or "-", req_id,
+        )
+
+
+def attach(eng: Engine) -> None:
+    """Leagă before/after_cursor_execute de contoarele request-ului curent."""
+
+    @event.listens_for(eng, "before_cursor_execute")
+    def _before(conn, _cursor, _statement, _parameters, _context, _executemany) -> None:
+        if _current.get() is not None:
+            conn.info.setdefault(_T0_KEY, []).append(time.perf_counter())
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _after(conn, _cursor, _statement, _parameters, _context, _executemany) -> None:
+        m = _current.get()
+        stack = conn.info.get(_T0_KEY)
+        if m is None or not stack:
+            return
+        m.db_count += 1
+        m.db_ms += (time.perf_counter() - stack.pop()) * 1000.0
+
+    # interogările eșuate nu ajung în after_cursor_execute: nu lăsăm t0 orfan pe conexiune
+    @event.listens_for(eng, "handle_error")
+    def _on_error(ctx) -> None:
+        conn = ctx.connection
+        stack = conn.info.get(_T0_KEY) if conn is not None else None
+        if stack:
+            stack.pop()
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse care adaugă timpul de randare la contorul `ser`."""
+
+    def render(self, content: Any) -> bytes:
+        m = _current.get()
+        if m is None:
+            return super().render(content)
+        t0 = time.perf_counter()
+        try:
+            return super().render(content)
+        finally:
+            m.ser_ms += (time.perf_counter() - t0) * 1000.0
+
+
+def instrument_serialization() -> None:
+    """
+    Adaugă la `ser` și fastapi.routing.serialize_response (de obicei partea scumpă).
+    FastAPI îl apelează ca global al modulului din handler-ul fiecărei rute, deci îl
+    înfășurăm acolo; idempotent.
+    """
+    from fastapi import routing
+
+    orig = routing.serialize_response
+    if getattr(orig, "_request_metrics", False):
+        return
+
+    @functools.wraps(orig)
+    async def timed(*args: Any, **kwargs: Any) -> Any:
+        m = _current.get()
+        if m is None:
+            return await orig(*args, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return await orig(*args, **kwargs)
+        finally:
+            m.ser_ms += (time.perf_counter() - t0) * 1000.0
+
+    timed._request_metrics = True  # type: ignore[attr-defined]
+    routing.serialize_response = timed
+
+
+__all__ = [
+    "RequestMetrics",
+    "start",
+    "reset",
+    "current",
+    "add_emag",
+    "query_budget",
+    "check_budget",
+    "attach",
+    "TimedJSONResponse",
+    "instrument_serialization",
+]
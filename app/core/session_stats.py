@@ -0,0 +1,74 @@
+# app/core/session_stats.py
+"""
+Câte sesiuni DB deschise de dependency-uri (get_db / get_read_db / variantele async)
+au atins efectiv baza de date, per rută.
+
+Session-ul SQLAlchemy e deja „lazy”: conexiunea din pool se ia abia la primul
+execute/flush (event-ul `after_begin`). Sesiunile care nu au început nicio tranzacție
+se închid fără rollback și fără checkout – aici doar le numărăm („checkouts economisite”).
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_USED_KEY = "db_used"
+
+_lock = threading.Lock()
+# ruta (METHOD template) -> [sesiuni, sesiuni folosite]
+_by_route: Dict[str, List[int]] = {}
+
+
+@event.listens_for(Session, "after_begin")
+def _mark_used(session: Session, _transaction, _connection) -> None:
+    # se aplică și sesiunilor sync din spatele AsyncSession
+    session.info[_USED_KEY] = True
+
+
+def route_label(request: Any) -> str:
+    """METHOD + template-ul rutei (ex. 'GET /products/{product_id}'), nu path-ul concret."""
+    if request is None:
+        return "-"
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or request.url.path
+    return f"{request.method} {path}"
+
+
+def was_used(db: Any) -> bool:
+    return bool(db.info.get(_USED_KEY))
+
+
+def record(route: Optional[str], used: bool) -> None:
+    key = route or "-"
+    with _lock:
+        c = _by_route.get(key)
+        if c is None:
+            c = _by_route[key] = [0, 0]
+        c[0] += 1
+        if used:
+            c[1] += 1
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        items = {k: tuple(v) for k, v in _by_route.items()}
+    routes = [
+        {
+            "route": k,
+            "sessions": n,
+            "used": used,
+            "saved_checkouts": n - used,
+            "saved_ratio": round((n - used) / n, 4) if n else None,
+        }
+        for k, (n, used) in items.items()
+    ]
+    routes.sort(key=lambda r: r["saved_checkouts"], reverse=True)
+    total = sum(r["sessions"] for r in routes)
+    saved = sum(r["saved_checkouts"] for r in routes)
+    return {"sessions": total, "saved_checkouts": saved, "routes": routes}
+
+
+__all__ = ["route_label", "was_used", "record", "snapshot"]
@@ -0,0 +1,83 @@
+# app/core/ttl_cache.py
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Registru global (nume -> cache) ca să putem expune statistici în /observability/v2
+_REGISTRY: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """
+    Cache în memorie (per proces) cu TTL și evicție LRU.
+    - thread-safe (rutele sync rulează în threadpool);
+    - ttl_s <= 0 dezactivează cache-ul (get întoarce mereu None, set e no-op);
+    - ține contoare hits/misses pentru hit ratio.
+    """
+
+    def __init__(self, name: str, *, ttl_s: float, max_entries: int = 256):
+        self.name = name
+        self.ttl_s = float(ttl_s)
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _REGISTRY[name] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, *, ttl_s: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        expires = time.monotonic() + (self.ttl_s if ttl_s is None else float(ttl_s))
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "enabled": self.enabled,
+                "ttl_s": self.ttl_s,
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    return [c.stats() for c in _REGISTRY.values()]
+
+
+__all__ = ["TTLCache", "all_stats"]
@@ -1,14 +1,20 @@
 # app/crud/category.py
 from __future__ import annotations
 
-from typing import Optional, Literal
+import json
+import os
+from typing import Any, Optional, Literal
 
-from sqlalchemy import func, select, delete
+from sqlalchemy import Integer, Select, column, func, select, delete, table, text
+from sqlalchemy import delete as sa_delete  # `delete` e umbrit mai jos de crud.delete(db, obj)
 from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from app.models.category import Category, ProductCategory
+from app.models.category import Category, CategoryClosure, ProductCategory
+from app.models.product import Product
+from app.crud.totals import TotalMode, Total, resolve_total, aresolve_total
 
 
 # Excepție specifică pentru încălcarea unicității (lower(name))
@@ -17,6 +23,23 @@ class DuplicateCategoryNameError(Exception):
     pass
 
 
+class CategoryParentError(Exception):
+    """Părinte inexistent sau mutare care ar crea un ciclu (sub propriul descendent)."""
+    pass
+
+
+# Sursa pentru with_counts: "join" (agregare pe product_categories, doar pentru pagina curentă)
+# sau "column" (category_product_counts, întreținut de triggere – app.services.category_counts)
+COUNTS_SOURCE = os.getenv("CATEGORY_COUNTS_SOURCE", "join").strip().lower()
+
+_counts = table(
+    "category_product_counts",
+    column("category_id", Integer),
+    column("product_count", Integer),
+    schema=Category.__table__.schema,
+)
+
+
 # -------------------------- Helpers --------------------------
 
 def _normalize_pagination(page: int, page_size: int, *, max_size: int = 200) -> tuple[int, int]:
@@ -34,20 +57,17 @@ def _sanitize_name(name: Optional[str]) -> Optional[str]:
 
 # -------------------------- Reads / listing --------------------------
 
-def list_categories(
-    db: Session,
+def _list_statements(
     *,
-    name_contains: Optional[str] = None,
-    page: int = 1,
-    page_size: int = 50,
-    order_by: Literal["id", "name"] = "id",
-    order: Literal["asc", "desc"] = "asc",
-    with_products: bool = False,
-) -> tuple[list[Category], int]:
-    """
-    Listează categorii cu filtrare case-insensitive după 'name', sortare și paginare.
-    - with_products=True -> eager load cu selectinload(Category.products) dacă relația există.
-    """
+    name_contains: Optional[str],
+    page: int,
+    page_size: int,
+    order_by: Literal["id", "name"],
+    order: Literal["asc", "desc"],
+    with_products: bool,
+    with_counts: bool = False,
+) -> tuple[Select, Select, Select]:
+    """(count_stmt, page_stmt, rows_stmt) – comune pentru varianta sync și async."""
     page, page_size = _normalize_pagination(page, page_size)
 
     # Construim condițiile o singură dată (fără a accesa atribute private de pe Select)
@@ -57,7 +77,7 @@ def list_categories(
 
     # total count pe subquery simplu
     ids_q = select(Category.id).where(*conditions)
-    total = int(db.execute(select(func.count()).select_from(ids_q.subquery())).scalar_one() or 0)
+    count_stmt = select(func.count()).select_from(ids_q.subquery())
 
     # sortare stabilă
     sort_col = Category.id if order_by == "id" else Category.name
@@ -70,6 +90,79 @@ def list_categories(
     if with_products and hasattr(Category, "products"):
         stmt = stmt.options(selectinload(Category.products))  # type: ignore[arg-type]
 
+    if with_counts:
+        # pagina → rânduri (Category, product_count)
+        stmt = _with_counts(stmt, sort_expr)
+
+    return count_stmt, stmt, ids_q
+
+
+def _with_counts(page_stmt: Select, sort_expr: Any) -> Select:
+    if COUNTS_SOURCE == "column":
+        return page_stmt.outerjoin(_counts, _counts.c.category_id == Category.id).add_columns(
+            func.coalesce(_counts.c.product_count, 0).label("product_count")
+        )
+
+    # un singur join agregat, limitat la id-urile paginii (index (category_id, product_id))
+    page = page_stmt.with_only_columns(Category.id).cte("page")
+    pc = ProductCategory.__table__
+    cnt = (
+        select(pc.c.category_id, func.count().label("n"))
+        .join(page, page.c.id == pc.c.category_id)
+        .group_by(pc.c.category_id)
+        .subquery("cnt")
+    )
+    return (
+        select(Category, func.coalesce(cnt.c.n, 0).label("product_count"))
+        .join(page, page.c.id == Category.id)
+        .outerjoin(cnt, cnt.c.category_id == Category.id)
+        .order_by(sort_expr, Category.id.asc())
+    )
+
+
+def _rows_with_counts(rows: Any) -> list[Category]:
+    items = []
+    for obj, n in rows:
+        obj.product_count = int(n or 0)  # atribut tranzient, citit de CategoryRead
+        items.append(obj)
+    return items
+
+
+def list_categories(
+    db: Session,
+    *,
+    name_contains: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 50,
+    order_by: Literal["id", "name"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+    with_products: bool = False,
+    with_counts: bool = False,
+    total_mode: TotalMode = "exact",
+) -> tuple[list[Category], Total]:
+    """
+    Listează categorii cu filtrare case-insensitive după 'name', sortare și paginare.
+    - with_products=True -> eager load cu selectinload(Category.products) dacă relația există.
+    - with_counts=True -> fiecare categorie primește `product_count` (vezi COUNTS_SOURCE).
+    """
+    count_stmt, stmt, rows_stmt = _list_statements(
+        name_contains=name_contains,
+        page=page,
+        page_size=page_size,
+        order_by=order_by,
+        order=order,
+        with_products=with_products,
+        with_counts=with_counts,
+    )
+    total = resolve_total(
+        db,
+        mode=total_mode,
+        exact_stmt=count_stmt,
+        rows_stmt=rows_stmt,
+        table=None if name_contains else Category.__table__,
+    )
+    if with_counts:
+        return _rows_with_counts(db.execute(stmt).all()), total
     items = db.execute(stmt).scalars().all()
     return items, total
 
@@ -89,6 +182,69 @@ def get_by_name_ci(db: Session, name: str) -> Optional[Category]:
     return db.execute(stmt).scalar_one_or_none()
 
 
+def _category_products_stmt(category_id: int, after_id: int, limit: int) -> Select:
+    # ordinea vine direct din indexul (category_id, product_id) → fără sort, fără OFFSET
+    return (
+        select(Product)
+        .join(ProductCategory, ProductCategory.product_id == Product.id)
+        .where(ProductCategory.category_id == category_id, ProductCategory.product_id > after_id)
+        .order_by(ProductCategory.product_id)
+        .limit(limit)
+    )
+
+
+def list_category_products(db: Session, category_id: int, *, after_id: int = 0, limit: int = 100) -> list[Product]:
+    """Produsele unei categorii, paginate keyset după id (`after_id` = ultimul id primit)."""
+    return list(db.execute(_category_products_stmt(category_id, after_id, limit)).scalars().all())
+
+
+def iter_category_products(db: Session, category_id: int, *, after_id: int = 0, batch_size: int = 1000):
+    """Toate produsele categoriei ca dict-uri, în batch-uri keyset (query-uri scurte, memorie constantă)."""
+    while True:
+        batch = list_category_products(db, category_id, after_id=after_id, limit=batch_size)
+        for p in batch:
+            yield {"id": p.id, "name": p.name, "description": p.description, "price": p.price, "sku": p.sku}
+        if len(batch) < batch_size:
+            return
+        after_id = batch[-1].id
+        db.expunge_all()  # nu ținem toate obiectele în identity map
+
+
+def _is_descendant_stmt(category_id: int, candidate_id: int) -> Select:
+    """True dacă `candidate_id` e în subarborele lui `category_id` (inclusiv ea însăși)."""
+    return select(
+        select(CategoryClosure.descendant_id)
+        .where(
+            CategoryClosure.ancestor_id == category_id,
+            CategoryClosure.descendant_id == candidate_id,
+        )
+        .exists()
+    )
+
+
+def _subtree_stmt(category_id: int) -> Select:
+    return (
+        select(Category, CategoryClosure.depth)
+        .join(CategoryClosure, CategoryClosure.descendant_id == Category.id)
+        .where(CategoryClosure.ancestor_id == category_id)
+        .order_by(CategoryClosure.depth, Category.name, Category.id)
+    )
+
+
+def list_subtree(db: Session, category_id: int) -> list[tuple[Category, int]]:
+    """Categoria + toți descendenții ei, cu adâncimea relativă (un singur join pe closure)."""
+    return [(c, int(d)) for c, d in db.execute(_subtree_stmt(category_id)).all()]
+
+
+def _check_parent(db: Session, category_id: Optional[int], parent_id: Optional[int]) -> None:
+    if parent_id is None:
+        return
+    if db.get(Category, parent_id) is None:
+        raise CategoryParentError("Parent category not found.")
+    if category_id is not None and db.scalar(_is_descendant_stmt(category_id, parent_id)):
+        raise CategoryParentError("A category cannot be moved under itself or one of its descendants.")
+
+
 # -------------------------- Mutations --------------------------
 
 def create(db: Session, data: dict) -> Category:
@@ -99,8 +255,9 @@ def create(db: Session, data: dict) -> Category:
         raise IntegrityError("name is required", params=None, orig=None)  # type: ignore[arg-type]
     if get_by_name_ci(db, name):
         raise DuplicateCategoryNameError("Category name must be unique (case-insensitive).")
+    _check_parent(db, None, data.get("parent_id"))
 
-    obj = Category(name=name, description=data.get("description"))
+    obj = Category(name=name, description=data.get("description"), parent_id=data.get("parent_id"))
     db.add(obj)
     try:
         db.commit()
@@ -125,6 +282,11 @@ def update(db: Session, obj: Category, data: dict) -> Category:
         # poate fi None => ștergere descriere
         obj.description = data["description"]
 
+    if "parent_id" in data:
+        # closure-ul se actualizează în DB (trigger pe UPDATE OF parent_id)
+        _check_parent(db, obj.id, data["parent_id"])
+        obj.parent_id = data["parent_id"]
+
     try:
         db.commit()
     except IntegrityError as e:
@@ -192,3 +354,272 @@ def detach_product(db: Session, category_id: int, product_id: int) -> bool:
     db.delete(pc)
     db.commit()
     return True
+
+
+# -------------------------- M2M bulk (set-based) --------------------------
+# O singură instrucțiune per operație: perechile vin ca două array-uri paralele și sunt
+# desfăcute cu unnest(); perechile cu produs/categorie inexistente sunt raportate, nu eșuează.
+
+_PC = ProductCategory.__table__.fullname
+_P = Product.__table__.fullname
+_C = Category.__table__.fullname
+_INVALID_SAMPLE = 100
+
+_INPUT_CTE = """
+  input AS (
+    SELECT DISTINCT product_id, category_id
+      FROM unnest(CAST(:pids AS integer[]), CAST(:cids AS integer[])) AS t(product_id, category_id)
+  )"""
+
+_BULK_ATTACH_SQL = text(f"""
+WITH {_INPUT_CTE},
+  valid AS (
+    SELECT i.product_id, i.category_id
+      FROM input i
+      JOIN {_P} p ON p.id = i.product_id
+      JOIN {_C} c ON c.id = i.category_id
+       FOR KEY SHARE OF p, c
+  ),
+  ins AS (
+    INSERT INTO {_PC} (product_id, category_id)
+    SELECT product_id, category_id FROM valid
+    ON CONFLICT (product_id, category_id) DO NOTHING
+    RETURNING 1
+  ),
+  bad AS (SELECT product_id, category_id FROM input EXCEPT SELECT product_id, category_id FROM valid)
+SELECT (SELECT count(*) FROM input) AS requested,
+       (SELECT count(*) FROM ins)   AS changed,
+       (SELECT count(*) FROM bad)   AS invalid,
+       (SELECT coalesce(json_agg(json_build_object('product_id', product_id, 'category_id', category_id)), '[]')
+          FROM (SELECT * FROM bad ORDER BY 1, 2 LIMIT {_INVALID_SAMPLE}) s) AS invalid_pairs
+""")
+
+_BULK_DETACH_SQL = text(f"""
+WITH {_INPUT_CTE},
+  del AS (
+    DELETE FROM {_PC} pc
+     USING input i
+     WHERE pc.product_id = i.product_id AND pc.category_id = i.category_id
+    RETURNING 1
+  ),
+  bad AS (
+    SELECT i.product_id, i.category_id FROM input i
+     WHERE NOT EXISTS (SELECT 1 FROM {_P} p WHERE p.id = i.product_id)
+        OR NOT EXISTS (SELECT 1 FROM {_C} c WHERE c.id = i.category_id)
+  )
+SELECT (SELECT count(*) FROM input) AS requested,
+       (SELECT count(*) FROM del)   AS changed,
+       (SELECT count(*) FROM bad)   AS invalid,
+       (SELECT coalesce(json_agg(json_build_object('product_id', product_id, 'category_id', category_id)), '[]')
+          FROM (SELECT * FROM bad ORDER BY 1, 2 LIMIT {_INVALID_SAMPLE}) s) AS invalid_pairs
+""")
+
+
+def _pair_params(pairs: list[tuple[int, int]]) -> dict[str, list[int]]:
+    return {"pids": [p for p, _ in pairs], "cids": [c for _, c in pairs]}
+
+
+def _bulk_report(row: Any, key: str) -> dict:
+    invalid_pairs = row.invalid_pairs
+    if isinstance(invalid_pairs, str):
+        invalid_pairs = json.loads(invalid_pairs)
+    requested, changed, invalid = int(row.requested), int(row.changed), int(row.invalid)
+    return {
+        "requested": requested,
+        key: changed,
+        # attach: legătura exista deja; detach: legătura nu exista
+        "unchanged": requested - changed - invalid,
+        "invalid": invalid,
+        "invalid_pairs": invalid_pairs,
+    }
+
+
+def bulk_attach(db: Session, pairs: list[tuple[int, int]]) -> dict:
+    """Atașează (product_id, category_id) în bloc: INSERT ... SELECT unnest ... ON CONFLICT DO NOTHING."""
+    try:
+        row = db.execute(_BULK_ATTACH_SQL, _pair_params(pairs)).one()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return _bulk_report(row, "attached")
+
+
+def bulk_detach(db: Session, pairs: list[tuple[int, int]]) -> dict:
+    """Detașează în bloc: DELETE ... USING unnest(...)."""
+    try:
+        row = db.execute(_BULK_DETACH_SQL, _pair_params(pairs)).one()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return _bulk_report(row, "detached")
+
+
+# -------------------------- Async (AsyncSession) --------------------------
+# Aceleași interogări ca variantele sync; folosite de rutele `async def`.
+
+async def alist_categories(
+    db: AsyncSession,
+    *,
+    name_contains: Optional[str] = None,
+    page: int = 1,
+    page_size: int = 50,
+    order_by: Literal["id", "name"] = "id",
+    order: Literal["asc", "desc"] = "asc",
+    with_products: bool = False,
+    with_counts: bool = False,
+    total_mode: TotalMode = "exact",
+) -> tuple[list[Category], Total]:
+    count_stmt, stmt, rows_stmt = _list_statements(
+        name_contains=name_contains,
+        page=page,
+        page_size=page_size,
+        order_by=order_by,
+        order=order,
+        with_products=with_products,
+        with_counts=with_counts,
+    )
+    total = await aresolve_total(
+        db,
+        mode=total_mode,
+        exact_stmt=count_stmt,
+        rows_stmt=rows_stmt,
+        table=None if name_contains else Category.__table__,
+    )
+    if with_counts:
+        return _rows_with_counts((await db.execute(stmt)).all()), total
+    items = (await db.execute(stmt)).scalars().all()
+    return list(items), total
+
+
+async def aget(db: AsyncSession, category_id: int, *, with_products: bool = False) -> Optional[Category]:
+    if with_products and hasattr(Category, "products"):
+        stmt = select(Category).options(selectinload(Category.products)).where(Category.id == category_id)
+        return (await db.execute(stmt)).scalars().first()
+    return await db.get(Category, category_id)
+
+
+async def aget_by_name_ci(db: AsyncSession, name: str) -> Optional[Category]:
+    if not name:
+        return None
+    stmt = select(Category).where(func.lower(Category.name) == name.lower())
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def alist_category_products(
+    db: AsyncSession, category_id: int, *, after_id: int = 0, limit: int = 100
+) -> list[Product]:
+    return list((await db.execute(_category_products_stmt(category_id, after_id, limit))).scalars().all())
+
+
+async def alist_subtree(db: AsyncSession, category_id: int) -> list[tuple[Category, int]]:
+    return [(c, int(d)) for c, d in (await db.execute(_subtree_stmt(category_id))).all()]
+
+
+async def _acheck_parent(db: AsyncSession, category_id: Optional[int], parent_id: Optional[int]) -> None:
+    if parent_id is None:
+        return
+    if await db.get(Category, parent_id) is None:
+        raise CategoryParentError("Parent category not found.")
+    if category_id is not None and await db.scalar(_is_descendant_stmt(category_id, parent_id)):
+        raise CategoryParentError("A category cannot be moved under itself or one of its descendants.")
+
+
+async def acreate(db: AsyncSession, data: dict) -> Category:
+    name = _sanitize_name(data.get("name"))
+    if name is None:
+        raise IntegrityError("name is required", params=None, orig=None)  # type: ignore[arg-type]
+    if await aget_by_name_ci(db, name):
+        raise DuplicateCategoryNameError("Category name must be unique (case-insensitive).")
+    await _acheck_parent(db, None, data.get("parent_id"))
+
+    obj = Category(name=name, description=data.get("description"), parent_id=data.get("parent_id"))
+    db.add(obj)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise DuplicateCategoryNameError("Category name must be unique (case-insensitive).") from e
+    await db.refresh(obj)
+    return obj
+
+
+async def aupdate(db: AsyncSession, obj: Category, data: dict) -> Category:
+    if "name" in data:
+        new_name = _sanitize_name(data["name"])
+        if new_name is not None:
+            other = await aget_by_name_ci(db, new_name)
+            if other and other.id != obj.id:
+                raise DuplicateCategoryNameError("Category name must be unique (case-insensitive).")
+            obj.name = new_name
+
+    if "description" in data:
+        obj.description = data["description"]
+
+    if "parent_id" in data:
+        await _acheck_parent(db, obj.id, data["parent_id"])
+        obj.parent_id = data["parent_id"]
+
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise DuplicateCategoryNameError("Category name must be unique (case-insensitive).") from e
+    await db.refresh(obj)
+    return obj
+
+
+async def adelete(db: AsyncSession, obj: Category) -> None:
+    await db.delete(obj)
+    await db.commit()
+
+
+async def aattach_product(db: AsyncSession, category_id: int, product_id: int) -> bool:
+    """Varianta async a attach_product (INSERT ... ON CONFLICT DO NOTHING)."""
+    t = ProductCategory.__table__
+    try:
+        await db.execute(
+            pg_insert(t)
+            .values(product_id=product_id, category_id=category_id)
+            .on_conflict_do_nothing(index_elements=["product_id", "category_id"])
+        )
+        await db.commit()
+        return True
+    except IntegrityError:
+        await db.rollback()
+        return False
+
+
+async def adetach_product(db: AsyncSession, category_id: int, product_id: int) -> bool:
+    """Varianta async a detach_product (DELETE core, idempotent)."""
+    t = ProductCategory.__table__
+    res = await db.execute(
+        sa_delete(t)
+        .where(t.c.product_id == product_id)
+        .where(t.c.category_id == category_id)
+    )
+    await db.commit()
+    return bool(getattr(res, "rowcount", 0))
+
+
+async def abulk_attach(db: AsyncSession, pairs: list[tuple[int, int]]) -> dict:
+    """Varianta async a bulk_attach."""
+    try:
+        row = (await db.execute(_BULK_ATTACH_SQL, _pair_params(pairs))).one()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return _bulk_report(row, "attached")
+
+
+async def abulk_detach(db: AsyncSession, pairs: list[tuple[int, int]]) -> dict:
+    """Varianta async a bulk_detach."""
+    try:
+        row = (await db.execute(_BULK_DETACH_SQL, _pair_params(pairs))).one()
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return _bulk_report(row, "detached")
@@ -1,21 +1,58 @@
 # app/crud/product.py
 from __future__ import annotations
 
+import base64
+import json
+import os
 from decimal import Decimal
-from typing import Optional, Tuple, Literal, Dict, List
-
-from sqlalchemy import func, select
+from typing import Any, Iterator, Optional, Sequence, Tuple, Literal, Dict, List
+
+from sqlalchemy import (
+    Boolean,
+    Float,
+    Numeric,
+    Select,
+    String,
+    case,
+    cast,
+    column,
+    func,
+    literal,
+    literal_column,
+    or_,
+    and_,
+    select,
+    true,
+    tuple_,
+    update as sa_update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR, insert as pg_insert
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from app.models.product import Product
-from app.schemas.product import ProductCreate, ProductUpdate
-from app.models.category import ProductCategory  # pentru filtrare după categorie
+from app.schemas.product import (
+    ProductBulkItem,
+    ProductBulkPatchItem,
+    ProductCreate,
+    ProductUpdate,
+)
+from app.models.category import Category, CategoryClosure, ProductCategory  # pentru filtrare după categorie
+from app.crud.totals import TotalMode, Total, resolve_total, aresolve_total
 
 OrderBy = Literal["id", "name", "price", "sku"]
 OrderDir = Literal["asc", "desc"]
 
 
+# Pragul implicit pentru căutarea fuzzy (pg_trgm word_similarity, 0..1)
+SEARCH_THRESHOLD = float(os.getenv("PRODUCTS_SEARCH_THRESHOLD", "0.4"))
+
+# Câte rânduri intră într-un singur INSERT/UPDATE multi-row la operațiile bulk
+BULK_BATCH_SIZE = int(os.getenv("PRODUCTS_BULK_BATCH_SIZE", "500"))
+
+
 class DuplicateSKUError(Exception):
     """Ridicată când încalcă unicitatea SKU (partial unique WHERE sku IS NOT NULL)."""
     pass
@@ -39,43 +76,36 @@ def _resolve_order(order_by: OrderBy, order_dir: OrderDir):
     return col.desc() if order_dir == "desc" else col.asc()
 
 
-def list_products(
-    db: Session,
+def _like_escape(value: str) -> str:
+    """Escape pentru metacaracterele LIKE (%, _) din input-ul utilizatorului."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filtered_select(
     *,
     name_contains: Optional[str] = None,
     sku_prefix: Optional[str] = None,
     min_price: Optional[Decimal] = None,
     max_price: Optional[Decimal] = None,
     category_id: Optional[int] = None,
-    page: int = 1,
-    page_size: int = 50,
-    order_by: OrderBy = "id",
-    order_dir: OrderDir = "asc",
-) -> Tuple[List[Product], int]:
+    include_descendants: bool = False,
+) -> Tuple[Select, bool]:
     """
-    Listează produse cu filtrare, paginare și sortare.
-
-    Filtre:
-      - name_contains: ILIKE pe lower(name) (exploatează ix_products_name_lower).
-      - sku_prefix: ILIKE prefix (ignoră NULL implicit).
-      - min_price/max_price: interval inclusiv.
-      - category_id: filtrează produsele care aparțin unei categorii.
-
-    Returnează: (items, total)
+    Construiește SELECT-ul filtrat comun pentru listare și export.
+    Returnează (stmt, filtered) – `filtered` spune dacă există vreun filtru (pentru total).
     """
-    page, page_size = _normalize_pagination(page, page_size)
-
     # Construim condițiile explicit (ușurează calculul de total)
     conditions = []
 
     if name_contains:
-        pattern = f"%{name_contains.lower()}%"
-        conditions.append(func.lower(Product.name).like(pattern))
+        # lower(name) LIKE '%x%' → servit de ix_products_name_trgm (GIN gin_trgm_ops)
+        pattern = f"%{_like_escape(name_contains.lower())}%"
+        conditions.append(func.lower(Product.name).like(pattern, escape="\\"))
 
     if sku_prefix:
-        # pentru indexuri parțiale (sku IS NOT NULL) e util să excludem NULL
+        # aceeași expresie ca ix_products_sku_trgm (lower(sku), parțial WHERE sku IS NOT NULL)
         conditions.append(Product.sku.is_not(None))
-        conditions.append(Product.sku.ilike(f"{sku_prefix}%"))
+        conditions.append(func.lower(Product.sku).like(f"{_like_escape(sku_prefix.lower())}%", escape="\\"))
 
     if min_price is not None:
         conditions.append(Product.price >= min_price)
@@ -85,7 +115,19 @@ def list_products(
 
     base = select(Product)
 
-    if category_id is not None:
+    if category_id is not None and include_descendants:
+        # subarborele vine din closure → un singur semi-join (EXISTS), fără duplicate
+        # când produsul e în mai multe subcategorii
+        subtree = select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+        base = base.where(
+            select(ProductCategory.product_id)
+            .where(
+                ProductCategory.product_id == Product.id,
+                ProductCategory.category_id.in_(subtree),
+            )
+            .exists()
+        )
+    elif category_id is not None:
         # join pe M2M când filtrăm după categorie
         base = base.join(
             ProductCategory,
@@ -95,16 +137,45 @@ def list_products(
     if conditions:
         base = base.where(*conditions)
 
+    return base, bool(conditions) or category_id is not None
+
+
+def _list_statements(
+    *,
+    name_contains: Optional[str],
+    sku_prefix: Optional[str],
+    min_price: Optional[Decimal],
+    max_price: Optional[Decimal],
+    category_id: Optional[int],
+    include_descendants: bool,
+    page: int,
+    page_size: int,
+    order_by: OrderBy,
+    order_dir: OrderDir,
+) -> Tuple[Select, Select, Select, bool]:
+    """
+    (total_stmt, page_stmt, rows_stmt, filtered) – comune pentru varianta sync și async.
+    `rows_stmt` e SELECT-ul filtrat nepaginat (pentru totalurile estimate / plafonate).
+    """
+    page, page_size = _normalize_pagination(page, page_size)
+
+    base, filtered = _filtered_select(
+        name_contains=name_contains,
+        sku_prefix=sku_prefix,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        include_descendants=include_descendants,
+    )
+
     # Total (folosim subquery doar pe ID-uri pentru planner prietenos)
-    if conditions or category_id is not None:
+    if filtered:
         total_stmt = select(func.count()).select_from(
             select(Product.id).select_from(base.subquery()).subquery()
         )
     else:
         total_stmt = select(func.count(Product.id))
 
-    total = db.scalar(total_stmt) or 0
-
     # Sortare + tiebreaker pe id pentru stabilitate
     order_clause = _resolve_order(order_by, order_dir)
     stmt = base.order_by(order_clause, Product.id.asc())
@@ -112,9 +183,396 @@ def list_products(
     # Paginare
     offset = (page - 1) * page_size
     stmt = stmt.offset(offset).limit(page_size)
+    return total_stmt, stmt, base, filtered
 
+
+def list_products(
+    db: Session,
+    *,
+    name_contains: Optional[str] = None,
+    sku_prefix: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    category_id: Optional[int] = None,
+    include_descendants: bool = False,
+    page: int = 1,
+    page_size: int = 50,
+    order_by: OrderBy = "id",
+    order_dir: OrderDir = "asc",
+    total_mode: TotalMode = "exact",
+) -> Tuple[List[Product], Total]:
+    """
+    Listează produse cu filtrare, paginare și sortare.
+
+    Filtre:
+      - name_contains: ILIKE pe lower(name) (exploatează ix_products_name_lower).
+      - sku_prefix: prefix case-insensitive pe lower(sku) (ignoră NULL implicit).
+      - min_price/max_price: interval inclusiv.
+      - category_id: filtrează produsele care aparțin unei categorii
+        (include_descendants=True → și subcategoriilor, prin category_closure).
+
+    total_mode: exact | estimate | none | exact-capped (vezi app.crud.totals).
+
+    Returnează: (items, total)
+    """
+    total_stmt, stmt, rows_stmt, filtered = _list_statements(
+        name_contains=name_contains,
+        sku_prefix=sku_prefix,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        include_descendants=include_descendants,
+        page=page,
+        page_size=page_size,
+        order_by=order_by,
+        order_dir=order_dir,
+    )
+    total = resolve_total(
+        db,
+        mode=total_mode,
+        exact_stmt=total_stmt,
+        rows_stmt=rows_stmt,
+        table=None if filtered else Product.__table__,
+    )
     items = db.execute(stmt).scalars().all()
-    return items, int(total)
+    return items, total
+
+
+def iter_products(
+    db: Session,
+    *,
+    name_contains: Optional[str] = None,
+    sku_prefix: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    category_id: Optional[int] = None,
+    include_descendants: bool = False,
+    order_by: OrderBy = "id",
+    order_dir: OrderDir = "asc",
+    batch_size: int = 5000,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Iterează TOATE produsele filtrate (fără paginare) ca dict-uri, pentru export.
+    Folosește cursor server-side (stream_results + yield_per) → memorie constantă.
+    """
+    base, _ = _filtered_select(
+        name_contains=name_contains,
+        sku_prefix=sku_prefix,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        include_descendants=include_descendants,
+    )
+    cols = base.with_only_columns(
+        Product.id, Product.name, Product.description, Product.price, Product.sku
+    )
+    stmt = cols.order_by(_resolve_order(order_by, order_dir), Product.id.asc())
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    for row in result.mappings():
+        yield dict(row)
+
+
+# -------------------------- Fațete (GROUPING SETS) --------------------------
+# Un singur statement pentru toate fațetele cerute, peste același set filtrat ca listarea:
+#   categories → (category_id, name)  [NULL = fără categorie]
+#   price      → width_bucket(price, min, max, n) pe intervalul setului filtrat
+#   sku        → sku IS NOT NULL
+# plus setul gol () → totalul. Join-ul pe product_categories multiplică rândurile,
+# de aceea numărăm DISTINCT id.
+
+FacetName = Literal["categories", "price", "sku"]
+FACET_NAMES: Tuple[str, ...] = ("categories", "price", "sku")
+
+
+def _facets_statement(base: Select, facets: Sequence[str], price_buckets: int) -> Select:
+    f = base.with_only_columns(Product.id, Product.price, Product.sku).cte("f")
+    b = select(func.min(f.c.price).label("lo"), func.max(f.c.price).label("hi")).cte("b")
+    bucket = case(
+        (f.c.price.is_(None), None),
+        (b.c.hi == b.c.lo, 1),
+        # width_bucket întoarce n+1 pentru valoarea maximă → o lipim în ultimul bucket
+        else_=func.least(func.width_bucket(f.c.price, b.c.lo, b.c.hi, price_buckets), price_buckets),
+    )
+    # expresiile calculate o dată, ca GROUP BY să lucreze pe coloane simple
+    g = (
+        select(
+            f.c.id,
+            f.c.sku.is_not(None).label("has_sku"),
+            bucket.label("bucket"),
+            b.c.lo,
+            b.c.hi,
+        )
+        .select_from(f.join(b, true()))
+        .cte("g")
+    )
+
+    exprs: Dict[str, List[Any]] = {}
+    from_ = g
+    if "categories" in facets:
+        pc = ProductCategory.__table__.alias("pc")
+        c = Category.__table__.alias("c")
+        from_ = from_.outerjoin(pc, pc.c.product_id == g.c.id).outerjoin(c, c.c.id == pc.c.category_id)
+        exprs["categories"] = [pc.c.category_id, c.c.name]
+    if "price" in facets:
+        exprs["price"] = [g.c.bucket]
+    if "sku" in facets:
+        exprs["sku"] = [g.c.has_sku]
+
+    cols: List[Any] = [
+        func.count(g.c.id.distinct()).label("n"),
+        func.min(g.c.lo).label("lo"),
+        func.max(g.c.hi).label("hi"),
+    ]
+    for name, es in exprs.items():
+        cols.append(func.grouping(es[0]).label(f"g_{name}"))
+        cols.extend(e.label(f"{name}_{i}") for i, e in enumerate(es))
+    sets = [tuple_(*es) for es in exprs.values()] + [tuple_()]
+    return select(*cols).select_from(from_).group_by(func.grouping_sets(*sets))
+
+
+def _facets_result(rows, facets: Sequence[str], price_buckets: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"total": 0}
+    categories: List[Dict[str, Any]] = []
+    buckets: Dict[int, int] = {}
+    missing_price = 0
+    sku = {"present": 0, "absent": 0}
+    lo = hi = None
+    for r in rows:
+        m = r._mapping
+        lo, hi = m["lo"], m["hi"]
+        if all(m[f"g_{k}"] for k in facets):
+            out["total"] = int(m["n"])
+        elif "categories" in facets and not m["g_categories"]:
+            categories.append({"category_id": m["categories_0"], "name": m["categories_1"], "count": int(m["n"])})
+        elif "price" in facets and not m["g_price"]:
+            if m["price_0"] is None:
+                missing_price = int(m["n"])
+            else:
+                buckets[int(m["price_0"])] = int(m["n"])
+        elif "sku" in facets and not m["g_sku"]:
+            sku["present" if m["sku_0"] else "absent"] = int(m["n"])
+
+    if "categories" in facets:
+        categories.sort(key=lambda x: (-x["count"], x["category_id"] is None, x["category_id"] or 0))
+        out["categories"] = categories
+    if "price" in facets:
+        width = (hi - lo) / price_buckets if lo is not None and hi is not None and hi > lo else None
+        out["price"] = {
+            "min": lo,
+            "max": hi,
+            "buckets": [
+                {
+                    "bucket": i,
+                    "from": round(lo + width * (i - 1), 2) if width is not None else lo,
+                    "to": round(lo + width * i, 2) if width is not None else hi,
+                    "count": n,
+                }
+                for i, n in sorted(buckets.items())
+            ],
+            "missing": missing_price,
+        }
+    if "sku" in facets:
+        out["sku"] = sku
+    return out
+
+
+def _facets_base(**filters: Any) -> Select:
+    base, _ = _filtered_select(**filters)
+    return base
+
+
+def product_facets(
+    db: Session,
+    *,
+    facets: Sequence[str] = FACET_NAMES,
+    price_buckets: int = 10,
+    **filters: Any,
+) -> Dict[str, Any]:
+    """
+    Fațetele cerute pentru setul filtrat (aceleași filtre ca list_products), într-un singur query.
+    """
+    stmt = _facets_statement(_facets_base(**filters), facets, price_buckets)
+    return _facets_result(db.execute(stmt).all(), facets, price_buckets)
+
+
+async def aproduct_facets(
+    db: AsyncSession,
+    *,
+    facets: Sequence[str] = FACET_NAMES,
+    price_buckets: int = 10,
+    **filters: Any,
+) -> Dict[str, Any]:
+    """Varianta async a product_facets."""
+    stmt = _facets_statement(_facets_base(**filters), facets, price_buckets)
+    return _facets_result((await db.execute(stmt)).all(), facets, price_buckets)
+
+
+# -------------------------- Căutare fuzzy (pg_trgm) --------------------------
+# `q <% lower(col)` (word_similarity) e servit de indexurile GIN trigram pe lower(name)
+# și lower(sku); pragul se setează per tranzacție (SET LOCAL, sigur și prin pgbouncer).
+# Paginare keyset pe (score DESC, id ASC); cursorul e opac (base64 JSON).
+
+def encode_search_cursor(score: float, product_id: int) -> str:
+    raw = json.dumps({"s": score, "id": product_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """Ridică ValueError pentru cursoare invalide."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(data["s"]), int(data["id"])
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _threshold_stmt(threshold: float):
+    return select(func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True))
+
+
+def _search_statement(q: str, *, limit: int, after: Optional[Tuple[float, int]]) -> Select:
+    term = q.strip().lower()
+    name_l, sku_l = func.lower(Product.name), func.lower(Product.sku)
+    score = func.greatest(
+        func.word_similarity(term, name_l),
+        func.coalesce(func.word_similarity(term, sku_l), 0),
+    ).cast(Float).label("score")
+    match = or_(
+        literal(term).op("<%")(name_l),
+        and_(Product.sku.is_not(None), literal(term).op("<%")(sku_l)),
+    )
+    stmt = select(Product, score).where(match)
+    if after is not None:
+        s, last_id = after
+        stmt = stmt.where(or_(score < s, and_(score == s, Product.id > last_id)))
+    return stmt.order_by(score.desc(), Product.id.asc()).limit(limit + 1)
+
+
+def _search_page(rows, limit: int) -> Tuple[List[Tuple[Product, float]], Optional[str]]:
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_score = rows[-1]
+        next_cursor = encode_search_cursor(float(last_score), last.id)
+    return [(p, float(sc)) for p, sc in rows], next_cursor
+
+
+def search_products(
+    db: Session,
+    q: str,
+    *,
+    threshold: float = SEARCH_THRESHOLD,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Tuple[Product, float]], Optional[str]]:
+    """
+    Căutare tolerantă la typo-uri în name/sku, ordonată după similaritate.
+    Returnează ([(produs, scor)], next_cursor).
+    """
+    after = decode_search_cursor(cursor) if cursor else None
+    db.execute(_threshold_stmt(threshold))
+    rows = db.execute(_search_statement(q, limit=limit, after=after)).all()
+    return _search_page(rows, limit)
+
+
+async def asearch_products(
+    db: AsyncSession,
+    q: str,
+    *,
+    threshold: float = SEARCH_THRESHOLD,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Tuple[Product, float]], Optional[str]]:
+    """Varianta async a search_products."""
+    after = decode_search_cursor(cursor) if cursor else None
+    await db.execute(_threshold_stmt(threshold))
+    rows = (await db.execute(_search_statement(q, limit=limit, after=after))).all()
+    return _search_page(rows, limit)
+
+
+# -------------------------- Full-text (tsvector generat) --------------------------
+# `search_tsv` e o coloană generată (migrarea c2d3e4f5a6b7): sku/name cu `simple_unaccent`,
+# name/description cu `ro_unaccent` (stemming românesc, fără diacritice). Nu e mapată pe model
+# (e întreținută exclusiv de DB). Query-ul folosește ambele configurații (OR), ca „baterie”
+# să găsească și „baterii”, iar codurile de model să rămână nestemmate.
+
+_FTS_SCHEMA = Product.__table__.schema or "app"
+_FTS_RO = f"{_FTS_SCHEMA}.ro_unaccent"
+_FTS_SIMPLE = f"{_FTS_SCHEMA}.simple_unaccent"
+_HEADLINE_OPTS = (
+    "StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, "
+    "MaxFragments=2, FragmentDelimiter=\" … \""
+)
+_search_tsv = literal_column("products.search_tsv", type_=TSVECTOR)
+
+
+def _fulltext_statement(q: str, *, limit: int, after: Optional[Tuple[float, int]]) -> Select:
+    tsq = func.websearch_to_tsquery(cast(_FTS_RO, REGCONFIG), q).op("||")(
+        func.websearch_to_tsquery(cast(_FTS_SIMPLE, REGCONFIG), q)
+    )
+    # 32 → rank / (rank + 1): scor în [0, 1)
+    rank = func.ts_rank_cd(_search_tsv, tsq, 32).cast(Float)
+    inner = select(Product.id.label("id"), rank.label("rank")).where(_search_tsv.op("@@")(tsq))
+    if after is not None:
+        r, last_id = after
+        inner = inner.where(or_(rank < r, and_(rank == r, Product.id > last_id)))
+    inner = inner.order_by(rank.desc(), Product.id.asc()).limit(limit + 1).subquery()
+
+    # ts_headline e scump → doar pe rândurile paginii
+    ro = cast(_FTS_RO, REGCONFIG)
+    return (
+        select(
+            Product,
+            inner.c.rank,
+            func.ts_headline(ro, Product.name, tsq, _HEADLINE_OPTS).label("name_highlight"),
+            func.ts_headline(ro, func.coalesce(Product.description, ""), tsq, _HEADLINE_OPTS).label("snippet"),
+        )
+        .join(inner, inner.c.id == Product.id)
+        .order_by(inner.c.rank.desc(), Product.id.asc())
+    )
+
+
+def _fulltext_page(rows, limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_search_cursor(float(rows[-1].rank), rows[-1][0].id)
+    hits = [
+        {"product": r[0], "rank": float(r.rank), "name_highlight": r.name_highlight, "snippet": r.snippet or None}
+        for r in rows
+    ]
+    return hits, next_cursor
+
+
+def fulltext_search(
+    db: Session,
+    q: str,
+    *,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Căutare full-text (websearch syntax: "fraze", -excludere, OR) în sku/name/description.
+    Returnează ([{product, rank, name_highlight, snippet}], next_cursor).
+    """
+    after = decode_search_cursor(cursor) if cursor else None
+    rows = db.execute(_fulltext_statement(q, limit=limit, after=after)).all()
+    return _fulltext_page(rows, limit)
+
+
+async def afulltext_search(
+    db: AsyncSession,
+    q: str,
+    *,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Varianta async a fulltext_search."""
+    after = decode_search_cursor(cursor) if cursor else None
+    rows = (await db.execute(_fulltext_statement(q, limit=limit, after=after))).all()
+    return _fulltext_page(rows, limit)
 
 
 def get(db: Session, product_id: int) -> Optional[Product]:
@@ -183,3 +641,281 @@ def delete_by_id(db: Session, product_id: int) -> bool:
     db.delete(obj)
     db.commit()
     return True
+
+
+# -------------------------- Async (AsyncSession) --------------------------
+# Aceleași interogări ca variantele sync; folosite de rutele `async def`.
+
+async def alist_products(
+    db: AsyncSession,
+    *,
+    name_contains: Optional[str] = None,
+    sku_prefix: Optional[str] = None,
+    min_price: Optional[Decimal] = None,
+    max_price: Optional[Decimal] = None,
+    category_id: Optional[int] = None,
+    include_descendants: bool = False,
+    page: int = 1,
+    page_size: int = 50,
+    order_by: OrderBy = "id",
+    order_dir: OrderDir = "asc",
+    total_mode: TotalMode = "exact",
+) -> Tuple[List[Product], Total]:
+    """Varianta async a list_products."""
+    total_stmt, stmt, rows_stmt, filtered = _list_statements(
+        name_contains=name_contains,
+        sku_prefix=sku_prefix,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        include_descendants=include_descendants,
+        page=page,
+        page_size=page_size,
+        order_by=order_by,
+        order_dir=order_dir,
+    )
+    total = await aresolve_total(
+        db,
+        mode=total_mode,
+        exact_stmt=total_stmt,
+        rows_stmt=rows_stmt,
+        table=None if filtered else Product.__table__,
+    )
+    items = (await db.execute(stmt)).scalars().all()
+    return list(items), total
+
+
+async def aget(db: AsyncSession, product_id: int) -> Optional[Product]:
+    return await db.get(Product, product_id)
+
+
+async def aget_by_sku(db: AsyncSession, sku: str) -> Optional[Product]:
+    if not sku:
+        return None
+    q = select(Product).where(Product.sku == sku)
+    return (await db.execute(q)).scalar_one_or_none()
+
+
+async def acreate(db: AsyncSession, data: ProductCreate) -> Product:
+    obj = Product(
+        name=data.name,
+        description=data.description,
+        price=data.price,
+        sku=data.sku,
+    )
+    db.add(obj)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise DuplicateSKUError("SKU already exists.") from e
+    await db.refresh(obj)
+    return obj
+
+
+async def aupdate(db: AsyncSession, obj: Product, data: ProductUpdate) -> Product:
+    payload = data.model_dump(exclude_unset=True)
+    for k, v in payload.items():
+        setattr(obj, k, v)
+
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise DuplicateSKUError("SKU already exists.") from e
+    await db.refresh(obj)
+    return obj
+
+
+async def adelete(db: AsyncSession, obj: Product) -> None:
+    await db.delete(obj)
+    await db.commit()
+
+
+# -------------------------- Bulk upsert / patch (după SKU) --------------------------
+# Un singur statement multi-row per batch, o singură tranzacție per request.
+# Rezultatul e per element, în ordinea din request:
+#   created | updated | unchanged | not_found (doar patch) | duplicate (SKU repetat în request;
+#   câștigă ultima apariție, ca la importul bulk)
+
+def _dedupe_by_sku(items: List[Any]) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    """Întoarce (sku -> indexul câștigător, outcome-uri 'duplicate' pentru celelalte apariții)."""
+    last: Dict[str, int] = {}
+    for i, it in enumerate(items):
+        last[it.sku] = i
+    dups = [
+        {"index": i, "sku": it.sku, "status": "duplicate", "id": None}
+        for i, it in enumerate(items)
+        if last[it.sku] != i
+    ]
+    return last, dups
+
+
+def _batches(seq: List[Any], size: int) -> Iterator[List[Any]]:
+    size = max(1, size)
+    for i in range(0, len(seq), size):
+        yield seq[i : i + size]
+
+
+def _upsert_stmt(rows: List[Dict[str, Any]]):
+    t = Product.__table__
+    ins = pg_insert(t).values(rows)
+    ex = ins.excluded
+    return ins.on_conflict_do_update(
+        index_elements=[t.c.sku],
+        index_where=t.c.sku.is_not(None),
+        set_={"name": ex.name, "description": ex.description, "price": ex.price},
+        # fără UPDATE (și fără tuple moarte) când nu se schimbă nimic
+        where=tuple_(t.c.name, t.c.description, t.c.price).is_distinct_from(
+            tuple_(ex.name, ex.description, ex.price)
+        ),
+    ).returning(t.c.id, t.c.sku, literal_column("(xmax = 0)").label("inserted"))
+
+
+_PATCH_FIELDS = ("name", "description", "price")
+
+
+def _patch_stmt(rows: List[Dict[str, Any]]):
+    """
+    UPDATE ... FROM (VALUES ...) cu flag-uri set_<câmp>: fiecare element
+    își actualizează doar câmpurile trimise, totul într-un singur statement.
+    """
+    t = Product.__table__
+    v = values(
+        column("sku", String),
+        column("name", String),
+        column("description", String),
+        column("price", Numeric(12, 2)),
+        *(column(f"set_{f}", Boolean) for f in _PATCH_FIELDS),
+        name="v",
+    ).data(
+        [
+            (r["sku"], r.get("name"), r.get("description"), r.get("price"),
+             *(f in r for f in _PATCH_FIELDS))
+            for r in rows
+        ]
+    )
+    # CAST explicit la tipul coloanei: fără el, o coloană VALUES doar cu NULL (câmp netrimis
+    # de niciun element din batch) e tipată text → CASE numeric/text eșuează
+    new = {
+        f: case((v.c[f"set_{f}"], cast(v.c[f], t.c[f].type)), else_=t.c[f])
+        for f in _PATCH_FIELDS
+    }
+    return (
+        sa_update(t)
+        .where(t.c.sku == cast(v.c.sku, t.c.sku.type))
+        .where(tuple_(*(t.c[f] for f in _PATCH_FIELDS)).is_distinct_from(tuple_(*new.values())))
+        .values(**new)
+        .returning(t.c.id, t.c.sku)
+    )
+
+
+def _patch_rows(items: List[ProductBulkPatchItem]) -> List[Dict[str, Any]]:
+    rows = []
+    for it in items:
+        data = it.model_dump(exclude_unset=True)
+        if data.get("name") is None:
+            data.pop("name", None)  # name e NOT NULL: null explicit = „nu modifica”
+        rows.append(data)
+    return rows
+
+
+def _outcomes(
+    items: List[Any],
+    winners: Dict[str, int],
+    dups: List[Dict[str, Any]],
+    by_sku: Dict[str, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    out = dups + [
+        {"index": idx, "sku": sku, **by_sku[sku]} for sku, idx in winners.items()
+    ]
+    out.sort(key=lambda o: o["index"])
+    return out
+
+
+def _existing_ids_stmt(skus: List[str]):
+    return select(Product.id, Product.sku).where(Product.sku.in_(skus))
+
+
+def bulk_upsert(db: Session, items: List[ProductBulkItem]) -> List[Dict[str, Any]]:
+    """Upsert după SKU (INSERT ... ON CONFLICT (sku) WHERE sku IS NOT NULL DO UPDATE)."""
+    winners, dups = _dedupe_by_sku(items)
+    rows = [items[i].model_dump(include={"name", "description", "price", "sku"}) for i in winners.values()]
+    by_sku: Dict[str, Dict[str, Any]] = {}
+    try:
+        for batch in _batches(rows, BULK_BATCH_SIZE):
+            for r in db.execute(_upsert_stmt(batch)):
+                by_sku[r.sku] = {"status": "created" if r.inserted else "updated", "id": r.id}
+            missing = [r["sku"] for r in batch if r["sku"] not in by_sku]
+            if missing:
+                for r in db.execute(_existing_ids_stmt(missing)):
+                    by_sku[r.sku] = {"status": "unchanged", "id": r.id}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return _outcomes(items, winners, dups, by_sku)
+
+
+def bulk_patch(db: Session, items: List[ProductBulkPatchItem]) -> List[Dict[str, Any]]:
+    """Patch după SKU; SKU-urile inexistente → not_found (nu se creează nimic)."""
+    winners, dups = _dedupe_by_sku(items)
+    rows = _patch_rows([items[i] for i in winners.values()])
+    by_sku: Dict[str, Dict[str, Any]] = {}
+    try:
+        for batch in _batches(rows, BULK_BATCH_SIZE):
+            for r in db.execute(_patch_stmt(batch)):
+                by_sku[r.sku] = {"status": "updated", "id": r.id}
+            missing = [r["sku"] for r in batch if r["sku"] not in by_sku]
+            if missing:
+                for r in db.execute(_existing_ids_stmt(missing)):
+                    by_sku[r.sku] = {"status": "unchanged", "id": r.id}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for sku in winners:
+        by_sku.setdefault(sku, {"status": "not_found", "id": None})
+    return _outcomes(items, winners, dups, by_sku)
+
+
+async def abulk_upsert(db: AsyncSession, items: List[ProductBulkItem]) -> List[Dict[str, Any]]:
+    """Varianta async a bulk_upsert."""
+    winners, dups = _dedupe_by_sku(items)
+    rows = [items[i].model_dump(include={"name", "description", "price", "sku"}) for i in winners.values()]
+    by_sku: Dict[str, Dict[str, Any]] = {}
+    try:
+        for batch in _batches(rows, BULK_BATCH_SIZE):
+            for r in await db.execute(_upsert_stmt(batch)):
+                by_sku[r.sku] = {"status": "created" if r.inserted else "updated", "id": r.id}
+            missing = [r["sku"] for r in batch if r["sku"] not in by_sku]
+            if missing:
+                for r in await db.execute(_existing_ids_stmt(missing)):
+                    by_sku[r.sku] = {"status": "unchanged", "id": r.id}
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return _outcomes(items, winners, dups, by_sku)
+
+
+async def abulk_patch(db: AsyncSession, items: List[ProductBulkPatchItem]) -> List[Dict[str, Any]]:
+    """Varianta async a bulk_patch."""
+    winners, dups = _dedupe_by_sku(items)
+    rows = _patch_rows([items[i] for i in winners.values()])
+    by_sku: Dict[str, Dict[str, Any]] = {}
+    try:
+        for batch in _batches(rows, BULK_BATCH_SIZE):
+            for r in await db.execute(_patch_stmt(batch)):
+                by_sku[r.sku] = {"status": "updated", "id": r.id}
+            missing = [r["sku"] for r in batch if r["sku"] not in by_sku]
+            if missing:
+                for r in await db.execute(_existing_ids_stmt(missing)):
+                    by_sku[r.sku] = {"status": "unchanged", "id": r.id}
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    for sku in winners:
+        by_sku.setdefault(sku, {"status": "not_found", "id": None})
+    return _outcomes(items, winners, dups, by_sku)
@@ -0,0 +1,136 @@
+# app/crud/totals.py
+"""
+Totaluri pentru listări paginate, în mai multe moduri (parametrul `total_mode`):
+
+- exact         → SELECT count(*) pe setul filtrat (comportamentul istoric);
+- estimate      → fără filtre: pg_class.reltuples; cu filtre: estimarea planner-ului
+                  ("Plan Rows" din EXPLAIN (FORMAT JSON)) – nu execută interogarea;
+- none          → nu calculează totalul (doar pagina);
+- exact-capped  → numără cel mult LIST_TOTAL_CAP rânduri; peste prag raportează "N+".
+
+Rezultatul (`Total`) știe să-și formateze header-ul X-Total-Count; modul care a
+produs numărul merge în X-Total-Count-Mode.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Literal, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Select, Table, func, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+TotalMode = Literal["exact", "estimate", "none", "exact-capped"]
+TOTAL_MODES: Tuple[str, ...] = ("exact", "estimate", "none", "exact-capped")
+
+TOTAL_MODE_DEFAULT: TotalMode = os.getenv("LIST_TOTAL_MODE", "exact")  # type: ignore[assignment]
+if TOTAL_MODE_DEFAULT not in TOTAL_MODES:
+    TOTAL_MODE_DEFAULT = "exact"
+TOTAL_CAP = int(os.getenv("LIST_TOTAL_CAP", "10000"))
+
+# reltuples = -1 pentru tabele neanalizate încă (PG14+) → cădem pe estimarea din plan
+_RELTUPLES_SQL = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:rel)")
+
+
+class Total(NamedTuple):
+    value: Optional[int]
+    mode: str
+    capped: bool = False
+
+    def header(self) -> Optional[str]:
+        """Valoarea pentru X-Total-Count (None → header-ul nu se trimite)."""
+        if self.value is None:
+            return None
+        return f"{self.value}+" if self.capped else str(self.value)
+
+    def apply(self, response: Any) -> None:
+        h = self.header()
+        if h is not None:
+            response.headers["X-Total-Count"] = h
+        response.headers["X-Total-Count-Mode"] = self.mode
+
+
+def _capped_stmt(rows: Select, cap: int) -> Select:
+    inner = rows.with_only_columns(literal_column("1"), maintain_column_froms=True).order_by(None).limit(cap + 1)
+    return select(func.count()).select_from(inner.subquery())
+
+
+def _explain(rows: Select, dialect) -> Tuple[str, Any]:
+    """EXPLAIN (FORMAT JSON) pentru `rows`, cu parametrii în stilul driver-ului."""
+    compiled = rows.order_by(None).compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    sql = "EXPLAIN (FORMAT JSON) " + str(compiled)
+    if compiled.positional:
+        params: Any = tuple(compiled.params[k] for k in compiled.positiontup or ())
+    else:
+        params = compiled.params
+    return sql, params
+
+
+def _plan_rows(raw: Any) -> int:
+    plan = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _from_reltuples(value: Any) -> Optional[int]:
+    if value is None or int(value) < 0:
+        return None
+    return int(value)
+
+
+def resolve_total(
+    db: Session,
+    *,
+    mode: TotalMode,
+    exact_stmt: Select,
+    rows_stmt: Select,
+    table: Optional[Table] = None,
+    cap: int = TOTAL_CAP,
+) -> Total:
+    """
+    `exact_stmt` = count-ul exact existent; `rows_stmt` = SELECT-ul filtrat (fără paginare);
+    `table` = tabelul de bază când nu există filtre (estimare din pg_class).
+    """
+    if mode == "none":
+        return Total(None, mode)
+    if mode == "exact-capped":
+        n = int(db.scalar(_capped_stmt(rows_stmt, cap)) or 0)
+        return Total(min(n, cap), mode, capped=n > cap)
+    if mode == "estimate":
+        if table is not None:
+            est = _from_reltuples(db.scalar(_RELTUPLES_SQL, {"rel": table.fullname}))
+            if est is not None:
+                return Total(est, mode)
+        conn = db.connection()
+        sql, params = _explain(rows_stmt, conn.dialect)
+        return Total(_plan_rows(conn.exec_driver_sql(sql, params).scalar()), mode)
+    return Total(int(db.scalar(exact_stmt) or 0), "exact")
+
+
+async def aresolve_total(
+    db: AsyncSession,
+    *,
+    mode: TotalMode,
+    exact_stmt: Select,
+    rows_stmt: Select,
+    table: Optional[Table] = None,
+    cap: int = TOTAL_CAP,
+) -> Total:
+    """Varianta async a resolve_total."""
+    if mode == "none":
+        return Total(None, mode)
+    if mode == "exact-capped":
+        n = int(await db.scalar(_capped_stmt(rows_stmt, cap)) or 0)
+        return Total(min(n, cap), mode, capped=n > cap)
+    if mode == "estimate":
+        if table is not None:
+            est = _from_reltuples(await db.scalar(_RELTUPLES_SQL, {"rel": table.fullname}))
+            if est is not None:
+                return Total(est, mode)
+        conn = await db.connection()
+        sql, params = _explain(rows_stmt, conn.dialect)
+        return Total(_plan_rows((await conn.exec_driver_sql(sql, params)).scalar()), mode)
+    return Total(int(await db.scalar(exact_stmt) or 0), "exact")
+
+
+__all__ = ["TotalMode", "TOTAL_MODES", "TOTAL_MODE_DEFAULT", "TOTAL_CAP", "Total", "resolve_total", "aresolve_total"]
@@ -3,13 +3,19 @@ from __future__ import annotations
 
 import os
 from contextlib import contextmanager
-from typing import Generator, List
+from typing import TYPE_CHECKING, AsyncGenerator, Generator, List, Optional
 
 from dotenv import load_dotenv
+from fastapi import Request
 from sqlalchemy import MetaData, create_engine, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
-from sqlalchemy.pool import NullPool, StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, StaticPool
+
+from app.core import plan_capture, pool_metrics, request_metrics, session_stats
+
+if TYPE_CHECKING:  # importurile async sunt lazy (aiosqlite/psycopg async pot lipsi)
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
 # Încarcă variabilele din .env (pe host). În Docker vin din env_file/environment.
 load_dotenv()
@@ -92,6 +98,33 @@ USE_NULLPOOL = _env_bool("DB_USE_NULLPOOL", False)
 # Dezactivează pre_ping dacă e nevoie (ex. anumite setup-uri pgbouncer)
 DISABLE_PRE_PING = _env_bool("DB_DISABLE_PRE_PING", False)
 
+# Prepared statements (doar psycopg 3): sigure și prin pgbouncer >= 1.21 în transaction mode
+# dacă pgbouncer are max_prepared_statements > 0 (prepare la nivel de protocol, nu PREPARE SQL).
+#   DB_PREPARE_THRESHOLD: după câte execuții o interogare devine prepared; "0" = imediat,
+#                         "off"/"none" = niciodată (psycopg default = 5)
+#   DB_ASYNC_PREPARE_THRESHOLD: override pentru engine-ul async (implicit = valoarea sync)
+#   DB_PREPARED_MAX: câte statements prepared ține fiecare conexiune (LRU în psycopg, default 100)
+# Cache-ul SQLAlchemy de SQL compilat (per engine): DB_QUERY_CACHE_SIZE (default 500)
+def _env_prepare_threshold(key: str, default: str = "") -> "int | None | str":
+    raw = (os.getenv(key, default) or "").strip().lower()
+    if raw == "":
+        return ""  # neschimbat (psycopg default)
+    if raw in {"off", "none", "null", "-1"}:
+        return None
+    return int(raw)
+
+PREPARE_THRESHOLD = _env_prepare_threshold("DB_PREPARE_THRESHOLD")
+ASYNC_PREPARE_THRESHOLD = (
+    _env_prepare_threshold("DB_ASYNC_PREPARE_THRESHOLD")
+    if os.getenv("DB_ASYNC_PREPARE_THRESHOLD") is not None
+    else PREPARE_THRESHOLD
+)
+PREPARED_MAX = int(os.getenv("DB_PREPARED_MAX", "0") or 0)  # 0 = neschimbat
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+# Instrumentare pool (checkout wait, timeouts, conexiuni ținute mult) → /observability/v2/pool
+POOL_METRICS = _env_bool("DB_POOL_METRICS", True)
+
 # Creează schema la pornire, dacă lipsește (util în dev/CI)
 CREATE_SCHEMA_IF_MISSING = _env_bool("DB_CREATE_SCHEMA_IF_MISSING", False)
 
@@ -112,11 +145,18 @@ Base = declarative_base(metadata=metadata)  # schema implicită pentru toate mod
 # -----------------------------
 # Engine factory
 # -----------------------------
-def _build_engine_kwargs() -> dict:
+def _is_psycopg3(url: str) -> bool:
+    return url.split("://", 1)[0] == "postgresql+psycopg"
+
+def _pool_metrics_name(name: str, is_async: bool) -> str:
+    return f"{name}-async" if is_async else name
+
+def _build_engine_kwargs(url: str = DATABASE_URL, *, is_async: bool = False, pool_name: str = "primary") -> dict:
     kwargs: dict = {
         "echo": ECHO_SQL,
         "pool_pre_ping": not DISABLE_PRE_PING,
         "pool_use_lifo": POOL_USE_LIFO,
+        "query_cache_size": QUERY_CACHE_SIZE,
     }
 
     if DATABASE_URL.startswith("sqlite"):
@@ -141,6 +181,11 @@ def _build_engine_kwargs() -> dict:
                     "pool_timeout": POOL_TIMEOUT,
                 }
             )
+            if POOL_METRICS:
+                base = AsyncAdaptedQueuePool if is_async else QueuePool
+                kwargs["poolclass"] = pool_metrics.instrumented_pool_class(
+                    _pool_metrics_name(pool_name, is_async), base
+                )
 
         # ---- Postgres: libpq options (NU ca statements) ----
         pg_options = []
@@ -165,9 +210,41 @@ def _build_engine_kwargs() -> dict:
             # atât psycopg2 cât și psycopg3 acceptă application_name în conninfo
             kwargs["connect_args"]["application_name"] = PG_APP_NAME
 
+        # psycopg 3: pragul de prepare e argument de conexiune (per engine)
+        threshold = ASYNC_PREPARE_THRESHOLD if is_async else PREPARE_THRESHOLD
+        if _is_psycopg3(url) and threshold != "":
+            kwargs.setdefault("connect_args", {})["prepare_threshold"] = threshold
+
     return kwargs
 
+def _install_prepared_max(eng: Engine) -> None:
+    """prepared_max e atribut de conexiune în psycopg 3 → îl setăm la fiecare conexiune nouă."""
+    if not PREPARED_MAX or not _is_psycopg3(eng.url.drivername + "://"):
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(eng, "connect")
+    def _set_prepared_max(dbapi_conn, _record):  # pragma: no cover - depinde de driver
+        raw = getattr(dbapi_conn, "driver_connection", dbapi_conn)  # async: AdaptedConnection
+        try:
+            raw.prepared_max = PREPARED_MAX
+        except Exception:
+            pass
+
+def _instrument(eng: Engine, pool_name: str, *, is_async: bool = False) -> None:
+    """
+    Leagă event-urile checkout/checkin de metrici (doar pentru pool-urile instrumentate)
+    și contoarele de interogări per request (Server-Timing `db`); opțional, captura
+    de planuri pentru interogările lente (QUERY_PLAN_CAPTURE).
+    """
+    if POOL_METRICS and hasattr(eng.pool, "_metrics"):
+        pool_metrics.attach(eng, _pool_metrics_name(pool_name, is_async))
+    request_metrics.attach(eng)
+    plan_capture.attach(eng)
+
 engine: Engine = create_engine(DATABASE_URL, **_build_engine_kwargs())
+_install_prepared_max(engine)
+_instrument(engine, "primary")
 
 # -----------------------------
 # Session factory
@@ -175,10 +252,13 @@ engine: Engine = create_engine(DATABASE_URL, **_build_engine_kwargs())
 # expire_on_commit=False → obiectele rămân utilizabile după commit (evită re-load imediat)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
 
-def get_db() -> Generator[Session, None, None]:
+def get_db(request: Request) -> Generator[Session, None, None]:
     """
     FastAPI dependency pentru o sesiune SQLAlchemy închisă garantat.
     Face rollback automat dacă apare o excepție în request handler.
+
+    Conexiunea din pool se ia abia la primul query; sesiunile nefolosite se închid
+    fără rollback (nicio tranzacție pornită) și sunt contorizate în session_stats.
     """
     db: Session = SessionLocal()
     try:
@@ -186,11 +266,89 @@ def get_db() -> Generator[Session, None, None]:
         # commit-ul e responsabilitatea endpoint-ului/serviciului;
         # dacă vrei auto-commit la finalul fiecărui request, îl poți face aici.
     except Exception:
-        db.rollback()
+        if db.in_transaction():
+            db.rollback()
         raise
     finally:
+        session_stats.record(session_stats.route_label(request), session_stats.was_used(db))
         db.close()
 
+# -----------------------------
+# Async engine (lazy) – același DSN, pool și search_path ca engine-ul sync
+# -----------------------------
+def _to_async_url(url: str) -> str:
+    """
+    Mapează DSN-ul sync pe driverul async echivalent:
+      postgresql:// | postgresql+psycopg2://  -> postgresql+psycopg://  (psycopg 3)
+      sqlite://                               -> sqlite+aiosqlite://
+    DSN-urile deja async (psycopg, asyncpg, aiosqlite) rămân neschimbate.
+    """
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return url
+    if scheme in {"postgresql", "postgres", "postgresql+psycopg2"}:
+        return f"postgresql+psycopg://{rest}"
+    if scheme in {"sqlite", "sqlite+pysqlite"}:
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+# Override explicit (ex. postgresql+asyncpg://...) dacă e nevoie
+DATABASE_ASYNC_URL = (os.getenv("DATABASE_ASYNC_URL") or "").strip() or _to_async_url(DATABASE_URL)
+
+_async_engine: Optional["AsyncEngine"] = None
+_async_sessionmaker: Optional["async_sessionmaker[AsyncSession]"] = None
+
+def get_async_engine() -> "AsyncEngine":
+    """Creează (o singură dată) engine-ul async. Lazy → import-ul modulului nu cere driver async."""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        kwargs = _build_engine_kwargs(DATABASE_ASYNC_URL, is_async=True)
+        # engine-ul async alege singur AsyncAdaptedQueuePool; NullPool/StaticPool rămân valabile
+        _async_engine = create_async_engine(DATABASE_ASYNC_URL, **kwargs)
+        _install_prepared_max(_async_engine.sync_engine)
+        _instrument(_async_engine.sync_engine, "primary", is_async=True)
+    return _async_engine
+
+def get_async_sessionmaker() -> "async_sessionmaker[AsyncSession]":
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_sessionmaker = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmaker
+
+def AsyncSessionLocal() -> "AsyncSession":
+    """Echivalentul async al SessionLocal()."""
+    return get_async_sessionmaker()()
+
+async def get_async_db(request: Request) -> AsyncGenerator["AsyncSession", None]:
+    """
+    FastAPI dependency async (rute `async def`): nu ocupă threadpool-ul Starlette.
+    Aceleași reguli ca get_db: rollback la excepție, close garantat.
+    """
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    except Exception:
+        if db.in_transaction():
+            await db.rollback()
+        raise
+    finally:
+        session_stats.record(session_stats.route_label(request), session_stats.was_used(db))
+        await db.close()
+
+async def dispose_async_engine() -> None:
+    """Apelat la shutdown (lifespan) ca să închidă conexiunile async din pool."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
+
 @contextmanager
 def session_scope() -> Generator[Session, None, None]:
     """
@@ -233,6 +391,10 @@ __all__ = [
     "SessionLocal",
     "Base",
     "get_db",
+    "get_async_engine",
+    "AsyncSessionLocal",
+    "get_async_db",
+    "dispose_async_engine",
     "session_scope",
     "init_db_if_requested",
 ]
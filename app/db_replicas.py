@@ -0,0 +1,222 @@
+# app/db_replicas.py
+"""
+Rutare read-only către replici Postgres (opțional).
+
+DATABASE_REPLICA_URLS="postgresql+psycopg://u:p@replica1/appdb,postgresql+psycopg://u:p@replica2/appdb"
+(sau DATABASE_REPLICA_URL pentru o singură replică)
+
+- round-robin între replici;
+- fiecare replică are un probe de lag (cache-uit DB_REPLICA_LAG_CHECK_S secunde);
+  replicile cu lag > DB_REPLICA_MAX_LAG_S sau indisponibile sunt sărite;
+- dacă nicio replică nu e utilizabilă → primary (SessionLocal / AsyncSessionLocal);
+- nodul folosit ajunge în request.state.db_node → header X-DB-Node (middleware).
+
+Fără replici configurate, get_read_db / get_async_read_db se comportă ca get_db / get_async_db.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncGenerator, Generator, List, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import session_stats
+from app.database import (
+    AsyncSessionLocal,
+    SessionLocal,
+    _build_engine_kwargs,
+    _install_prepared_max,
+    _instrument,
+    _to_async_url,
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+logger = logging.getLogger("emag-db-api.db")
+
+PRIMARY_NODE = "primary"
+
+_raw_urls = os.getenv("DATABASE_REPLICA_URLS") or os.getenv("DATABASE_REPLICA_URL") or ""
+REPLICA_URLS: List[str] = [u.strip() for u in _raw_urls.split(",") if u.strip()]
+MAX_LAG_S = float(os.getenv("DB_REPLICA_MAX_LAG_S", "5"))
+LAG_CHECK_S = float(os.getenv("DB_REPLICA_LAG_CHECK_S", "2"))
+
+# Lag 0 dacă replica a aplicat tot ce a primit (altfel un primary idle ar părea „în urmă”)
+_LAG_SQL = text(
+    """
+    SELECT CASE
+             WHEN NOT pg_is_in_recovery() THEN 0
+             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+    """
+)
+
+
+class ReplicaNode:
+    def __init__(self, url: str, index: int):
+        u = make_url(url)
+        self.name = f"replica{index}:{u.host or 'local'}"
+        self.url = url
+        self.pool_name = f"replica{index}"
+        self.engine: Engine = create_engine(url, **_build_engine_kwargs(url, pool_name=self.pool_name))
+        _install_prepared_max(self.engine)
+        _instrument(self.engine, self.pool_name)
+        self.session_factory = sessionmaker(
+            bind=self.engine, autocommit=False, autoflush=False, expire_on_commit=False
+        )
+        self._async_engine: Optional["AsyncEngine"] = None
+        self._async_factory = None
+        self._lock = threading.Lock()
+        self.lag_s: Optional[float] = None
+        self.checked_at = 0.0
+        self.last_error: Optional[str] = None
+
+    # ---- lag probe (cache-uit) ----
+    def _stale(self) -> bool:
+        return time.monotonic() - self.checked_at >= LAG_CHECK_S
+
+    def _record(self, lag: Optional[float], err: Optional[str]) -> None:
+        self.lag_s, self.last_error, self.checked_at = lag, err, time.monotonic()
+        if err:
+            logger.warning("Replica %s indisponibilă: %s", self.name, err)
+
+    def usable(self) -> bool:
+        if self._stale() and self._lock.acquire(blocking=False):
+            try:
+                with self.engine.connect() as conn:
+                    self._record(float(conn.execute(_LAG_SQL).scalar() or 0), None)
+            except Exception as e:
+                self._record(None, str(e))
+            finally:
+                self._lock.release()
+        return self.lag_s is not None and self.lag_s <= MAX_LAG_S
+
+    async def ausable(self) -> bool:
+        if self._stale() and self._lock.acquire(blocking=False):
+            try:
+                async with self.get_async_engine().connect() as conn:
+                    self._record(float((await conn.execute(_LAG_SQL)).scalar() or 0), None)
+            except Exception as e:
+                self._record(None, str(e))
+            finally:
+                self._lock.release()
+        return self.lag_s is not None and self.lag_s <= MAX_LAG_S
+
+    # ---- async (lazy, ca engine-ul async principal) ----
+    def get_async_engine(self) -> "AsyncEngine":
+        if self._async_engine is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+            aurl = _to_async_url(self.url)
+            self._async_engine = create_async_engine(
+                aurl, **_build_engine_kwargs(aurl, is_async=True, pool_name=self.pool_name)
+            )
+            _install_prepared_max(self._async_engine.sync_engine)
+            _instrument(self._async_engine.sync_engine, self.pool_name, is_async=True)
+            self._async_factory = async_sessionmaker(
+                bind=self._async_engine, autoflush=False, expire_on_commit=False
+            )
+        return self._async_engine
+
+    def async_session(self) -> "AsyncSession":
+        self.get_async_engine()
+        return self._async_factory()  # type: ignore[misc]
+
+    def status(self) -> dict:
+        return {
+            "node": self.name,
+            "lag_s": self.lag_s,
+            "usable": self.lag_s is not None and self.lag_s <= MAX_LAG_S,
+            "checked_ago_s": round(time.monotonic() - self.checked_at, 2) if self.checked_at else None,
+            "last_error": self.last_error,
+        }
+
+
+REPLICAS: List[ReplicaNode] = [ReplicaNode(u, i + 1) for i, u in enumerate(REPLICA_URLS)]
+_rr = itertools.count()
+
+
+def _candidates() -> List[ReplicaNode]:
+    """Replicile în ordinea round-robin pentru request-ul curent."""
+    if not REPLICAS:
+        return []
+    start = next(_rr) % len(REPLICAS)
+    return REPLICAS[start:] + REPLICAS[:start]
+
+
+def pick_replica() -> Optional[ReplicaNode]:
+    for node in _candidates():
+        if node.usable():
+            return node
+    return None
+
+
+async def apick_replica() -> Optional[ReplicaNode]:
+    for node in _candidates():
+        if await node.ausable():
+            return node
+    return None
+
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """Dependency sync read-only: replică cu lag acceptabil sau primary."""
+    node = pick_replica()
+    request.state.db_node = node.name if node else PRIMARY_NODE
+    db: Session = node.session_factory() if node else SessionLocal()
+    try:
+        yield db
+    except Exception:
+        if db.in_transaction():
+            db.rollback()
+        raise
+    finally:
+        session_stats.record(session_stats.route_label(request), session_stats.was_used(db))
+        db.close()
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator["AsyncSession", None]:
+    """Dependency async read-only: replică cu lag acceptabil sau primary."""
+    node = await apick_replica()
+    request.state.db_node = node.name if node else PRIMARY_NODE
+    request.state.db_replica = node  # reutilizat de exporturile streamed (sesiune sync proprie)
+    db = node.async_session() if node else AsyncSessionLocal()
+    try:
+        yield db
+    except Exception:
+        if db.in_transaction():
+            await db.rollback()
+        raise
+    finally:
+        session_stats.record(session_stats.route_label(request), session_stats.was_used(db))
+        await db.close()
+
+
+def replicas_status() -> List[dict]:
+    return [n.status() for n in REPLICAS]
+
+
+async def dispose_replicas() -> None:
+    for n in REPLICAS:
+        n.engine.dispose()
+        if n._async_engine is not None:
+            await n._async_engine.dispose()
+
+
+__all__ = [
+    "PRIMARY_NODE",
+    "REPLICAS",
+    "get_read_db",
+    "get_async_read_db",
+    "pick_replica",
+    "replicas_status",
+    "dispose_replicas",
+]
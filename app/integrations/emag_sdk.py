@@ -7,9 +7,10 @@ import os
 import time
 import hashlib
 import logging
+import re
 from collections import deque
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple, Callable, Awaitable, List
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Callable, Awaitable, List
 
 import httpx
 from tenacity import (
@@ -20,6 +21,8 @@ from tenacity import (
     before_sleep_log,
 )
 
+from app.core import request_metrics
+
 # =========================
 # Config & constante
 # =========================
@@ -48,6 +51,10 @@ EMAG_HTTP_LOG = os.getenv("EMAG_HTTP_LOG", "").strip().lower() in {"1", "true",
 # NOTE: ținem logurile concise (nu logăm body-uri complete în mod implicit)
 logger_http = logging.getLogger("emag-db-api.emag_http")
 
+# Passthrough: câți octeți din începutul body-ului inspectăm pentru `"isError": true`
+RAW_ERROR_SNIFF_BYTES = int(os.getenv("EMAG_RAW_ERROR_SNIFF_BYTES", "1024"))
+_RAW_IS_ERROR_RX = re.compile(rb'"isError"\s*:\s*true')
+
 # =========================
 # Erori specifice
 # =========================
@@ -87,6 +94,32 @@ class EmagConfig:
     orders_rps: int = DEFAULT_ORDERS_RPS
     default_rps: int = DEFAULT_OTHER_RPS
 
+@dataclass
+class EmagRawStream:
+    """
+    Răspuns upstream ne-parsat (passthrough). Body-ul e citit incremental:
+    `head` e deja consumat (folosit la detecția erorilor), restul vine din `aiter()`.
+    Apelantul TREBUIE să cheme `aclose()` (sau să consume complet `aiter()`).
+    """
+    status_code: int
+    content_type: str
+    head: bytes
+    _resp: httpx.Response
+    _rest: AsyncIterator[bytes]
+
+    async def aiter(self) -> AsyncIterator[bytes]:
+        try:
+            if self.head:
+                yield self.head
+            async for chunk in self._rest:
+                if chunk:
+                    yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._resp.aclose()
+
 # =========================
 # Limiter per secundă
 # =========================
@@ -292,6 +325,8 @@ class EmagClient:
         resp = await fn(*args, **kwargs)
         # 429 -> ridică EmagRateLimitError (tenacity va reîncerca)
         if resp.status_code == 429:
+            # eliberează conexiunea (relevant pentru răspunsurile cu stream=True)
+            await resp.aclose()
             retry_after = resp.headers.get("Retry-After")
             if retry_after:
                 try:
@@ -308,6 +343,7 @@ class EmagClient:
             return resp
         # 5xx -> httpx.raise_for_status() ridică HTTPStatusError (retry)
         if 500 <= resp.status_code:
+            await resp.aclose()
             resp.raise_for_status()
         return resp
 
@@ -346,6 +382,7 @@ class EmagClient:
 
         resp = await self._req_with_retry(self._client.post, url, json=data, headers=headers)
         elapsed_ms = (time.perf_counter() - started) * 1000.0
+        request_metrics.add_emag(elapsed_ms)
 
         if EMAG_HTTP_LOG:
             ra = resp.headers.get("Retry-After")
@@ -383,6 +420,86 @@ class EmagClient:
             payload=_extract_error_details(payload),
         )
 
+    async def _post_stream(
+        self,
+        resource: str,
+        action: str,
+        data: dict,
+        *,
+        idempotency_key: Optional[str] = None,
+    ) -> EmagRawStream:
+        """
+        Variantă passthrough pentru `_post`: NU parsează JSON-ul de succes.
+        - aceleași limiter/retry/headers ca `_post`;
+        - erorile (4xx sau `isError: true` în primii octeți) sunt parsate și ridicate ca EmagApiError;
+        - la succes întoarce un EmagRawStream (body-ul rămâne în socket până e consumat).
+        """
+        group = self._group_for(resource)
+        await self._limiter.acquire(group)
+
+        url = f"{resource.strip('/')}/{action.strip('/')}"
+        req_id = os.urandom(12).hex()
+        headers: Dict[str, str] = {"X-Request-Id": req_id}
+        if idempotency_key:
+            headers["X-Idempotency-Key"] = idempotency_key
+
+        async def _send() -> httpx.Response:
+            req = self._client.build_request("POST", url, json=data, headers=headers)
+            return await self._client.send(req, stream=True)
+
+        started = time.perf_counter()
+        resp = await self._req_with_retry(_send)
+        # doar până la header-e; body-ul e consumat ulterior de apelant
+        request_metrics.add_emag((time.perf_counter() - started) * 1000.0)
+        if EMAG_HTTP_LOG:
+            logger_http.info(
+                "POST %s (raw) -> %s in %.1fms (cli_rid=%s)",
+                url, resp.status_code, (time.perf_counter() - started) * 1000.0, req_id,
+            )
+
+        if resp.status_code == 204:
+            await resp.aclose()
+            raise EmagApiError(f"eMAG API returned no content on {resource}/{action}", status_code=204)
+
+        if 400 <= resp.status_code < 500:
+            await resp.aread()
+            await resp.aclose()
+            raise EmagApiError(
+                f"eMAG API client error {resp.status_code} on {resource}/{action}",
+                status_code=resp.status_code,
+                payload=_extract_error_details(_safe_json(resp)),
+            )
+
+        # citim doar începutul body-ului; `isError` e (în practică) prima cheie din payload
+        rest = resp.aiter_bytes()
+        head = b""
+        try:
+            while len(head) < RAW_ERROR_SNIFF_BYTES:
+                head += await rest.__anext__()
+        except StopAsyncIteration:
+            pass
+
+        if _RAW_IS_ERROR_RX.search(head[:RAW_ERROR_SNIFF_BYTES]):
+            body = head + b"".join([c async for c in rest])
+            await resp.aclose()
+            try:
+                payload = json.loads(body)
+            except Exception:
+                payload = {"raw": body[:2000].decode("utf-8", "replace")}
+            raise EmagApiError(
+                f"eMAG API error on {resource}/{action}",
+                status_code=resp.status_code,
+                payload=_extract_error_details(payload),
+            )
+
+        return EmagRawStream(
+            status_code=resp.status_code,
+            content_type=resp.headers.get("Content-Type", "application/json"),
+            head=head,
+            _resp=resp,
+            _rest=rest,
+        )
+
     # ====== API helpers uzuale ======
 
     async def category_read(
@@ -434,6 +551,33 @@ class EmagClient:
         # idempotency e rar necesar pe read, dar acceptăm pentru simetrie
         return await self._post("product_offer", "read", data, idempotency_key=idempotency_key)
 
+    async def product_offer_read_raw(
+        self,
+        *,
+        page: int = 1,
+        limit: int = 100,
+        status: Optional[int] = None,
+        sku: Optional[str] = None,
+        ean: Optional[str] = None,
+        part_number_key: Optional[str] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> EmagRawStream:
+        """
+        Ca `product_offer_read`, dar întoarce octeții upstream ne-parsați (passthrough).
+        """
+        data: Dict[str, Any] = {"page": page, "limit": limit}
+        if status is not None:
+            data["status"] = status
+        if sku:
+            data["sku"] = sku
+        if ean:
+            data["ean"] = ean
+        if part_number_key:
+            data["part_number_key"] = part_number_key
+        if extra:
+            data.update(extra)
+        return await self._post_stream("product_offer", "read", data)
+
     async def offer_stock_update(
         self,
         *,
@@ -11,7 +11,6 @@ from typing import Sequence, cast, List, Tuple, Optional
 
 from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from starlette.middleware.trustedhost import TrustedHostMiddleware
@@ -23,7 +22,11 @@ from sqlalchemy.orm import Session
 from alembic.config import Config as AlembicConfig
 from alembic.script import ScriptDirectory
 
+from app.core import request_metrics, session_stats
+from app.core.compression import CompressionMiddleware
+from app.core.pool_metrics import reset_current_route, set_current_route
 from app.database import get_db, SessionLocal
+from app.db_replicas import get_read_db
 from app.routers.product import router as products_router           # required
 from app.routers.category import router as categories_router        # required
 
@@ -168,7 +171,16 @@ async def request_context_mw(request: Request, call_next):
                 )
 
     start = time.perf_counter()
-    response: Response = await call_next(request)
+    # ruta curentă pentru atribuirea conexiunilor din pool (leak detection)
+    route_token = set_current_route(f"{request.method} {request.url.path}")
+    # contoare db/emag/ser pentru Server-Timing (obiectul e partajat cu task-ul rutei)
+    metrics_token = request_metrics.start(request)
+    metrics = request_metrics.current()
+    try:
+        response: Response = await call_next(request)
+    finally:
+        request_metrics.reset(metrics_token)
+        reset_current_route(route_token)
     duration_ms = (time.perf_counter() - start) * 1000
 
     # Security + perf headers
@@ -183,8 +195,16 @@ async def request_context_mw(request: Request, call_next):
     if ENABLE_HSTS:
         response.headers.setdefault("Strict-Transport-Security", "max-age=31536000; includeSubDomains; preload")
 
-    response.headers.setdefault("Server-Timing", f"app;dur={duration_ms:.1f}")
+    server_timing = f"app;dur={duration_ms:.1f}"
+    if metrics is not None:
+        server_timing = f"{server_timing}, {metrics.server_timing()}"
+        request_metrics.check_budget(metrics, session_stats.route_label(request), req_id)
+    response.headers.setdefault("Server-Timing", server_timing)
     response.headers.setdefault("X-Process-Time", f"{duration_ms:.1f}ms")
+    # nodul DB (primary / replicaN) care a servit request-ul, setat de get_read_db
+    db_node = getattr(request.state, "db_node", None)
+    if db_node:
+        response.headers.setdefault("X-DB-Node", db_node)
     return response
 
 @asynccontextmanager
@@ -233,6 +253,19 @@ async def lifespan(app: FastAPI):
     except Exception as e:  # pragma: no cover
         logger.warning("While closing Emag clients on shutdown: %s", e)
 
+    # Shutdown: pool-ul engine-ului async (dacă a fost creat)
+    try:
+        from app.database import dispose_async_engine  # import lazy
+        await dispose_async_engine()
+    except Exception as e:  # pragma: no cover
+        logger.warning("While disposing async DB engine on shutdown: %s", e)
+
+    try:
+        from app.db_replicas import dispose_replicas  # import lazy
+        await dispose_replicas()
+    except Exception as e:  # pragma: no cover
+        logger.warning("While disposing replica engines on shutdown: %s", e)
+
 # --- App factory (create app BEFORE registering middleware) ---
 app = FastAPI(
     title=APP_TITLE,
@@ -243,11 +276,15 @@ app = FastAPI(
     docs_url=DOCS_URL,
     redoc_url=REDOC_URL,
     openapi_url=OPENAPI_URL,
+    default_response_class=request_metrics.TimedJSONResponse,
 )
+# `ser` din Server-Timing include și validarea/dump-ul response_model (serialize_response)
+request_metrics.instrument_serialization()
 
 # Register middleware now that app exists
 app.middleware("http")(request_context_mw)
-app.add_middleware(GZipMiddleware, minimum_size=1024)
+# zstd / br / gzip negociat după Accept-Encoding, streamed (flush la COMPRESSION_FLUSH_BYTES)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
 
 # Trusted hosts (opțional): TRUSTED_HOSTS="localhost,127.0.0.1,.example.com"
 _trusted = [h.strip() for h in os.getenv("TRUSTED_HOSTS", "").split(",") if h.strip()]
@@ -266,11 +303,13 @@ if _cors:
         allow_headers=["*"],
         expose_headers=[
             "X-Total-Count",
+            "X-Total-Count-Mode",
             "X-Request-ID",
             "Server-Timing",
             "X-Process-Time",
             "Content-Disposition",  # pt. download CSV/NDJSON
             "X-App-Version",
+            "X-DB-Node",
         ],
     )
 
@@ -486,14 +525,14 @@ def health_ready(db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Not ready")
 
 @app.get("/health/pg", tags=["health"])
-def health_pg(db: Session = Depends(get_db)):
+def health_pg(db: Session = Depends(get_read_db)):
     tz = db.execute(text("SHOW TimeZone")).scalar_one()
     sv = db.execute(text("SHOW server_version")).scalar_one()
     sp = db.execute(text("SHOW search_path")).scalar_one()
     return {"server_version": sv, "timezone": tz, "search_path": sp}
 
 @app.get("/health/extensions", tags=["health"])
-def health_extensions(db: Session = Depends(get_db)):
+def health_extensions(db: Session = Depends(get_read_db)):
     rows = db.execute(
         text("""
             SELECT e.extname, n.nspname AS schema
@@ -506,7 +545,7 @@ def health_extensions(db: Session = Depends(get_db)):
     return {"extensions": [dict(r) for r in rows]}
 
 @app.get("/health/settings", tags=["health"])
-def health_settings(db: Session = Depends(get_db)):
+def health_settings(db: Session = Depends(get_read_db)):
     """Expune rapid setările cheie pentru observability."""
     settings = {}
     for key in (
@@ -525,14 +564,14 @@ def health_settings(db: Session = Depends(get_db)):
     return {"settings": settings}
 
 @app.get("/health/schema", tags=["health"])
-def health_schema(db: Session = Depends(get_db)):
+def health_schema(db: Session = Depends(get_read_db)):
     public_has = db.execute(text("SELECT to_regclass('public.alembic_version') IS NOT NULL")).scalar_one()
     sp = db.execute(text("SHOW search_path")).scalar_one()
     ok_sp = sp.replace(" ", "").lower().startswith(f"{DB_SCHEMA},")
     return {"public_alembic_version_present": bool(public_has), "search_path": sp, "search_path_ok": ok_sp}
 
 @app.get("/health/version", tags=["health"])
-def health_version(db: Session = Depends(get_db)):
+def health_version(db: Session = Depends(get_read_db)):
     v, present = _get_db_alembic_version(db)
     payload = {"app_version": APP_VERSION, "db_alembic_version": v, "version_table_present": present}
     if BUILD_SHA:
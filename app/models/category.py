@@ -1,7 +1,7 @@
 # app/models/category.py
 from __future__ import annotations
 
-from sqlalchemy import ForeignKey, Index, String, Integer, func, text
+from sqlalchemy import ForeignKey, Index, String, Integer, SmallInteger, func, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -12,23 +12,51 @@ class Category(Base):
     Tabelul 'app.categories'.
     - Unicitate case-insensitive pe nume via index funcțional (Postgres).
     - Schema 'app' setată explicit pentru stabilitatea autogenerate-ului.
+    - Ierarhie prin `parent_id`; `category_closure` (întreținut de triggere în DB) dă
+      subarborele unei categorii într-un singur join.
     """
     __tablename__ = "categories"
     __table_args__ = (
         # Unicitate case-insensitive (PG): UNIQUE ON lower(name)
         Index("ix_categories_name_lower", func.lower(text("name")), unique=True),
+        Index("ix_categories_parent_id", "parent_id"),
         {"schema": "app"},
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     description: Mapped[str | None] = mapped_column(String, nullable=True)
+    parent_id: Mapped[int | None] = mapped_column(
+        Integer,
+        ForeignKey("app.categories.id", ondelete="SET NULL"),
+        nullable=True,
+    )
 
     def __repr__(self) -> str:  # pragma: no cover
         name_preview = (self.name[:32] + "…") if self.name and len(self.name) > 33 else self.name
         return f"<Category id={self.id!r} name={name_preview!r}>"
 
 
+class CategoryClosure(Base):
+    """
+    Tabelul 'app.category_closure': toate perechile (strămoș, descendent), inclusiv (x, x, 0).
+    Read-only din aplicație – îl întrețin triggerele pe categories (insert / mutare parent_id).
+    """
+    __tablename__ = "category_closure"
+    __table_args__ = (
+        Index("ix_category_closure_descendant", "descendant_id", "ancestor_id"),
+        {"schema": "app"},
+    )
+
+    ancestor_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("app.categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    descendant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("app.categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    depth: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+
+
 class ProductCategory(Base):
     """
     Tabelul M2M 'app.product_categories' (PK compus).
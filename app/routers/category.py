@@ -1,30 +1,45 @@
 # app/routers/category.py
 from __future__ import annotations
 
+import json
+import os
 from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import SessionLocal, get_async_db
+from app.db_replicas import get_async_read_db
 from app.schemas.category import (
     CategoryCreate,
     CategoryUpdate,
     CategoryRead,
     CategoryPage,
+    CategoryTreeNode,
+    CategoryProductsPage,
+    CategoryLinksBulk,
+    CategoryProductsBulk,
+    CategoryLinksBulkResult,
 )
 from app.crud import category as crud
+from app.crud.totals import TOTAL_MODE_DEFAULT, TotalMode
 from app.crud import product as product_crud  # pentru validarea product_id
+from app.routers.product import invalidate_listing_caches  # fațetele depind de categorii/legături
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
+# Limita de perechi per request bulk attach/detach
+BULK_MAX_PAIRS = int(os.getenv("CATEGORY_BULK_MAX_PAIRS", "50000"))
+
 
 @router.get(
     "",
     response_model=CategoryPage,
     summary="List categories (filter/sort/paginate)",
 )
-def list_categories(
+async def list_categories(
     response: Response,
     name: str | None = Query(
         default=None,
@@ -39,9 +54,17 @@ def list_categories(
         False,
         description="Eager-load al relației products (selectinload)",
     ),
-    db: Session = Depends(get_db),
+    with_counts: bool = Query(
+        False,
+        description="Adaugă product_count per categorie (agregare pe pagina curentă, fără a încărca produsele)",
+    ),
+    total_mode: TotalMode = Query(
+        default=TOTAL_MODE_DEFAULT,
+        description="exact | estimate (planner / pg_class) | none | exact-capped (numără până la LIST_TOTAL_CAP, apoi „N+”)",
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    items, total = crud.list_categories(
+    items, total = await crud.alist_categories(
         db,
         name_contains=name,
         page=page,
@@ -49,10 +72,19 @@ def list_categories(
         order_by=order_by,
         order=order,
         with_products=with_products,
+        with_counts=with_counts,
+        total_mode=total_mode,
     )
     # antet util pentru UI-uri/tabele
-    response.headers["X-Total-Count"] = str(total)
-    return CategoryPage(items=items, total=total, page=page, page_size=page_size)
+    total.apply(response)
+    return CategoryPage(
+        items=items,
+        total=total.value,
+        page=page,
+        page_size=page_size,
+        total_mode=total.mode,
+        total_capped=total.capped,
+    )
 
 
 @router.get(
@@ -60,24 +92,76 @@ def list_categories(
     response_model=CategoryRead,
     summary="Get category by id",
 )
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    obj = crud.get(db, category_id, with_products=False)
+async def get_category(category_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    obj = await crud.aget(db, category_id, with_products=False)
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return obj
 
 
+@router.get(
+    "/{category_id}/descendants",
+    response_model=list[CategoryTreeNode],
+    summary="Category subtree (the category itself + all descendants, with depth)",
+)
+async def list_descendants(category_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    nodes = await crud.alist_subtree(db, category_id)
+    if not nodes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return [
+        CategoryTreeNode(**CategoryRead.model_validate(c).model_dump(), depth=depth)
+        for c, depth in nodes
+    ]
+
+
+@router.get(
+    "/{category_id}/products",
+    response_model=CategoryProductsPage,
+    summary="Products of a category (keyset pagination by id, or streamed NDJSON)",
+)
+async def list_category_products(
+    request: Request,
+    category_id: int,
+    after_id: int = Query(default=0, ge=0, description="Ultimul id din pagina anterioară"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    format: Literal["json", "ndjson"] = Query(
+        default="json", description="ndjson = toate produsele, streamed (ignoră limit)"
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if not await crud.aget(db, category_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+    if format == "ndjson":
+        replica = getattr(request.state, "db_replica", None)
+        session_factory = replica.session_factory if replica else SessionLocal
+
+        def _stream():
+            # sesiune sync proprie: dependency-ul de DB se închide înainte de body
+            with session_factory() as s:
+                for row in crud.iter_category_products(s, category_id, after_id=after_id):
+                    yield (json.dumps(jsonable_encoder(row), ensure_ascii=False) + "\n").encode("utf-8")
+
+        return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+    items = await crud.alist_category_products(db, category_id, after_id=after_id, limit=limit)
+    next_after_id = items[-1].id if len(items) == limit else None
+    return CategoryProductsPage(items=items, next_after_id=next_after_id)
+
+
 @router.post(
     "",
     response_model=CategoryRead,
     status_code=status.HTTP_201_CREATED,
     summary="Create category",
 )
-def create_category(payload: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(payload: CategoryCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        obj = crud.create(db, payload.model_dump(exclude_unset=True))
+        obj = await crud.acreate(db, payload.model_dump(exclude_unset=True))
     except crud.DuplicateCategoryNameError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except crud.CategoryParentError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     return obj
 
 
@@ -86,14 +170,17 @@ def create_category(payload: CategoryCreate, db: Session = Depends(get_db)):
     response_model=CategoryRead,
     summary="Update category",
 )
-def update_category(category_id: int, payload: CategoryUpdate, db: Session = Depends(get_db)):
-    obj = crud.get(db, category_id)
+async def update_category(category_id: int, payload: CategoryUpdate, db: AsyncSession = Depends(get_async_db)):
+    obj = await crud.aget(db, category_id)
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     try:
-        obj = crud.update(db, obj, payload.model_dump(exclude_unset=True))
+        obj = await crud.aupdate(db, obj, payload.model_dump(exclude_unset=True))
     except crud.DuplicateCategoryNameError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except crud.CategoryParentError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    invalidate_listing_caches()
     return obj
 
 
@@ -102,14 +189,81 @@ def update_category(category_id: int, payload: CategoryUpdate, db: Session = Dep
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete category",
 )
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    obj = crud.get(db, category_id)
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_async_db)):
+    obj = await crud.aget(db, category_id)
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    crud.delete(db, obj)
+    await crud.adelete(db, obj)
+    invalidate_listing_caches()
     return None
 
 
+# ---------- M2M: attach / detach în bloc (declarate înaintea rutelor single) ----------
+
+def _bulk_check_size(n: int) -> None:
+    if n > BULK_MAX_PAIRS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many pairs: {n} > {BULK_MAX_PAIRS}",
+        )
+
+
+@router.post(
+    "/products/attach",
+    response_model=CategoryLinksBulkResult,
+    response_model_exclude_none=True,
+    summary="Bulk attach (product_id, category_id) pairs (single INSERT ... ON CONFLICT DO NOTHING)",
+)
+async def bulk_attach(payload: CategoryLinksBulk, db: AsyncSession = Depends(get_async_db)):
+    _bulk_check_size(len(payload.pairs))
+    result = await crud.abulk_attach(db, [(p.product_id, p.category_id) for p in payload.pairs])
+    invalidate_listing_caches()
+    return result
+
+
+@router.post(
+    "/products/detach",
+    response_model=CategoryLinksBulkResult,
+    response_model_exclude_none=True,
+    summary="Bulk detach (product_id, category_id) pairs (single DELETE ... USING unnest)",
+)
+async def bulk_detach(payload: CategoryLinksBulk, db: AsyncSession = Depends(get_async_db)):
+    _bulk_check_size(len(payload.pairs))
+    result = await crud.abulk_detach(db, [(p.product_id, p.category_id) for p in payload.pairs])
+    invalidate_listing_caches()
+    return result
+
+
+@router.post(
+    "/{category_id}/products/attach",
+    response_model=CategoryLinksBulkResult,
+    response_model_exclude_none=True,
+    summary="Attach many products to one category",
+)
+async def bulk_attach_to_category(
+    category_id: int, payload: CategoryProductsBulk, db: AsyncSession = Depends(get_async_db)
+):
+    _bulk_check_size(len(payload.product_ids))
+    result = await crud.abulk_attach(db, [(pid, category_id) for pid in payload.product_ids])
+    invalidate_listing_caches()
+    return result
+
+
+@router.post(
+    "/{category_id}/products/detach",
+    response_model=CategoryLinksBulkResult,
+    response_model_exclude_none=True,
+    summary="Detach many products from one category",
+)
+async def bulk_detach_from_category(
+    category_id: int, payload: CategoryProductsBulk, db: AsyncSession = Depends(get_async_db)
+):
+    _bulk_check_size(len(payload.product_ids))
+    result = await crud.abulk_detach(db, [(pid, category_id) for pid in payload.product_ids])
+    invalidate_listing_caches()
+    return result
+
+
 # ---------- M2M: attach / detach ----------
 
 @router.post(
@@ -118,19 +272,20 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
     summary="Attach product to category (idempotent)",
     description="404 dacă Category sau Product nu există; 204 dacă legătura există deja sau a fost creată.",
 )
-def attach_product(category_id: int, product_id: int, db: Session = Depends(get_db)):
+async def attach_product(category_id: int, product_id: int, db: AsyncSession = Depends(get_async_db)):
     # Validăm existența entităților pentru mesaje 404 clare
-    cat = crud.get(db, category_id)
+    cat = await crud.aget(db, category_id)
     if not cat:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-    prod = product_crud.get(db, product_id)
+    prod = await product_crud.aget(db, product_id)
     if not prod:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
-    ok = crud.attach_product(db, category_id=category_id, product_id=product_id)
+    ok = await crud.aattach_product(db, category_id=category_id, product_id=product_id)
     if not ok:
         # Ar fi surprinzător aici (FK validate), dar păstrăm fallback
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Attach failed.")
+    invalidate_listing_caches()
     return None
 
 
@@ -139,9 +294,10 @@ def attach_product(category_id: int, product_id: int, db: Session = Depends(get_
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Detach product from category (idempotent)",
 )
-def detach_product(category_id: int, product_id: int, db: Session = Depends(get_db)):
+async def detach_product(category_id: int, product_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Detach idempotent: întoarce 204 chiar dacă legătura nu exista.
     """
-    crud.detach_product(db, category_id=category_id, product_id=product_id)
+    await crud.adetach_product(db, category_id=category_id, product_id=product_id)
+    invalidate_listing_caches()
     return None
@@ -18,6 +18,8 @@ from .awb import router as awb_router  # noqa: E402
 from .categories import router as categories_router  # noqa: E402
 from .characteristics import router as characteristics_router  # noqa: E402
 from .meta import router as meta_router  # noqa: E402
+from .history import router as history_router  # noqa: E402
+from .offers_import import router as offers_import_router  # noqa: E402
 
 
 def _warn_if_hardcoded_prefix(name: str, subrouter: APIRouter) -> None:
@@ -45,6 +47,8 @@ for name, sub in [
     ("categories", categories_router),
     ("characteristics", characteristics_router),
     ("meta", meta_router),
+    ("history", history_router),
+    ("offers_import", offers_import_router),
 ]:
     _warn_if_hardcoded_prefix(name, sub)
     router.include_router(sub)
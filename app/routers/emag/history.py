@@ -0,0 +1,129 @@
+# app/routers/emag/history.py
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from app.database import DEFAULT_SCHEMA, SessionLocal
+from app.services import columnar_export
+
+router = APIRouter(tags=["emag-history"])
+
+# Tabelele partiționate din migrarea a2b3c4d5e6f7 (coloane + tipuri pentru export)
+_HISTORY: Dict[str, Dict[str, Any]] = {
+    "prices": {
+        "table": "emag_offer_prices_hist",
+        "columns": {
+            "offer_id": "int",
+            "recorded_at": "timestamp",
+            "currency": "string",
+            "sale_price": "decimal(12,2)",
+        },
+        "order": "offer_id, recorded_at",
+    },
+    "stock": {
+        "table": "emag_offer_stock_hist",
+        "columns": {
+            "offer_id": "int",
+            "warehouse_code": "string",
+            "recorded_at": "timestamp",
+            "stock": "int",
+            "reserved": "int",
+            "incoming": "int",
+        },
+        "order": "offer_id, warehouse_code, recorded_at",
+    },
+}
+
+STREAM_BATCH = 5000
+
+
+def _iter_rows(
+    kind: str,
+    *,
+    offer_id: Optional[int],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    warehouse_code: Optional[str],
+) -> Iterator[Dict[str, Any]]:
+    spec = _HISTORY[kind]
+    where = ["1=1"]
+    params: Dict[str, Any] = {}
+    if offer_id is not None:
+        where.append("offer_id = :offer_id")
+        params["offer_id"] = offer_id
+    # filtrele pe recorded_at permit partition pruning
+    if since is not None:
+        where.append("recorded_at >= :since")
+        params["since"] = since
+    if until is not None:
+        where.append("recorded_at < :until")
+        params["until"] = until
+    if warehouse_code is not None and kind == "stock":
+        where.append("warehouse_code = :wh")
+        params["wh"] = warehouse_code
+
+    sql = (
+        f'SELECT {", ".join(spec["columns"])} FROM "{DEFAULT_SCHEMA}".{spec["table"]} '
+        f'WHERE {" AND ".join(where)} ORDER BY {spec["order"]}'
+    )
+    # sesiune proprie: rulează în timpul body-ului StreamingResponse
+    with SessionLocal() as db:
+        result = db.execute(
+            text(sql).execution_options(stream_results=True, yield_per=STREAM_BATCH),
+            params,
+        )
+        for row in result.mappings():
+            yield dict(row)
+
+
+def _iter_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    for r in rows:
+        yield (json.dumps(r, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+@router.get("/history/{kind}/export")
+def export_history(
+    kind: Literal["prices", "stock"],
+    format: Literal["parquet", "arrow", "ndjson"] = Query(default="parquet"),
+    offer_id: Optional[int] = Query(default=None, ge=1),
+    since: Optional[datetime] = Query(default=None, description="recorded_at >= since"),
+    until: Optional[datetime] = Query(default=None, description="recorded_at < until"),
+    warehouse_code: Optional[str] = Query(default=None, description="Doar pentru kind=stock"),
+):
+    """
+    Export streamed din istoricul de prețuri/stoc (Parquet/Arrow în row group-uri, sau NDJSON).
+    """
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be earlier than until.")
+
+    rows = _iter_rows(
+        kind,
+        offer_id=offer_id,
+        since=since,
+        until=until,
+        warehouse_code=warehouse_code,
+    )
+    filename = f"emag_{kind}_history"
+
+    if format == "ndjson":
+        return StreamingResponse(
+            _iter_ndjson(rows),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'},
+        )
+
+    if not columnar_export.available():
+        raise HTTPException(status_code=501, detail=f"format={format} requires pyarrow on the server")
+
+    ext = columnar_export.FILE_EXT[format]
+    return StreamingResponse(
+        columnar_export.iter_columnar(rows, fmt=format, columns=_HISTORY[kind]["columns"]),
+        media_type=columnar_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{ext}"'},
+    )
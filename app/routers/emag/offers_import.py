@@ -0,0 +1,27 @@
+# app/routers/emag/offers_import.py
+from __future__ import annotations
+
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Query, Request
+
+from app.routers.product import run_import_request
+from app.services import product_import
+
+router = APIRouter(tags=["emag offers"])
+
+
+@router.post("/offers/import")
+async def import_offers(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson", "parquet"]] = Query(
+        default=None, description="Implicit: dedus din Content-Type"
+    ),
+    dry_run: bool = Query(default=False, description="Doar validare + raport, fără merge"),
+    max_errors: int = Query(default=product_import.MAX_ERRORS_DEFAULT, ge=0, le=100000),
+):
+    """
+    Import bulk în `emag_offers` (coloane: account, country, sku, currency, sale_price, stock_total).
+    `account` = emag_account.code, `sku` = products.sku; upsert pe (account_id, country, product_id).
+    """
+    return await run_import_request(request, "offers", format, dry_run, max_errors)
@@ -2,17 +2,22 @@
 from __future__ import annotations
 
 import os
+import asyncio
 import csv
 import io
 import json
+import hashlib
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Iterable, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Body, Query
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel, Field
 
+from app.core.ttl_cache import TTLCache
+from app.services import columnar_export
 from app.routers.emag.deps import emag_client_dependency
-from app.integrations.emag_sdk import EmagClient, EmagApiError
+from app.integrations.emag_sdk import EmagClient, EmagApiError, EmagRawStream
 
 # IMPORTANT: prefixul /integrations/emag este aplicat în app/routers/emag/__init__.py
 router = APIRouter(tags=["emag offers"])
@@ -28,6 +33,18 @@ DEFAULT_FIELDS_STR = os.getenv(
 )
 RETURN_META_BY_DEFAULT = (os.getenv("EMAG_OFFERS_RETURN_META", "0").strip().lower()
                           not in {"0", "false", "no"})
+# PASSTHROUGH: răspunsul upstream e trimis ne-parsat când nu avem nimic de transformat local
+DEFAULT_PASSTHROUGH = (os.getenv("EMAG_OFFERS_PASSTHROUGH", "0").strip().lower()
+                       not in {"", "0", "false", "no"})
+
+# Cache scurt pentru polling (aceeași pagină cerută la câteva secunde); 0 = dezactivat
+CACHE_TTL_S = float(os.getenv("EMAG_OFFERS_CACHE_TTL_S", "5"))
+CACHE_MAX_ENTRIES = int(os.getenv("EMAG_OFFERS_CACHE_MAX_ENTRIES", "256"))
+
+# Agregare multi-pagină (pages / max_items): pagini upstream cerute în paralel
+AGG_MAX_PAGES = int(os.getenv("EMAG_OFFERS_AGG_MAX_PAGES", "20"))
+AGG_MAX_ITEMS = int(os.getenv("EMAG_OFFERS_AGG_MAX_ITEMS", str(AGG_MAX_PAGES * MAX_LIMIT)))
+AGG_CONCURRENCY = max(1, int(os.getenv("EMAG_OFFERS_AGG_CONCURRENCY", "4")))
 
 # STRICT FILTER & TOTALS MODE
 STRICT_FILTER = (os.getenv("EMAG_OFFERS_STRICT_FILTER", "").strip().lower()
@@ -63,6 +80,76 @@ def _safe_default_fields() -> str:
 
 DEFAULT_FIELDS = _safe_default_fields()
 
+# Tipuri pentru export columnar (cheile din forma „flat”); restul coloanelor -> string
+OFFER_COLUMN_TYPES: Dict[str, str] = {
+    "id": "int",
+    "status": "int",
+    "category_id": "int",
+    "vat_id": "int",
+    "sale_price": "float",
+    "recommended_price": "float",
+    "min_sale_price": "float",
+    "max_sale_price": "float",
+    "stock_total": "int",
+    "general_stock": "int",
+    "estimated_stock": "int",
+    "handling_time": "int",
+    "supply_lead_time": "int",
+    "validation_status_value": "int",
+    "images_count": "int",
+}
+
+OFFERS_CACHE = TTLCache("emag_offers_read", ttl_s=CACHE_TTL_S, max_entries=CACHE_MAX_ENTRIES)
+
+
+@dataclass(frozen=True)
+class _RenderedResponse:
+    """Răspuns gata serializat (ce punem în cache) + ETag-ul lui."""
+    content: bytes
+    media_type: str
+    headers: Tuple[Tuple[str, str], ...]
+    etag: str
+
+
+def _etag_for(content: bytes) -> str:
+    # ETag puternic: hash pe reprezentarea finală (deci și pe fields/sort/compact/format)
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _cache_key(account: str, country: str, body: Dict[str, Any], **query: Any) -> str:
+    raw = json.dumps(
+        {"account": account, "country": country, "body": body, "query": query},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _send_rendered(r: _RenderedResponse, if_none_match: Optional[str], *, cache_state: str) -> Response:
+    headers = dict(r.headers)
+    headers["ETag"] = r.etag
+    # clientul poate reutiliza reprezentarea, dar trebuie să revalideze (If-None-Match)
+    headers["Cache-Control"] = "private, no-cache"
+    headers["X-Cache"] = cache_state
+    if _etag_matches(if_none_match, r.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=r.content, media_type=r.media_type, headers=headers)
+
 
 def _project_item(item: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
     if not fields:
@@ -142,16 +229,14 @@ def _iter_ndjson(items: Iterable[Dict[str, Any]]) -> Iterable[bytes]:
         yield (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
 
 
-def _csv_response(fields: List[str], rows: List[Dict[str, Any]], filename: str) -> StreamingResponse:
+def _csv_bytes(fields: List[str], rows: List[Dict[str, Any]]) -> bytes:
     # folosim lineterminator="\n" ca să evităm CRLF și surprize în testele cu `grep -x`
     buf = io.StringIO()
     w = csv.writer(buf, lineterminator="\n")
     w.writerow(fields)
     for r in rows:
         w.writerow([r.get(col) for col in fields])
-    data = buf.getvalue().encode("utf-8")
-    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-    return StreamingResponse(io.BytesIO(data), media_type="text/csv; charset=utf-8", headers=headers)
+    return buf.getvalue().encode("utf-8")
 
 
 
@@ -188,8 +273,15 @@ class OffersReadQuery(BaseModel):
     fields: Optional[str] = Field(default=DEFAULT_FIELDS, description="Listă separată prin virgulă (ordinea e păstrată la CSV).")
     sort: Optional[str] = Field(default=None, description="Ex: name, -sale_price, stock_total")
     # export
-    format: Optional[str] = Field(default=None, description="Format export: json|csv|ndjson")
+    format: Optional[str] = Field(default=None, description="Format export: json|csv|ndjson|parquet|arrow")
     filename: Optional[str] = Field(default=None, description="Numele fișierului la export (ex: offers.csv)")
+    passthrough: bool = Field(
+        default=DEFAULT_PASSTHROUGH,
+        description=(
+            "Dacă e 1 și nu e nevoie de transformări locale (compact=0, fields gol, fără sort, fără filtru strict, "
+            "format=json), răspunsul eMAG e trimis ne-modificat (stream, fără parse/serialize)."
+        ),
+    )
 
 
 class OffersReadBody(BaseModel):
@@ -207,6 +299,26 @@ class OffersReadBody(BaseModel):
     # eMAG SKU (alias intern): part_number_key
     part_number_key: Optional[str] = Field(None, description="Filtru după eMAG SKU (`part_number_key`).")
     extra: Optional[Dict[str, Any]] = None
+    # agregare: mai multe pagini upstream (de câte `limit`) începând cu `page`, într-un singur răspuns
+    pages: Optional[int] = Field(
+        None, ge=1, le=AGG_MAX_PAGES,
+        description="Număr de pagini upstream agregate (începând cu `page`).",
+    )
+    max_items: Optional[int] = Field(
+        None, ge=1, le=AGG_MAX_ITEMS,
+        description="Număr maxim de oferte întoarse; implică pages = ceil(max_items / limit).",
+    )
+
+    def agg_pages(self) -> int:
+        """Câte pagini upstream trebuie cerute (1 = comportamentul clasic)."""
+        n = self.pages or 1
+        if self.max_items:
+            need = -(-self.max_items // self.limit)
+            n = max(n, need) if self.pages is None else min(n, need)
+        return max(1, min(n, AGG_MAX_PAGES))
+
+    def is_aggregate(self) -> bool:
+        return self.pages is not None or self.max_items is not None
 
 
 # ---------- validări explicite (independente de versiunea Pydantic) ----------
@@ -236,15 +348,116 @@ def _parse_sort(sort_expr: Optional[str]) -> Optional[str]:
     return sort_expr
 
 
+def _check_aggregate(body: OffersReadBody) -> None:
+    """max_items fără `pages` trebuie să încapă în AGG_MAX_PAGES pagini de câte `limit`."""
+    if body.max_items and body.pages is None:
+        need = -(-body.max_items // body.limit)
+        if need > AGG_MAX_PAGES:
+            raise HTTPException(
+                status_code=422,
+                detail=(
+                    f"max_items={body.max_items} needs {need} pages of limit={body.limit}; "
+                    f"at most {AGG_MAX_PAGES} pages are aggregated. "
+                    f"Use limit >= {-(-body.max_items // AGG_MAX_PAGES)} or a smaller max_items."
+                ),
+            )
+
+
+def _can_passthrough(
+    q: OffersReadQuery,
+    body: OffersReadBody,
+    fields_list: Optional[List[str]],
+    sort_expr: Optional[str],
+    fmt: Optional[str],
+    debug: bool,
+) -> bool:
+    """Passthrough doar când orice procesare locală ar fi identitate (în afară de plicul {total,items})."""
+    return (
+        q.passthrough
+        and not body.is_aggregate()
+        and not q.compact
+        and not fields_list
+        and not sort_expr
+        and not STRICT_FILTER
+        and fmt in {None, "json"}
+        and not q.items_only
+        and not debug
+        and not RETURN_META_BY_DEFAULT
+    )
+
+
 def _parse_format(fmt: Optional[str]) -> Optional[str]:
     if not fmt:
         return None
     fmt2 = fmt.lower()
-    if fmt2 not in {"json", "csv", "ndjson"}:
-        raise HTTPException(status_code=422, detail="format must be one of: json, csv, ndjson")
+    if fmt2 not in {"json", "csv", "ndjson", "parquet", "arrow"}:
+        raise HTTPException(status_code=422, detail="format must be one of: json, csv, ndjson, parquet, arrow")
+    if fmt2 in columnar_export.COLUMNAR_FORMATS and not columnar_export.available():
+        raise HTTPException(status_code=501, detail=f"format={fmt2} requires pyarrow on the server")
     return fmt2
 
 
+def _extract_items(resp: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Normalizează lista de oferte (eMAG a folosit mai multe plicuri de-a lungul timpului)."""
+    raw_items = (
+        resp.get("data")
+        or resp.get("results")
+        or resp.get("items")
+        or (resp.get("payload", {}) or {}).get("data")
+        or (resp.get("response", {}) or {}).get("data")
+        or resp.get("offers")
+        or []
+    )
+    return raw_items if isinstance(raw_items, list) else []
+
+
+async def _fetch_page(
+    client: EmagClient, payload: Dict[str, Any], page: int, extra: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    return await client.product_offer_read(
+        page=page,
+        limit=payload["limit"],
+        status=payload.get("status"),
+        sku=payload.get("sku"),
+        ean=payload.get("ean"),
+        part_number_key=payload.get("part_number_key"),
+        extra=extra,
+    )
+
+
+async def _fetch_pages(
+    client: EmagClient,
+    payload: Dict[str, Any],
+    first_page: int,
+    n_pages: int,
+    limit: int,
+    extra: Optional[Dict[str, Any]],
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], int]:
+    """
+    Cere paginile [first_page, first_page + n_pages) în paralel (semafor + limiter-ul din SDK).
+    Concatenează în ordinea paginilor și se oprește la prima pagină incompletă
+    (după ea nu mai există date, chiar dacă am cerut-o deja).
+    Întoarce (răspunsul primei pagini, items combinate, pagini efectiv folosite).
+    """
+    sem = asyncio.Semaphore(AGG_CONCURRENCY)
+
+    async def one(page: int) -> Dict[str, Any]:
+        async with sem:
+            return await _fetch_page(client, payload, page, extra)
+
+    responses = await asyncio.gather(*(one(first_page + i) for i in range(n_pages)))
+
+    combined: List[Dict[str, Any]] = []
+    used = 0
+    for resp in responses:
+        items = _extract_items(resp)
+        combined.extend(items)
+        used += 1
+        if len(items) < limit:
+            break
+    return responses[0], combined, used
+
+
 @router.post(
     "/product_offer/read",
     openapi_extra={
@@ -271,6 +484,7 @@ def _parse_format(fmt: Optional[str]) -> Optional[str]:
     },
 )
 async def product_offer_read(
+    request: Request,
     q: OffersReadQuery = Depends(),
     body: OffersReadBody = Body(...),
     client: EmagClient = Depends(emag_client_dependency),
@@ -283,12 +497,40 @@ async def product_offer_read(
     - sort înainte de paginare (determinist)
     - compact + fields
     - export CSV/NDJSON
+    - passthrough (opțional): octeții eMAG trimiși direct, fără parse/serialize
+    - agregare `pages`/`max_items`: pagini upstream în paralel, filtrate+sortate împreună
+    - ETag + If-None-Match (304) și cache TTL scurt per (cont, țară, body, query)
     - semantici: `sku` = part_number (seller), `emag_sku` = part_number_key (eMAG)
     """
     # Validări explicite pentru query
     fields_list = _parse_fields(q.fields)
     sort_expr = _parse_sort(q.sort)
     fmt = _parse_format(q.format)
+    _check_aggregate(body)
+
+    passthrough = _can_passthrough(q, body, fields_list, sort_expr, fmt, debug)
+    if_none_match = request.headers.get("if-none-match")
+
+    # Cache (nu și pentru passthrough – acolo nu bufferăm nimic)
+    cache_key: Optional[str] = None
+    if OFFERS_CACHE.enabled and not passthrough:
+        cache_key = _cache_key(
+            client.cfg.account,
+            client.cfg.country,
+            body.model_dump(),
+            fields=fields_list,
+            sort=sort_expr,
+            compact=q.compact,
+            items_only=q.items_only,
+            format=fmt,
+            filename=q.filename,
+            debug=debug,
+        )
+        # `Cache-Control: no-cache` din partea clientului forțează un apel upstream
+        if "no-cache" not in (request.headers.get("cache-control") or "").lower():
+            hit = OFFERS_CACHE.get(cache_key)
+            if hit is not None:
+                return _send_rendered(hit, if_none_match, cache_state="HIT")
 
     try:
         # === build payload upstream ===
@@ -308,16 +550,33 @@ async def product_offer_read(
         if body.extra:
             payload.update(body.extra)
 
-        # apel SDK
-        resp = await client.product_offer_read(
-            page=payload["page"],
-            limit=payload["limit"],
-            status=payload.get("status"),
-            sku=payload.get("sku"),
-            ean=payload.get("ean"),
-            part_number_key=payload.get("part_number_key"),
-            extra=body.extra,
-        )
+        if passthrough:
+            raw: EmagRawStream = await client.product_offer_read_raw(
+                page=payload["page"],
+                limit=payload["limit"],
+                status=payload.get("status"),
+                sku=payload.get("sku"),
+                ean=payload.get("ean"),
+                part_number_key=payload.get("part_number_key"),
+                extra=body.extra,
+            )
+            # plicul eMAG ({isError, messages, results, ...}) ajunge la client ne-modificat
+            return StreamingResponse(
+                raw.aiter(),
+                media_type=raw.content_type or "application/json",
+                headers={"X-Emag-Passthrough": "1"},
+            )
+
+        # apel SDK (una sau mai multe pagini)
+        n_pages = body.agg_pages()
+        if n_pages == 1:
+            resp = await _fetch_page(client, payload, body.page, body.extra)
+            raw_items = _extract_items(resp)
+            pages_fetched = 1
+        else:
+            resp, raw_items, pages_fetched = await _fetch_pages(
+                client, payload, body.page, n_pages, body.limit, body.extra
+            )
     except EmagApiError as e:
         status_code = e.status_code or 502
         detail = {"message": "eMAG API error", "status_code": e.status_code, "details": e.payload}
@@ -325,19 +584,6 @@ async def product_offer_read(
     except Exception as e:
         raise HTTPException(status_code=502, detail={"message": "Upstream error", "error": str(e)})
 
-    # Normalizează lista de oferte
-    raw_items: List[Dict[str, Any]] = (
-        resp.get("data")
-        or resp.get("results")
-        or resp.get("items")
-        or (resp.get("payload", {}) or {}).get("data")
-        or (resp.get("response", {}) or {}).get("data")
-        or resp.get("offers")
-        or []
-    )
-    if not isinstance(raw_items, list):
-        raw_items = []
-
     # perechi (raw, flat) → sortăm după flat, returnăm raw/flat în funcție de compact
     pairs_all: List[Tuple[Dict[str, Any], Dict[str, Any]]] = [(it, _flatten(it)) for it in raw_items]
 
@@ -360,12 +606,17 @@ async def product_offer_read(
         pairs_use.sort(key=_k, reverse=desc)
 
     # paginare
-    start = (body.page - 1) * body.limit
-    end = start + body.limit
-    if len(pairs_use) > body.limit:
-        sliced_pairs = pairs_use[start:end] if start < len(pairs_use) else []
+    if body.is_aggregate():
+        # setul combinat e deja fereastra cerută; tăiem doar la max_items
+        cap = body.max_items or (n_pages * body.limit)
+        sliced_pairs = pairs_use[:cap]
     else:
-        sliced_pairs = pairs_use[: body.limit]
+        start = (body.page - 1) * body.limit
+        end = start + body.limit
+        if len(pairs_use) > body.limit:
+            sliced_pairs = pairs_use[start:end] if start < len(pairs_use) else []
+        else:
+            sliced_pairs = pairs_use[: body.limit]
 
     # alege reprezentarea în funcție de compact
     items: List[Dict[str, Any]] = [fp if q.compact else rp for (rp, fp) in sliced_pairs]
@@ -388,16 +639,36 @@ async def product_offer_read(
         total = upstream_total
 
     # === Export? ===
-    if fmt in {"csv", "ndjson"}:
-        if fmt == "csv":
+    if fmt in {"csv", "ndjson", "parquet", "arrow"}:
+        headers: Dict[str, str] = {}
+        if fmt in columnar_export.COLUMNAR_FORMATS:
+            # coloanele se citesc din forma flat, indiferent de `compact`
+            cols = fields_list or ["id", "sku", "name", "sale_price", "stock_total"]
+            flat_rows = [_project_item(fp, cols) for (_rp, fp) in sliced_pairs]
+            ext = columnar_export.FILE_EXT[fmt]
+            headers["Content-Disposition"] = f'attachment; filename="{q.filename or "offers." + ext}"'
+            content = b"".join(
+                columnar_export.iter_columnar(
+                    flat_rows,
+                    fmt=fmt,
+                    columns={c: OFFER_COLUMN_TYPES.get(c, "string") for c in cols},
+                )
+            )
+            media_type = columnar_export.MEDIA_TYPES[fmt]
+        elif fmt == "csv":
             cols = fields_list or ["id", "sku", "name", "sale_price", "stock_total"]
-            fname = q.filename or "offers.csv"
-            return _csv_response(cols, items, fname)
+            headers["Content-Disposition"] = f'attachment; filename="{q.filename or "offers.csv"}"'
+            content = _csv_bytes(cols, items)
+            media_type = "text/csv; charset=utf-8"
         else:
-            headers = {}
             if q.filename:
                 headers["Content-Disposition"] = f'attachment; filename="{q.filename}"'
-            return StreamingResponse(_iter_ndjson(items), media_type="application/x-ndjson", headers=headers)
+            content = b"".join(_iter_ndjson(items))
+            media_type = "application/x-ndjson"
+        rendered = _RenderedResponse(content, media_type, tuple(headers.items()), _etag_for(content))
+        if cache_key:
+            OFFERS_CACHE.set(cache_key, rendered)
+        return _send_rendered(rendered, if_none_match, cache_state="MISS")
 
     # JSON normal
     out: Dict[str, Any] = {"total": total, "items": items}
@@ -410,7 +681,9 @@ async def product_offer_read(
             "requested_limit": body.limit,
             "max_limit": MAX_LIMIT,
             "returned_raw_len": len(raw_items),
-            "sliced": len(pairs_use) > body.limit,
+            "sliced": len(pairs_use) > len(sliced_pairs),
+            "pages_requested": n_pages,
+            "pages_fetched": pages_fetched,
             "compact": q.compact,
             "fields": fields_list,
             "sku_semantics": {
@@ -429,4 +702,8 @@ async def product_offer_read(
             out["total_upstream"] = upstream_total
             out["total_filtered"] = filtered_total
 
-    return JSONResponse(out)
+    content = JSONResponse(out).body
+    rendered = _RenderedResponse(content, "application/json", (), _etag_for(content))
+    if cache_key:
+        OFFERS_CACHE.set(cache_key, rendered)
+    return _send_rendered(rendered, if_none_match, cache_state="MISS")
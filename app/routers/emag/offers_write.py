@@ -4,6 +4,7 @@ from typing import Any, Optional, Annotated, TYPE_CHECKING
 
 from fastapi import APIRouter, Depends, Header
 from .deps import emag_client_dependency
+from .offers_read import OFFERS_CACHE
 from .schemas import ProductOfferSaveIn, OfferStockUpdateIn
 from .utils import call_emag
 
@@ -18,7 +19,9 @@ async def product_offer_save(
     idem: Annotated[Optional[str], Header(alias="X-Idempotency-Key")] = None,
     client: "EmagClient" = Depends(emag_client_dependency),
 ) -> dict[str, Any]:
-    return await call_emag(client.product_offer_save, payload.model_dump(), idempotency_key=idem)
+    result = await call_emag(client.product_offer_save, payload.model_dump(), idempotency_key=idem)
+    OFFERS_CACHE.clear()  # citirile cache-uite ar arăta oferta veche până la TTL
+    return result
 
 @router.post("/offer/stock-update")
 async def offer_stock_update(
@@ -26,10 +29,12 @@ async def offer_stock_update(
     idem: Annotated[Optional[str], Header(alias="X-Idempotency-Key")] = None,
     client: "EmagClient" = Depends(emag_client_dependency),
 ) -> dict[str, Any]:
-    return await call_emag(
+    result = await call_emag(
         client.offer_stock_update,
         item_id=payload.id,
         warehouse_id=payload.warehouse_id,
         value=payload.value,
         idempotency_key=idem,
     )
+    OFFERS_CACHE.clear()
+    return result
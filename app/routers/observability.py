@@ -6,7 +6,9 @@ from fastapi import APIRouter, HTTPException, Query, Depends, Header
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.core import plan_capture
 from app.database import get_db
+from app.db_replicas import get_read_db
 
 
 # -----------------------------------------------------------------------------
@@ -180,7 +182,7 @@ def active(
     limit: int = Query(50, ge=1, le=200),
     qlen: int = Query(500, ge=1, le=2000),
     application_name: str | None = Query(None, description="Filtru exact pe application_name"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     where = [
         "pid <> pg_backend_pid()",
@@ -239,7 +241,7 @@ def top_queries(
     dbname: str | None = Query(None, description="Filtrează după baza de date (pg_database.datname)"),
     include_query_text: bool = Query(True, description="Dacă false, nu include textul query-ului"),
     qlen: int = Query(500, ge=1, le=2000, description="Lungime maximă query în răspuns"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     _ensure_pgss(db)
 
@@ -481,6 +483,44 @@ def locks(
     return {"count": len(rows), "items": [dict(r) for r in rows]}
 
 
+# -----------------------------------------------------------------------------
+# Planuri capturate automat pentru interogările lente (QUERY_PLAN_CAPTURE=1)
+# -----------------------------------------------------------------------------
+@router.get("/plans")
+def plans(
+    limit: int = Query(20, ge=1, le=200),
+    order_by: str = Query("captured_at", pattern=r"^(captured_at|duration_ms|captures)$"),
+    route: str | None = Query(None, description="Filtru exact pe rută (ex. 'GET /products')"),
+    queryid: int | None = Query(None, description="queryid din pg_stat_statements"),
+    include_plan: bool = Query(True, description="Dacă false, nu include planul JSON"),
+    qlen: int = Query(500, ge=1, le=20000, description="Lungime maximă query în răspuns"),
+    db: Session = Depends(get_db),
+):
+    if not db.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": f'"{plan_capture.SCHEMA}".query_plans'}).scalar():
+        raise HTTPException(status_code=503, detail="Tabela query_plans lipsește (rulează migrațiile).")
+
+    where = ["TRUE"]
+    params: dict[str, object] = {"limit": limit, "qlen": qlen}
+    if route:
+        where.append("route = :route")
+        params["route"] = route
+    if queryid is not None:
+        where.append("queryid = :queryid")
+        params["queryid"] = queryid
+    plan_col = "plan" if include_plan else "NULL::jsonb AS plan"
+
+    sql = f"""
+        SELECT id, fingerprint, route, queryid, left(query, :qlen) AS query,
+               duration_ms, analyzed, captures, captured_at, {plan_col}
+          FROM "{plan_capture.SCHEMA}".query_plans
+         WHERE {" AND ".join(where)}
+         ORDER BY {order_by} DESC
+         LIMIT :limit
+    """
+    rows = db.execute(text(sql), params).mappings().all()
+    return {"capture": plan_capture.stats(), "count": len(rows), "items": [dict(r) for r in rows]}
+
+
 # -----------------------------------------------------------------------------
 # Generator simplu de trafic (dev utility)
 # -----------------------------------------------------------------------------
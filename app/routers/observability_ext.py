@@ -6,7 +6,15 @@ import time
 import platform
 from typing import Any, Dict
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import session_stats
+from app.database import DEFAULT_SCHEMA, get_db
+from app.core.pool_metrics import all_pool_stats
+from app.core.ttl_cache import all_stats as cache_stats
+from app.db_replicas import MAX_LAG_S, replicas_status
 
 router = APIRouter(prefix="/observability/v2", tags=["observability"])
 
@@ -45,3 +53,96 @@ def obs_hints() -> Dict[str, Any]:
     if os.getenv("DISABLE_DOCS","").lower() in {"1","true","yes"}:
         hints.append("Docs sunt dezactivate (DISABLE_DOCS=1).")
     return {"hints": hints}
+
+@router.get("/cache")
+def obs_cache() -> Dict[str, Any]:
+    """
+    Statistici pentru cache-urile TTL din proces (hit ratio, intrări, TTL).
+    """
+    return {"caches": cache_stats()}
+
+@router.get("/replicas")
+def obs_replicas() -> Dict[str, Any]:
+    """
+    Starea replicilor de citire (lag din ultimul probe, utilizabilă sau nu).
+    """
+    return {"max_lag_s": MAX_LAG_S, "replicas": replicas_status()}
+
+@router.get("/pool")
+def obs_pool() -> Dict[str, Any]:
+    """
+    Metrici pentru pool-urile de conexiuni (primary, async, replici):
+    histogramă checkout wait, timeouts, gauges (checked_out/overflow/saturation)
+    și conexiunile ținute peste DB_POOL_LEAK_THRESHOLD_S (cu ruta).
+    """
+    return {"pools": all_pool_stats()}
+
+@router.get("/sessions")
+def obs_sessions() -> Dict[str, Any]:
+    """
+    Sesiuni DB deschise de dependency-uri vs. folosite efectiv, per rută.
+    `saved_checkouts` = sesiuni închise fără să fi luat vreo conexiune din pool.
+    """
+    return session_stats.snapshot()
+
+@router.get("/history-capture")
+def obs_history_capture(db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """
+    Istoricul de prețuri/stoc scris doar la schimbare (trigger-e pe emag_offers și
+    emag_offer_stock_by_wh): rânduri scrise în tabela curentă vs. rânduri istorice
+    înregistrate, din pg_stat_user_tables (de la ultimul reset al statisticilor; partițiile
+    șterse de retenție nu mai sunt numărate). `dedup_ratio` = fracțiunea scrierilor care
+    NU au produs o linie de istoric.
+    """
+    s = DEFAULT_SCHEMA
+    kinds = []
+    for kind, src, hist in (
+        ("prices", "emag_offers", "emag_offer_prices_hist"),
+        ("stock", "emag_offer_stock_by_wh", "emag_offer_stock_hist"),
+    ):
+        r = db.execute(
+            text(
+                "SELECT (SELECT n_tup_ins + n_tup_upd FROM pg_stat_user_tables WHERE relid = to_regclass(:src)) AS rows_seen, "
+                "       (SELECT coalesce(sum(st.n_tup_ins + st.n_tup_upd), 0) FROM pg_inherits i "
+                "          JOIN pg_stat_user_tables st ON st.relid = i.inhrelid "
+                "         WHERE i.inhparent = to_regclass(:hist)) AS rows_recorded"
+            ),
+            {"src": f'"{s}".{src}', "hist": f'"{s}".{hist}'},
+        ).mappings().one()
+        seen, rec = r["rows_seen"], int(r["rows_recorded"] or 0)
+        kinds.append(
+            {
+                "kind": kind,
+                "rows_seen": seen,
+                "rows_recorded": rec,
+                "dedup_ratio": round(max(0.0, 1 - rec / seen), 4) if seen else None,
+            }
+        )
+    stats_reset = db.execute(
+        text("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()")
+    ).scalar()
+    return {"source": "pg_stat_user_tables", "stats_reset": stats_reset, "kinds": kinds}
+
+@router.get("/mviews")
+def obs_mviews(db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """
+    MV-urile eMAG: populat sau nu, ultimul refresh făcut de worker (vârstă, durată,
+    CONCURRENTLY sau nu) și ultima eroare – din app.mv_refresh_status.
+    """
+    status_tbl = f'"{DEFAULT_SCHEMA}".mv_refresh_status'
+    has_status = db.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": status_tbl}).scalar()
+    status_cols = (
+        "s.last_refresh_at, extract(epoch FROM now() - s.last_refresh_at) AS age_s, s.duration_ms, "
+        "s.concurrent, s.refreshes, s.failures, s.last_error, s.last_error_at"
+    )
+    join = f"LEFT JOIN {status_tbl} s ON s.mv = m.matviewname" if has_status else ""
+    rows = db.execute(
+        text(
+            f"SELECT m.matviewname AS mv, m.ispopulated AS populated"
+            f"{', ' + status_cols if has_status else ''} "
+            f"FROM pg_matviews m {join} "
+            f"WHERE m.schemaname = :schema AND m.matviewname LIKE 'mv_emag%' ORDER BY m.matviewname"
+        ),
+        {"schema": DEFAULT_SCHEMA},
+    ).mappings().all()
+    return {"mviews": [dict(r) for r in rows]}
@@ -1,30 +1,71 @@
 # app/routers/product.py
 from __future__ import annotations
 
+import os
 from decimal import Decimal
 from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import SessionLocal, get_async_db
+from app.db_replicas import get_async_read_db
 from app.crud import product as crud
+from app.crud.totals import TOTAL_MODE_DEFAULT, TotalMode
+from app.core.ttl_cache import TTLCache
+from app.services import columnar_export
+from app.services import product_import
 from app.schemas.product import (
     ProductCreate,
     ProductUpdate,
     ProductRead,
     ProductPage,
+    ProductSearchHit,
+    ProductSearchPage,
+    ProductTextSearchHit,
+    ProductTextSearchPage,
+    ProductBulkUpsert,
+    ProductBulkPatch,
+    ProductBulkResult,
 )
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+# Schema exportului columnar (ordinea coloanelor + tipuri)
+PRODUCT_EXPORT_COLUMNS = {
+    "id": "int",
+    "name": "string",
+    "description": "string",
+    "price": "decimal(12,2)",
+    "sku": "string",
+}
+
+# Limita de elemente per request bulk (batch-urile interne: PRODUCTS_BULK_BATCH_SIZE)
+BULK_MAX_ITEMS = int(os.getenv("PRODUCTS_BULK_MAX_ITEMS", "5000"))
+
+# Fațete: cache scurt per proces; golit la orice scriere pe produse/categorii/legături
+# (celelalte procese văd schimbarea după cel mult TTL).
+FACETS_CACHE = TTLCache(
+    "products_facets",
+    ttl_s=float(os.getenv("PRODUCTS_FACETS_CACHE_TTL_S", "30")),
+    max_entries=int(os.getenv("PRODUCTS_FACETS_CACHE_MAX_ENTRIES", "256")),
+)
+
+
+def invalidate_listing_caches() -> None:
+    """Apelată de rutele care modifică produse, categorii sau legăturile dintre ele."""
+    FACETS_CACHE.clear()
+
 
 @router.get(
     "",
     response_model=ProductPage,
     summary="List products with filtering, pagination & sorting",
 )
-def list_products(
+async def list_products(
+    request: Request,
     response: Response,
     name: str | None = Query(
         default=None,
@@ -41,6 +82,10 @@ def list_products(
         default=None,
         description="Filter by category id (M2M)",
     ),
+    include_descendants: bool = Query(
+        default=False,
+        description="Cu category_id: include și produsele din subcategorii (closure table)",
+    ),
     min_price: Decimal | None = Query(default=None, ge=0),
     max_price: Decimal | None = Query(default=None, ge=0),
     page: int = Query(default=1, ge=1),
@@ -51,16 +96,27 @@ def list_products(
     order_dir: Literal["asc", "desc"] = Query(
         default="asc", description="Sort direction"
     ),
-    db: Session = Depends(get_db),
+    format: Literal["json", "parquet", "arrow"] = Query(
+        default="json",
+        description="json = pagină; parquet|arrow = export complet (fără paginare), streamed",
+    ),
+    total_mode: TotalMode = Query(
+        default=TOTAL_MODE_DEFAULT,
+        description="exact | estimate (planner / pg_class) | none | exact-capped (numără până la LIST_TOTAL_CAP, apoi „N+”)",
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Returnează produse paginate cu filtre opționale + sortare.
     - `name`: substring case-insensitive în `name`
     - `sku_prefix`: prefix case-insensitive pentru `sku`
     - `category_id`: filtrează produsele care aparțin unei categorii
+      (`include_descendants=true` → tot subarborele, într-un singur semi-join)
     - `min_price`, `max_price`: interval de preț (inclusiv)
     - `order_by`: una dintre `id|name|price|sku`
     - `order_dir`: `asc|desc`
+    - `format`: `parquet|arrow` exportă toate rândurile filtrate (ignoră `page`/`page_size`)
+    - `total_mode`: cum se calculează `total` (X-Total-Count + X-Total-Count-Mode)
     """
     if min_price is not None and max_price is not None and min_price > max_price:
         raise HTTPException(
@@ -68,21 +124,277 @@ def list_products(
             detail="min_price cannot be greater than max_price.",
         )
 
-    items, total = crud.list_products(
+    if format in columnar_export.COLUMNAR_FORMATS:
+        if not columnar_export.available():
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail=f"format={format} requires pyarrow on the server",
+            )
+        filters = dict(
+            name_contains=name,
+            sku_prefix=sku_prefix,
+            min_price=min_price,
+            max_price=max_price,
+            category_id=category_id,
+            include_descendants=include_descendants,
+            order_by=order_by,
+            order_dir=order_dir,
+        )
+
+        replica = getattr(request.state, "db_replica", None)
+        session_factory = replica.session_factory if replica else SessionLocal
+
+        def _stream():
+            # sesiune sync proprie (același nod): dependency-ul de DB se închide înainte de body
+            with session_factory() as s:
+                rows = crud.iter_products(s, **filters)
+                yield from columnar_export.iter_columnar(
+                    rows, fmt=format, columns=PRODUCT_EXPORT_COLUMNS
+                )
+
+        ext = columnar_export.FILE_EXT[format]
+        return StreamingResponse(
+            _stream(),
+            media_type=columnar_export.MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="products.{ext}"'},
+        )
+
+    items, total = await crud.alist_products(
         db,
         name_contains=name,
         sku_prefix=sku_prefix,
         min_price=min_price,
         max_price=max_price,
         category_id=category_id,
+        include_descendants=include_descendants,
         page=page,
         page_size=page_size,
         order_by=order_by,
         order_dir=order_dir,
+        total_mode=total_mode,
     )
     # Header util pentru UI-uri/tablere
-    response.headers["X-Total-Count"] = str(total)
-    return ProductPage(items=items, total=total, page=page, page_size=page_size)
+    total.apply(response)
+    return ProductPage(
+        items=items,
+        total=total.value,
+        page=page,
+        page_size=page_size,
+        total_mode=total.mode,
+        total_capped=total.capped,
+    )
+
+
+@router.get(
+    "/facets",
+    summary="Facet counts (categories, price histogram, SKU presence) for the current filters",
+)
+async def product_facets(
+    response: Response,
+    name: str | None = Query(default=None, min_length=1),
+    sku_prefix: str | None = Query(default=None, min_length=1, max_length=64),
+    category_id: int | None = Query(default=None),
+    include_descendants: bool = Query(default=False),
+    min_price: Decimal | None = Query(default=None, ge=0),
+    max_price: Decimal | None = Query(default=None, ge=0),
+    facets: list[Literal["categories", "price", "sku"]] = Query(
+        default=["categories", "price", "sku"],
+        description="Fațetele calculate (repetabil: ?facets=price&facets=sku)",
+    ),
+    price_buckets: int = Query(default=10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Aceleași filtre ca `GET /products`; toate fațetele cerute vin dintr-un singur
+    `GROUP BY GROUPING SETS` (plus totalul). Histograma de preț folosește `width_bucket`
+    pe intervalul [min, max] al setului filtrat. Rezultatul e cache-uit scurt (X-Cache).
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="min_price cannot be greater than max_price.",
+        )
+    wanted = tuple(f for f in crud.FACET_NAMES if f in facets)
+    filters = dict(
+        name_contains=name,
+        sku_prefix=sku_prefix,
+        min_price=min_price,
+        max_price=max_price,
+        category_id=category_id,
+        include_descendants=include_descendants,
+    )
+    key = (tuple(sorted((k, str(v)) for k, v in filters.items())), wanted, price_buckets)
+    cached = FACETS_CACHE.get(key)
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached
+
+    result = await crud.aproduct_facets(db, facets=wanted, price_buckets=price_buckets, **filters)
+    FACETS_CACHE.set(key, result)
+    if FACETS_CACHE.enabled:
+        response.headers["X-Cache"] = "MISS"
+    return result
+
+
+@router.get(
+    "/search",
+    response_model=ProductSearchPage,
+    summary="Fuzzy (typo-tolerant) product search by name/SKU, similarity-ranked",
+)
+async def search_products(
+    q: str = Query(..., min_length=2, max_length=200, description="Text căutat (name sau SKU)"),
+    threshold: float = Query(
+        default=crud.SEARCH_THRESHOLD,
+        ge=0,
+        le=1,
+        description="Prag pg_trgm word_similarity (mai mic = mai tolerant)",
+    ),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None, description="`next_cursor` din pagina anterioară"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Căutare trigram (pg_trgm) servită de indexurile GIN pe `lower(name)` / `lower(sku)`.
+    Ordonare: scor desc, id asc; paginare keyset prin `cursor` (fără OFFSET).
+    """
+    try:
+        hits, next_cursor = await crud.asearch_products(
+            db, q, threshold=threshold, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    items = [
+        ProductSearchHit(**ProductRead.model_validate(p).model_dump(), score=round(score, 4))
+        for p, score in hits
+    ]
+    return ProductSearchPage(items=items, next_cursor=next_cursor, threshold=threshold)
+
+
+@router.get(
+    "/search/fulltext",
+    response_model=ProductTextSearchPage,
+    summary="Full-text product search (name, SKU, description) with highlighted snippets",
+)
+async def fulltext_search_products(
+    q: str = Query(..., min_length=1, max_length=200, description='Sintaxă websearch: cuvinte, "frază", -exclus, OR'),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None, description="`next_cursor` din pagina anterioară"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Caută în coloana generată `search_tsv` (GIN), insensibil la diacritice, cu stemming
+    românesc. Ordonare după `ts_rank_cd`; `name_highlight` / `snippet` conțin `<mark>`.
+    Textul produsului nu e HTML-escaped – clientul trebuie să-l trateze ca atare.
+    """
+    try:
+        hits, next_cursor = await crud.afulltext_search(db, q, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    items = [
+        ProductTextSearchHit(
+            **ProductRead.model_validate(h["product"]).model_dump(),
+            rank=round(h["rank"], 6),
+            name_highlight=h["name_highlight"],
+            snippet=h["snippet"],
+        )
+        for h in hits
+    ]
+    return ProductTextSearchPage(items=items, next_cursor=next_cursor)
+
+
+@router.post(
+    "/import",
+    summary="Bulk import products (CSV / NDJSON / Parquet) via COPY + set-based merge",
+)
+async def import_products(
+    request: Request,
+    format: Literal["csv", "ndjson", "parquet"] | None = Query(
+        default=None, description="Implicit: dedus din Content-Type"
+    ),
+    dry_run: bool = Query(default=False, description="Doar validare + raport, fără merge"),
+    max_errors: int = Query(default=product_import.MAX_ERRORS_DEFAULT, ge=0, le=100000),
+):
+    """
+    Body-ul e fișierul brut (nu multipart). Rândurile sunt încărcate cu COPY într-un tabel
+    UNLOGGED de staging, validate set-based (SKU, nume, preț ≥ 0, duplicate în fișier) și
+    apoi fuzionate cu un singur `INSERT ... ON CONFLICT (sku) WHERE sku IS NOT NULL DO UPDATE`.
+    Răspuns: contoare (inserted/updated/unchanged) + erori per rând (`line`, `sku`, `error`).
+    """
+    report = await run_import_request(request, "products", format, dry_run, max_errors)
+    if not dry_run:
+        invalidate_listing_caches()
+    return report
+
+
+async def run_import_request(request: Request, kind: str, fmt: str | None, dry_run: bool, max_errors: int):
+    """Comun pentru /products/import și /integrations/emag/offers/import."""
+    fmt = fmt or product_import.format_from_content_type(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Set ?format=csv|ndjson|parquet or a matching Content-Type.",
+        )
+    if fmt == "parquet" and not columnar_export.available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="format=parquet requires pyarrow on the server")
+
+    fp = await product_import.spool_stream(request.stream())
+    try:
+        report = await run_in_threadpool(
+            product_import.run_import, kind, fp, fmt, max_errors=max_errors, dry_run=dry_run
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unreadable {fmt} payload: {e}")
+    finally:
+        fp.close()
+    return report.as_dict()
+
+
+def _bulk_check_size(n: int) -> None:
+    if n > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many items: {n} > {BULK_MAX_ITEMS}",
+        )
+
+
+def _bulk_result(outcomes: list[dict]) -> dict:
+    summary: dict[str, int] = {}
+    for o in outcomes:
+        summary[o["status"]] = summary.get(o["status"], 0) + 1
+    return {"items": outcomes, "summary": summary}
+
+
+@router.post(
+    "/bulk",
+    response_model=ProductBulkResult,
+    summary="Bulk upsert products by SKU (batched INSERT ... ON CONFLICT)",
+)
+async def bulk_upsert_products(payload: ProductBulkUpsert, db: AsyncSession = Depends(get_async_db)):
+    """
+    Creează sau actualizează produse după SKU, în batch-uri multi-row și o singură tranzacție.
+    Rezultat per element: created / updated / unchanged / duplicate (SKU repetat în request;
+    se aplică ultima apariție).
+    """
+    _bulk_check_size(len(payload.items))
+    result = _bulk_result(await crud.abulk_upsert(db, payload.items))
+    invalidate_listing_caches()
+    return result
+
+
+@router.patch(
+    "/bulk",
+    response_model=ProductBulkResult,
+    summary="Bulk patch products by SKU (single UPDATE ... FROM VALUES per batch)",
+)
+async def bulk_patch_products(payload: ProductBulkPatch, db: AsyncSession = Depends(get_async_db)):
+    """
+    Actualizează doar câmpurile trimise pentru fiecare SKU; SKU-urile inexistente
+    apar ca not_found (nu se creează produse).
+    """
+    _bulk_check_size(len(payload.items))
+    result = _bulk_result(await crud.abulk_patch(db, payload.items))
+    invalidate_listing_caches()
+    return result
 
 
 @router.get(
@@ -90,8 +402,8 @@ def list_products(
     response_model=ProductRead,
     summary="Get a product by id",
 )
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    obj = crud.get(db, product_id)
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    obj = await crud.aget(db, product_id)
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return obj
@@ -102,8 +414,8 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
     response_model=ProductRead,
     summary="Get a product by SKU",
 )
-def get_product_by_sku(sku: str, db: Session = Depends(get_db)):
-    obj = crud.get_by_sku(db, sku)
+async def get_product_by_sku(sku: str, db: AsyncSession = Depends(get_async_read_db)):
+    obj = await crud.aget_by_sku(db, sku)
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return obj
@@ -115,12 +427,13 @@ def get_product_by_sku(sku: str, db: Session = Depends(get_db)):
     status_code=status.HTTP_201_CREATED,
     summary="Create a product",
 )
-def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(payload: ProductCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        obj = crud.create(db, payload)
+        obj = await crud.acreate(db, payload)
     except crud.DuplicateSKUError as e:
         # index unic parțial: SKU duplicat când nu e NULL
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    invalidate_listing_caches()
     return obj
 
 
@@ -129,15 +442,16 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
     response_model=ProductRead,
     summary="Update a product",
 )
-def update_product(product_id: int, payload: ProductUpdate, db: Session = Depends(get_db)):
-    obj = crud.get(db, product_id)
+async def update_product(product_id: int, payload: ProductUpdate, db: AsyncSession = Depends(get_async_db)):
+    obj = await crud.aget(db, product_id)
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
 
     try:
-        obj = crud.update(db, obj, payload)
+        obj = await crud.aupdate(db, obj, payload)
     except crud.DuplicateSKUError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    invalidate_listing_caches()
     return obj
 
 
@@ -146,9 +460,10 @@ def update_product(product_id: int, payload: ProductUpdate, db: Session = Depend
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete a product",
 )
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    obj = crud.get(db, product_id)
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    obj = await crud.aget(db, product_id)
     if not obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    crud.delete(db, obj)
+    await crud.adelete(db, obj)
+    invalidate_listing_caches()
     return None
@@ -6,6 +6,8 @@ from typing import Optional
 
 from pydantic import BaseModel, Field, ConfigDict, field_validator
 
+from app.schemas.product import ProductRead
+
 _WS_RE = re.compile(r"\s+")
 
 
@@ -18,6 +20,7 @@ class CategoryBase(BaseModel):
     """Câmpuri comune pentru categorie (create/read)."""
     name: str = Field(min_length=1, max_length=255)
     description: Optional[str] = Field(default=None, max_length=1000)
+    parent_id: Optional[int] = Field(default=None, ge=1, description="Categoria părinte (None = rădăcină)")
 
     # Normalizează și validează `name`
     @field_validator("name")
@@ -59,6 +62,8 @@ class CategoryUpdate(BaseModel):
     """Payload pentru update; toate câmpurile sunt opționale."""
     name: Optional[str] = Field(default=None, min_length=1, max_length=255)
     description: Optional[str] = Field(default=None, max_length=1000)
+    # trimis explicit cu null → mută categoria la rădăcină; absent → neschimbat
+    parent_id: Optional[int] = Field(default=None, ge=1)
 
     @field_validator("name")
     @classmethod
@@ -86,11 +91,57 @@ class CategoryRead(BaseModel):
     id: int
     name: str
     description: Optional[str]
+    parent_id: Optional[int] = None
+    # doar cu ?with_counts=true
+    product_count: Optional[int] = None
+
+
+class CategoryProductsPage(BaseModel):
+    """Pagină keyset: trimite `next_after_id` ca `after_id` pentru pagina următoare (None = final)."""
+    items: list[ProductRead]
+    next_after_id: Optional[int] = None
+
+
+class CategoryTreeNode(CategoryRead):
+    """Categorie din subarbore + distanța față de rădăcina cerută (0 = ea însăși)."""
+    depth: int
 
 
 class CategoryPage(BaseModel):
     """Răspuns paginat pentru categorii."""
     items: list[CategoryRead]
-    total: int
+    total: Optional[int]
     page: int = Field(ge=1)
     page_size: int = Field(ge=1, le=200)
+    total_mode: str = "exact"
+    total_capped: bool = False
+
+
+# ---------- M2M bulk (attach / detach) ----------
+
+class CategoryLinkPair(BaseModel):
+    product_id: int = Field(ge=1)
+    category_id: int = Field(ge=1)
+
+
+class CategoryLinksBulk(BaseModel):
+    """Perechi arbitrare (product_id, category_id)."""
+    pairs: list[CategoryLinkPair] = Field(..., min_length=1)
+
+
+class CategoryProductsBulk(BaseModel):
+    """O categorie (din path) + mai multe produse."""
+    product_ids: list[int] = Field(..., min_length=1)
+
+
+class CategoryLinksBulkResult(BaseModel):
+    """
+    `unchanged` = legătura exista deja (attach) / nu exista (detach);
+    `invalid_pairs` = primele perechi cu produs sau categorie inexistente.
+    """
+    requested: int
+    attached: Optional[int] = None
+    detached: Optional[int] = None
+    unchanged: int
+    invalid: int
+    invalid_pairs: list[CategoryLinkPair] = []
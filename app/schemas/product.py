@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Optional, List
+from typing import Literal, Optional, List
 import re
 
 from pydantic import BaseModel, Field, ConfigDict, field_validator
@@ -133,6 +133,71 @@ class ProductRead(ProductBase):
 class ProductPage(BaseModel):
     """Răspuns paginat: listă + meta."""
     items: List[ProductRead]
-    total: int
+    total: Optional[int]
     page: int
     page_size: int
+    # exact | estimate | none | exact-capped; `total_capped` = totalul e doar limita inferioară
+    total_mode: str = "exact"
+    total_capped: bool = False
+
+
+
+class ProductSearchHit(ProductRead):
+    """Rezultat de căutare: produsul + scorul de similaritate (0..1)."""
+    score: float
+
+
+class ProductSearchPage(BaseModel):
+    """Pagină keyset: `next_cursor` e None pe ultima pagină."""
+    items: List[ProductSearchHit]
+    next_cursor: Optional[str] = None
+    threshold: float
+
+
+
+class ProductTextSearchHit(ProductRead):
+    """Rezultat full-text: rank (0..1) + fragmente evidențiate cu <mark>…</mark>."""
+    rank: float
+    name_highlight: str
+    snippet: Optional[str] = None
+
+
+class ProductTextSearchPage(BaseModel):
+    items: List[ProductTextSearchHit]
+    next_cursor: Optional[str] = None
+
+
+# ---------- Bulk (POST/PATCH /products/bulk) ----------
+
+class ProductBulkItem(ProductBase):
+    """Element pentru upsert bulk; SKU-ul e cheia (obligatoriu)."""
+    sku: str = Field(..., min_length=1, max_length=64)
+
+
+class ProductBulkPatchItem(ProductUpdate):
+    """Element pentru patch bulk: identificat după SKU, actualizează doar câmpurile trimise."""
+    sku: str = Field(..., min_length=1, max_length=64)
+
+
+class ProductBulkUpsert(BaseModel):
+    items: List[ProductBulkItem] = Field(..., min_length=1)
+
+
+class ProductBulkPatch(BaseModel):
+    items: List[ProductBulkPatchItem] = Field(..., min_length=1)
+
+
+BulkStatus = Literal["created", "updated", "unchanged", "not_found", "duplicate"]
+
+
+class ProductBulkOutcome(BaseModel):
+    index: int
+    sku: str
+    status: BulkStatus
+    id: Optional[int] = None
+
+
+class ProductBulkResult(BaseModel):
+    """Rezultat per element (în ordinea din request) + sumar pe status."""
+    items: List[ProductBulkOutcome]
+    summary: dict[str, int]
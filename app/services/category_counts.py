@@ -0,0 +1,105 @@
+# app/services/category_counts.py
+"""
+Contorul de produse per categorie pentru CATEGORY_COUNTS_SOURCE=column.
+
+Contorul stă în category_product_counts (nu în categories: attach/detach nu atinge rândul
+categoriei și nici updated_at) și e ținut la zi de trigger-e la nivel de statement pe
+product_categories. Trigger-ele există doar în modul column (migrarea b3d4e5f6a7b8); în modul
+join (implicit) numărul se agregă la citire și scrierile nu plătesc nimic.
+
+CLI:
+  python -m app.services.category_counts enable    # instalează trigger-ele + recalcul complet
+  python -m app.services.category_counts disable   # scoate trigger-ele (tabela rămâne, neactualizată)
+  python -m app.services.category_counts rebuild   # recalcul complet
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import DEFAULT_SCHEMA, engine as default_engine
+
+_TRIGGER_OPS = (
+    ("INSERT", "NEW TABLE AS new_rows"),
+    ("DELETE", "OLD TABLE AS old_rows"),
+    ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+)
+
+
+def triggers_sql(schema: str, *, install: bool) -> List[str]:
+    """DDL pentru instalarea / scoaterea trigger-elor (funcția e creată de migrarea b3d4e5f6a7b8)."""
+    out = []
+    for op_name, tables in _TRIGGER_OPS:
+        tg = f"tg_product_categories_count_{op_name.lower()}"
+        out.append(f'DROP TRIGGER IF EXISTS {tg} ON "{schema}".product_categories')
+        if install:
+            out.append(
+                f'CREATE TRIGGER {tg} AFTER {op_name} ON "{schema}".product_categories '
+                f'REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION "{schema}".tg_category_product_count()'
+            )
+    return out
+
+
+def _recount(conn: Connection) -> int:
+    s = DEFAULT_SCHEMA
+    conn.execute(text(f"""
+        DELETE FROM "{s}".category_product_counts c
+         WHERE NOT EXISTS (SELECT 1 FROM "{s}".product_categories pc WHERE pc.category_id = c.category_id)
+    """))
+    res = conn.execute(text(f"""
+        INSERT INTO "{s}".category_product_counts AS c (category_id, product_count)
+        SELECT category_id, count(*) FROM "{s}".product_categories GROUP BY category_id ORDER BY category_id
+        ON CONFLICT (category_id) DO UPDATE SET product_count = EXCLUDED.product_count
+         WHERE c.product_count IS DISTINCT FROM EXCLUDED.product_count
+    """))
+    return int(res.rowcount or 0)
+
+
+def enable(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    """
+    Trigger-e + recalcul în aceeași tranzacție: CREATE TRIGGER ține lock SHARE ROW EXCLUSIVE
+    pe product_categories până la COMMIT, deci nicio scriere nu scapă între recalcul și trigger-e.
+    """
+    eng = eng or default_engine
+    t0 = time.perf_counter()
+    with eng.begin() as conn:
+        for stmt in triggers_sql(DEFAULT_SCHEMA, install=True):
+            conn.execute(text(stmt))
+        changed = _recount(conn)
+    return {"triggers": "installed", "changed": changed, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def disable(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    eng = eng or default_engine
+    with eng.begin() as conn:
+        for stmt in triggers_sql(DEFAULT_SCHEMA, install=False):
+            conn.execute(text(stmt))
+    return {"triggers": "dropped"}
+
+
+def rebuild(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    eng = eng or default_engine
+    t0 = time.perf_counter()
+    with eng.begin() as conn:
+        changed = _recount(conn)
+    return {"changed": changed, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Contor produse per categorie (CATEGORY_COUNTS_SOURCE=column)")
+    ap.add_argument("command", choices=("enable", "disable", "rebuild"))
+    args = ap.parse_args(argv)
+    result = {"enable": enable, "disable": disable, "rebuild": rebuild}[args.command]()
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
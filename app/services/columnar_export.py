@@ -0,0 +1,201 @@
+# app/services/columnar_export.py
+"""
+Export columnar (Parquet / Arrow IPC stream) pentru rute care întorc multe rânduri.
+
+- rândurile vin dintr-un iterator (cursor DB cu yield_per sau lista de la eMAG);
+- scriem în batch-uri de `batch_rows` (un row group Parquet / un record batch Arrow per batch);
+- coloanele text sunt dictionary-encoded (SKU-uri, monede, coduri de depozit se repetă mult);
+- octeții ies pe măsură ce sunt scriși (generator de chunk-uri → StreamingResponse).
+
+pyarrow e opțional: dacă lipsește, `available()` întoarce False și rutele răspund 501.
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+try:  # opțional
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - pyarrow lipsă
+    pa = None  # type: ignore[assignment]
+    pa_ipc = None  # type: ignore[assignment]
+    pq = None  # type: ignore[assignment]
+
+COLUMNAR_FORMATS = {"parquet", "arrow"}
+
+MEDIA_TYPES: Dict[str, str] = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+FILE_EXT: Dict[str, str] = {"parquet": "parquet", "arrow": "arrows"}
+
+BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+PARQUET_COMPRESSION = (os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd") or "zstd").strip().lower()
+
+# Tipuri logice acceptate în `columns` (nume coloană -> tip)
+#   int | float | bool | string | decimal(p,s) | timestamp
+ColumnSpec = Mapping[str, str]
+
+
+def available() -> bool:
+    return pa is not None
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fișier „write-only” care acumulează octeții până îi cere generatorul (drain)."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:  # type: ignore[override]
+        n = len(b)
+        self._buf += b
+        self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = bytes(self._buf)
+        self._buf.clear()
+        return out
+
+
+def _arrow_type(kind: str, *, dictionary: bool):
+    k = kind.strip().lower()
+    if k == "int":
+        return pa.int64()
+    if k == "float":
+        return pa.float64()
+    if k == "bool":
+        return pa.bool_()
+    if k == "timestamp":
+        return pa.timestamp("us", tz="UTC")
+    if k.startswith("decimal"):
+        inner = k[k.find("(") + 1 : k.find(")")] if "(" in k else "18,2"
+        p, s = (int(x) for x in inner.split(","))
+        return pa.decimal128(p, s)
+    # string
+    return pa.dictionary(pa.int32(), pa.string()) if dictionary else pa.string()
+
+
+def _coerce(v: Any, kind: str) -> Any:
+    """Aduce valorile la tipul coloanei; ce nu se poate converti devine NULL (nu stricăm exportul)."""
+    if v is None:
+        return None
+    k = kind.strip().lower()
+    try:
+        if k == "int":
+            return int(v)
+        if k == "float":
+            return float(v)
+        if k == "bool":
+            return v if isinstance(v, bool) else str(v).strip().lower() in {"1", "true", "yes", "on"}
+        if k.startswith("decimal"):
+            return v if isinstance(v, Decimal) else Decimal(str(v))
+        if k == "timestamp":
+            return v if isinstance(v, datetime) else datetime.fromisoformat(str(v))
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False, separators=(",", ":"))
+    return v if isinstance(v, str) else str(v)
+
+
+def _build_schema(columns: ColumnSpec, *, dictionary: bool):
+    return pa.schema([pa.field(name, _arrow_type(kind, dictionary=dictionary)) for name, kind in columns.items()])
+
+
+def _batch(rows: List[Mapping[str, Any]], columns: ColumnSpec, schema) -> Any:
+    arrays = []
+    for name, kind in columns.items():
+        t = schema.field(name).type
+        values = [_coerce(r.get(name), kind) for r in rows]
+        if pa.types.is_dictionary(t):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=t))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _chunks(rows: Iterable[Mapping[str, Any]], size: int) -> Iterator[List[Mapping[str, Any]]]:
+    buf: List[Mapping[str, Any]] = []
+    for r in rows:
+        buf.append(r)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def iter_columnar(
+    rows: Iterable[Mapping[str, Any]],
+    *,
+    fmt: str,
+    columns: ColumnSpec,
+    batch_rows: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Generator de chunk-uri Parquet/Arrow. Ține în memorie cel mult un batch de rânduri.
+    `columns` fixează schema (ordinea + tipul coloanelor) înainte de primul rând.
+    """
+    if not available():
+        raise RuntimeError("pyarrow is not installed")
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"unsupported columnar format: {fmt}")
+
+    size = max(1, int(batch_rows or BATCH_ROWS))
+    sink = _ChunkSink()
+    # Parquet: dictionary encoding se face la nivel de pagină (use_dictionary),
+    # Arrow IPC: coloanele text sunt deja dictionary<int32, string> în schemă
+    schema = _build_schema(columns, dictionary=(fmt == "arrow"))
+
+    if fmt == "parquet":
+        str_cols = [n for n, k in columns.items() if _arrow_type(k, dictionary=False) == pa.string()]
+        writer = pq.ParquetWriter(
+            sink,
+            schema,
+            compression=PARQUET_COMPRESSION,
+            use_dictionary=str_cols or False,
+        )
+    else:
+        writer = pa_ipc.new_stream(sink, schema)
+
+    try:
+        for chunk in _chunks(rows, size):
+            rb = _batch(chunk, columns, schema)
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([rb]), row_group_size=size)
+            else:
+                writer.write_batch(rb)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+__all__ = [
+    "COLUMNAR_FORMATS",
+    "MEDIA_TYPES",
+    "FILE_EXT",
+    "available",
+    "iter_columnar",
+]
@@ -0,0 +1,208 @@
+# app/services/emag_summary.py
+"""
+Sumarele eMAG (stoc agregat per ofertă, „best offer”) în două variante:
+
+- mv          → mv_emag_stock_summary / mv_emag_best_offer, recalculate integral la
+                REFRESH ... CONCURRENTLY (implicit; worker-ul le reîmprospătează la NOTIFY);
+- incremental → tabelele emag_stock_summary / emag_best_offer, ținute la zi de trigger-e
+                la nivel de statement: se recalculează doar ofertele atinse de fiecare statement.
+
+EMAG_SUMMARY_SOURCE alege relația pe care o folosesc cititorii (`relation()`). Trigger-ele
+incrementale costă la fiecare scriere de stoc/ofertă (vezi scripts/bench_emag_summary.py),
+deci sunt instalate doar în modul incremental (`enable`); în acest mod worker-ul nu mai
+reîmprospătează MV-urile (rămân pentru verify, cu scripts/refresh_mviews.sh).
+
+CLI:
+  python -m app.services.emag_summary enable    # instalează trigger-ele + rebuild
+  python -m app.services.emag_summary disable   # scoate trigger-ele (tabelele rămân, neactualizate)
+  python -m app.services.emag_summary rebuild   # resincronizare completă a tabelelor (în loturi)
+  python -m app.services.emag_summary verify    # diferențe tabele incrementale vs. MV-uri
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.database import DEFAULT_SCHEMA, engine as default_engine
+
+SUMMARY_SOURCES = ("incremental", "mv")
+SUMMARY_SOURCE = os.getenv("EMAG_SUMMARY_SOURCE", "mv").strip().lower()
+if SUMMARY_SOURCE not in SUMMARY_SOURCES:
+    SUMMARY_SOURCE = "mv"
+REBUILD_BATCH = int(os.getenv("EMAG_SUMMARY_REBUILD_BATCH", "5000"))
+
+RELATIONS: Dict[str, Dict[str, str]] = {
+    "stock_summary": {"incremental": "emag_stock_summary", "mv": "mv_emag_stock_summary"},
+    "best_offer": {"incremental": "emag_best_offer", "mv": "mv_emag_best_offer"},
+}
+
+# coloanele comparate la verify (aceleași în tabel și în MV)
+_COLUMNS = {
+    "stock_summary": "offer_id, stock_total, reserved_total, last_update",
+    "best_offer": "offer_id, account_id, country, product_id, currency, sale_price, stock_total, as_of",
+}
+
+
+# trigger-ele de sumar (funcțiile tg_*_summary sunt create de migrarea b7c8d9e0f1a2)
+_TRIGGER_TABLES = (("emag_offer_stock_by_wh", "tg_emag_offer_stock_by_wh_summary"), ("emag_offers", "tg_emag_offers_summary"))
+_TRIGGER_OPS = (
+    ("INSERT", "ins", "NEW TABLE AS new_rows"),
+    ("UPDATE", "upd", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    ("DELETE", "del", "OLD TABLE AS old_rows"),
+)
+
+
+def triggers_sql(schema: str, *, install: bool) -> List[str]:
+    """DDL pentru instalarea / scoaterea trigger-elor (folosit și de migrări)."""
+    out = []
+    for table, fn in _TRIGGER_TABLES:
+        for op_name, suffix, tables in _TRIGGER_OPS:
+            out.append(f'DROP TRIGGER IF EXISTS {fn}_{suffix} ON "{schema}".{table}')
+            if install:
+                out.append(
+                    f"CREATE TRIGGER {fn}_{suffix} AFTER {op_name} ON \"{schema}\".{table} "
+                    f"REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION \"{schema}\".{fn}()"
+                )
+    return out
+
+
+def triggers_installed(eng: Optional[Engine] = None) -> bool:
+    eng = eng or default_engine
+    with eng.connect() as conn:
+        n = conn.execute(
+            text(
+                "SELECT count(*) FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = :s AND t.tgname LIKE 'tg\\_%\\_summary\\_%' AND NOT t.tgisinternal"
+            ),
+            {"s": DEFAULT_SCHEMA},
+        ).scalar()
+    return bool(n)
+
+
+def enable(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    """
+    Instalează trigger-ele, apoi rebuild: scrierile concurente sunt prinse de trigger-e,
+    iar rebuild-ul aduce la zi ce s-a schimbat cât timp modul incremental a fost oprit.
+    """
+    eng = eng or default_engine
+    with eng.begin() as conn:
+        for stmt in triggers_sql(DEFAULT_SCHEMA, install=True):
+            conn.execute(text(stmt))
+    return {"triggers": "installed", "rebuild": rebuild(eng)}
+
+
+def disable(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    eng = eng or default_engine
+    with eng.begin() as conn:
+        for stmt in triggers_sql(DEFAULT_SCHEMA, install=False):
+            conn.execute(text(stmt))
+    return {"triggers": "dropped"}
+
+
+def relation(kind: str, source: Optional[str] = None) -> str:
+    """Numele calificat al relației de citit pentru `kind` ('stock_summary' / 'best_offer')."""
+    return f'"{DEFAULT_SCHEMA}".{RELATIONS[kind][source or SUMMARY_SOURCE]}'
+
+
+def rebuild(eng: Optional[Engine] = None, *, batch_size: int = REBUILD_BATCH) -> Dict[str, Any]:
+    """
+    Recalculează toate ofertele prin emag_summary_apply, în loturi de id-uri (câte o
+    tranzacție per lot), apoi șterge rândurile orfane. Util după încărcări cu trigger-ele
+    dezactivate sau pentru verificarea corectitudinii.
+    """
+    eng = eng or default_engine
+    s = DEFAULT_SCHEMA
+    t0 = time.perf_counter()
+    batches = offers = 0
+    after = 0
+    while True:
+        with eng.begin() as conn:
+            ids: List[int] = list(
+                conn.execute(
+                    text(f'SELECT id FROM "{s}".emag_offers WHERE id > :after ORDER BY id LIMIT :lim'),
+                    {"after": after, "lim": batch_size},
+                ).scalars()
+            )
+            if not ids:
+                break
+            conn.execute(text(f'SELECT "{s}".emag_summary_apply(CAST(:ids AS bigint[]))'), {"ids": ids})
+        batches += 1
+        offers += len(ids)
+        after = ids[-1]
+    with eng.begin() as conn:
+        orphans = conn.execute(text(f"""
+            WITH o AS (
+              SELECT offer_id FROM "{s}".emag_stock_summary t
+               WHERE NOT EXISTS (SELECT 1 FROM "{s}".emag_offer_stock_by_wh w WHERE w.offer_id = t.offer_id)
+              UNION
+              SELECT offer_id FROM "{s}".emag_best_offer t
+               WHERE NOT EXISTS (SELECT 1 FROM "{s}".emag_offers e WHERE e.id = t.offer_id)
+            )
+            SELECT array_agg(offer_id) FROM o
+        """)).scalar()
+        if orphans:
+            conn.execute(text(f'SELECT "{s}".emag_summary_apply(CAST(:ids AS bigint[]))'), {"ids": orphans})
+    return {
+        "offers": offers,
+        "batches": batches,
+        "orphans": len(orphans or []),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def verify(eng: Optional[Engine] = None) -> Dict[str, Any]:
+    """Rânduri care diferă între tabela incrementală și MV (MV-ul trebuie să fie proaspăt)."""
+    eng = eng or default_engine
+    out: Dict[str, Any] = {}
+    with eng.connect() as conn:
+        for kind, cols in _COLUMNS.items():
+            inc, mv = relation(kind, "incremental"), relation(kind, "mv")
+            populated = conn.execute(
+                text("SELECT relispopulated FROM pg_class WHERE oid = to_regclass(:mv)"), {"mv": mv}
+            ).scalar()
+            if not populated:
+                out[kind] = {"skipped": "mv not populated"}
+                continue
+            only_inc = conn.execute(
+                text(f"SELECT count(*) FROM (SELECT {cols} FROM {inc} EXCEPT SELECT {cols} FROM {mv}) d")
+            ).scalar()
+            only_mv = conn.execute(
+                text(f"SELECT count(*) FROM (SELECT {cols} FROM {mv} EXCEPT SELECT {cols} FROM {inc}) d")
+            ).scalar()
+            out[kind] = {"only_incremental": int(only_inc or 0), "only_mv": int(only_mv or 0)}
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Sumare eMAG incrementale (rebuild / verify)")
+    ap.add_argument("command", choices=("enable", "disable", "rebuild", "verify"))
+    ap.add_argument("--batch", type=int, default=REBUILD_BATCH, help="oferte per tranzacție la rebuild")
+    args = ap.parse_args(argv)
+
+    if args.command == "enable":
+        result = enable()
+        code = 0
+    elif args.command == "disable":
+        result = disable()
+        code = 0
+    elif args.command == "rebuild":
+        result = rebuild(batch_size=args.batch)
+        code = 0
+    else:
+        result = verify()
+        code = 0 if all(not v.get("only_incremental") and not v.get("only_mv") for v in result.values()) else 2
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# app/services/mv_refresher.py
+"""
+Refresh pentru MV-urile eMAG, declanșat de modificări (rulează în worker, thread separat).
+
+- „murdărie”: trigger-ele de pe emag_offer_stock_by_wh / emag_offers trimit
+  NOTIFY emag_mv_dirty cu numele MV-ului (migrarea c8d9e0f1a2b3); refresher-ul ascultă
+  pe o conexiune dedicată (LISTEN nu merge prin pgbouncer în transaction mode →
+  MV_REFRESH_LISTEN_URL poate indica direct Postgres-ul);
+- debounce: un MV murdar se reîmprospătează după MV_REFRESH_DEBOUNCE_S fără notificări noi,
+  dar cel târziu la MV_REFRESH_MAX_DELAY_S de la prima notificare și cel mult o dată la
+  MV_REFRESH_MIN_INTERVAL_S;
+- plasă de siguranță: la fiecare MV_REFRESH_SAFETY_INTERVAL_S toate MV-urile sunt marcate
+  murdare (notificări pierdute în timpul unei reconectări);
+- refresh: CONCURRENTLY (sau normal dacă MV-ul nu e populat), cu lock_timeout /
+  statement_timeout ca în scripts/refresh_mviews.sh, sub pg_try_advisory_xact_lock →
+  o singură replică a worker-ului reîmprospătează un MV la un moment dat;
+- cu EMAG_SUMMARY_SOURCE=incremental refresher-ul nu pornește (sumarele sunt ținute de
+  trigger-ele din app.services.emag_summary);
+- starea (ultimul refresh, durata, erori) e scrisă în app.mv_refresh_status și expusă
+  de /observability/v2/mviews.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import select
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+from app.database import DATABASE_URL, DEFAULT_SCHEMA, engine as default_engine
+
+logger = logging.getLogger("emag-db-api.mv_refresher")
+
+CHANNEL = "emag_mv_dirty"
+ENABLED = os.getenv("MV_REFRESH_ENABLED", "1").strip().lower() in {"1", "true", "yes", "on"}
+LISTEN_URL = os.getenv("MV_REFRESH_LISTEN_URL", "") or DATABASE_URL
+DEBOUNCE_S = float(os.getenv("MV_REFRESH_DEBOUNCE_S", "5"))
+MAX_DELAY_S = float(os.getenv("MV_REFRESH_MAX_DELAY_S", "300"))
+MIN_INTERVAL_S = float(os.getenv("MV_REFRESH_MIN_INTERVAL_S", "60"))
+SAFETY_INTERVAL_S = float(os.getenv("MV_REFRESH_SAFETY_INTERVAL_S", "3600"))  # 0 = dezactivat
+LOCK_TIMEOUT = os.getenv("MV_REFRESH_LOCK_TIMEOUT", "3s")
+STATEMENT_TIMEOUT = os.getenv("MV_REFRESH_STATEMENT_TIMEOUT", "2min")
+RECONNECT_S = float(os.getenv("MV_REFRESH_RECONNECT_S", "5"))
+
+# ordinea de refresh: mv_emag_best_offer citește din mv_emag_stock_summary
+MVS = ("mv_emag_stock_summary", "mv_emag_best_offer")
+DEPENDENTS: Dict[str, tuple] = {"mv_emag_stock_summary": ("mv_emag_best_offer",)}
+
+_STATUS_OK_SQL = text(f"""
+INSERT INTO "{DEFAULT_SCHEMA}".mv_refresh_status AS s (mv, last_refresh_at, duration_ms, concurrent, refreshes, updated_at)
+VALUES (:mv, now(), :ms, :concurrent, 1, now())
+ON CONFLICT (mv) DO UPDATE
+   SET last_refresh_at = EXCLUDED.last_refresh_at,
+       duration_ms = EXCLUDED.duration_ms,
+       concurrent = EXCLUDED.concurrent,
+       refreshes = s.refreshes + 1,
+       updated_at = EXCLUDED.updated_at
+""")
+_STATUS_ERR_SQL = text(f"""
+INSERT INTO "{DEFAULT_SCHEMA}".mv_refresh_status AS s (mv, failures, last_error, last_error_at, updated_at)
+VALUES (:mv, 1, :err, now(), now())
+ON CONFLICT (mv) DO UPDATE
+   SET failures = s.failures + 1,
+       last_error = EXCLUDED.last_error,
+       last_error_at = EXCLUDED.last_error_at,
+       updated_at = EXCLUDED.updated_at
+""")
+
+
+class _Dirty:
+    __slots__ = ("since", "last_notify")
+
+    def __init__(self, now: float) -> None:
+        self.since = now
+        self.last_notify = now
+
+
+class MvRefresher:
+    def __init__(self, eng: Optional[Engine] = None) -> None:
+        self.eng = eng or default_engine
+        self.dirty: Dict[str, _Dirty] = {}
+        self.last_refresh: Dict[str, float] = {}
+        self.last_safety = time.monotonic()
+
+    # -- murdărie / debounce -------------------------------------------------
+    def mark(self, mv: str, now: Optional[float] = None) -> None:
+        if mv not in MVS:
+            logger.debug("notificare ignorată pentru %r", mv)
+            return
+        now = time.monotonic() if now is None else now
+        for name in (mv, *DEPENDENTS.get(mv, ())):
+            d = self.dirty.get(name)
+            if d is None:
+                self.dirty[name] = _Dirty(now)
+            else:
+                d.last_notify = now
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        now = time.monotonic() if now is None else now
+        out = []
+        for mv in MVS:
+            d = self.dirty.get(mv)
+            if d is None:
+                continue
+            quiet = now - d.last_notify >= DEBOUNCE_S
+            overdue = now - d.since >= MAX_DELAY_S
+            spaced = now - self.last_refresh.get(mv, float("-inf")) >= MIN_INTERVAL_S
+            if (quiet or overdue) and spaced:
+                out.append(mv)
+        return out
+
+    def next_wakeup(self, now: float) -> float:
+        """Secunde până la următorul MV care poate deveni scadent (plafonat la 1s)."""
+        waits = [1.0]
+        for mv, d in self.dirty.items():
+            ready = max(
+                min(d.last_notify + DEBOUNCE_S, d.since + MAX_DELAY_S),
+                self.last_refresh.get(mv, float("-inf")) + MIN_INTERVAL_S,
+            )
+            waits.append(ready - now)
+        return max(0.0, min(waits))
+
+    def safety_tick(self, now: float) -> None:
+        if SAFETY_INTERVAL_S > 0 and now - self.last_safety >= SAFETY_INTERVAL_S:
+            self.last_safety = now
+            for mv in MVS:
+                self.mark(mv, now)
+
+    # -- refresh ---------------------------------------------------------------
+    def refresh(self, mv: str) -> bool:
+        """True dacă MV-ul a fost reîmprospătat (False: altă replică îl ține sau eroare)."""
+        qn = f'"{DEFAULT_SCHEMA}".{mv}'
+        t0 = time.perf_counter()
+        try:
+            with self.eng.begin() as conn:
+                conn.execute(text("SELECT set_config('lock_timeout', :v, true)"), {"v": LOCK_TIMEOUT})
+                conn.execute(text("SELECT set_config('statement_timeout', :v, true)"), {"v": STATEMENT_TIMEOUT})
+                got = conn.execute(
+                    text("SELECT pg_try_advisory_xact_lock(hashtext(:k))"), {"k": f"mv_refresh:{mv}"}
+                ).scalar()
+                if not got:
+                    logger.info("%s: refresh în curs pe altă replică, sar", mv)
+                    self.last_refresh[mv] = time.monotonic()
+                    return False
+                populated = conn.execute(
+                    text("SELECT relispopulated FROM pg_class WHERE oid = to_regclass(:mv)"), {"mv": qn}
+                ).scalar()
+                if populated is None:
+                    logger.warning("%s nu există, îl scot din listă", mv)
+                    self.dirty.pop(mv, None)
+                    return False
+                concurrent = bool(populated)
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrent else ''}{qn}"))
+                ms = (time.perf_counter() - t0) * 1000
+                conn.execute(_STATUS_OK_SQL, {"mv": mv, "ms": round(ms, 1), "concurrent": concurrent})
+        except Exception as e:
+            self.last_refresh[mv] = time.monotonic()  # reîncercare după MIN_INTERVAL_S
+            logger.warning("%s: refresh eșuat: %s", mv, e)
+            try:
+                with self.eng.begin() as conn:
+                    conn.execute(_STATUS_ERR_SQL, {"mv": mv, "err": str(e)[:2000]})
+            except Exception:
+                logger.exception("%s: nu pot salva eroarea în mv_refresh_status", mv)
+            return False
+        self.last_refresh[mv] = time.monotonic()
+        self.dirty.pop(mv, None)
+        logger.info("%s: refresh %s în %.0fms", mv, "concurrent" if concurrent else "complet", ms)
+        return True
+
+    def run_due(self) -> None:
+        for mv in self.due():
+            self.refresh(mv)
+
+
+# -- LISTEN (psycopg 2 și 3) ------------------------------------------------------
+def _listen_connection():
+    eng = create_engine(LISTEN_URL, poolclass=NullPool)
+    raw = eng.raw_connection()
+    dbapi = raw.driver_connection
+    dbapi.autocommit = True
+    cur = dbapi.cursor()
+    cur.execute(f"LISTEN {CHANNEL}")
+    cur.close()
+    return raw, dbapi
+
+
+def _wait_notifies(dbapi, timeout: float) -> Iterable[str]:
+    if hasattr(dbapi, "poll"):  # psycopg2
+        if select.select([dbapi], [], [], timeout) != ([], [], []):
+            dbapi.poll()
+        while dbapi.notifies:
+            yield dbapi.notifies.pop(0).payload
+        return
+    for n in dbapi.notifies(timeout=timeout):  # psycopg 3.2+
+        yield n.payload
+
+
+def run(stop: threading.Event, eng: Optional[Engine] = None) -> None:
+    """Bucla refresher-ului; se oprește la `stop`. Reconectează LISTEN la erori."""
+    r = MvRefresher(eng)
+    for mv in MVS:  # la pornire nu știm ce s-a schimbat între timp
+        r.mark(mv, time.monotonic() - DEBOUNCE_S)
+    raw = dbapi = None
+    while not stop.is_set():
+        if dbapi is None:
+            try:
+                raw, dbapi = _listen_connection()
+                logger.info("LISTEN %s activ", CHANNEL)
+                for mv in MVS:  # notificări pierdute cât timp n-am ascultat
+                    r.mark(mv)
+            except Exception as e:
+                logger.warning("LISTEN %s eșuat: %s (reîncerc în %.0fs)", CHANNEL, e, RECONNECT_S)
+                r.safety_tick(time.monotonic())
+                r.run_due()
+                stop.wait(RECONNECT_S)
+                continue
+        try:
+            for payload in _wait_notifies(dbapi, r.next_wakeup(time.monotonic())):
+                r.mark(payload)
+        except Exception as e:
+            logger.warning("conexiunea LISTEN a căzut: %s", e)
+            try:
+                raw.close()
+            except Exception:
+                pass
+            raw = dbapi = None
+        r.safety_tick(time.monotonic())
+        r.run_due()
+    if raw is not None:
+        raw.close()
+
+
+def start(stop: threading.Event) -> Optional[threading.Thread]:
+    if not ENABLED:
+        return None
+    from app.services.emag_summary import SUMMARY_SOURCE
+
+    if SUMMARY_SOURCE == "incremental":
+        # sumarele sunt ținute de trigger-e; MV-urile rămân doar pentru verify (scripts/refresh_mviews.sh)
+        logger.info("EMAG_SUMMARY_SOURCE=incremental: refresher-ul MV-urilor nu pornește")
+        return None
+    t = threading.Thread(target=run, args=(stop,), name="mv-refresher", daemon=True)
+    t.start()
+    return t
+
+
+__all__ = ["MvRefresher", "MVS", "run", "start"]
@@ -0,0 +1,277 @@
+# app/services/partition_manager.py
+"""
+Ciclul de viață al partițiilor lunare pentru istoricele eMAG
+(emag_offer_prices_hist → p_yYYYYmMM, emag_offer_stock_hist → s_yYYYYmMM).
+
+La fiecare rulare, per tabel:
+  1) partiția DEFAULT ({prefix}_default) ca plasă de siguranță: INSERT-urile nu mai eșuează
+     dacă managerul n-a rulat la timp (rândurile din default sunt raportate);
+  2) pre-creează luna curentă + PARTITION_PREMAKE_MONTHS luni viitoare. Partiția nouă se
+     creează ca tabel separat, primește eventualele rânduri ale lunii din default și abia
+     apoi e atașată (ATTACH nu eșuează din cauza rândurilor din default);
+  3) index BRIN pe recorded_at: index partiționat pe părinte (ON ONLY) + câte un index
+     per partiție atașat lui; partițiile atașate ulterior îl primesc automat;
+  4) retenție: partițiile cu luna < (luna curentă - PARTITION_RETENTION_MONTHS) sunt
+     detașate și șterse (0 = fără retenție).
+
+Fiecare pas rulează în tranzacția lui, cu lock_timeout (PARTITION_LOCK_TIMEOUT_MS) și
+advisory lock per tabel → rulări concurente (mai multe replici ale worker-ului) se sar.
+
+CLI:
+  python -m app.services.partition_manager              # o rulare, raport JSON
+  python -m app.services.partition_manager --dry-run    # doar ce s-ar face
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.database import DEFAULT_SCHEMA, engine as default_engine
+
+logger = logging.getLogger("emag-db-api.partitions")
+
+PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "13"))  # 0 = păstrează tot
+LOCK_TIMEOUT_MS = int(os.getenv("PARTITION_LOCK_TIMEOUT_MS", "5000"))
+
+# tabel partiționat → prefixul partițiilor (aceleași nume ca în migrarea a2b3c4d5e6f7)
+HIST_TABLES: Dict[str, str] = {
+    "emag_offer_prices_hist": "p",
+    "emag_offer_stock_hist": "s",
+}
+
+_PARTITIONS_SQL = text("""
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT' AS is_default
+  FROM pg_inherits i
+  JOIN pg_class c ON c.oid = i.inhrelid
+ WHERE i.inhparent = to_regclass(:parent)
+""")
+
+# partițiile care nu au încă un index atașat indexului BRIN partiționat al părintelui
+_MISSING_BRIN_SQL = text("""
+SELECT c.relname
+  FROM pg_inherits i
+  JOIN pg_class c ON c.oid = i.inhrelid
+ WHERE i.inhparent = to_regclass(:parent)
+   AND NOT EXISTS (
+         SELECT 1
+           FROM pg_inherits ii
+           JOIN pg_index x ON x.indexrelid = ii.inhrelid
+          WHERE ii.inhparent = to_regclass(:pidx) AND x.indrelid = c.oid)
+""")
+
+
+@dataclass
+class TableReport:
+    table: str
+    created: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    brin_attached: List[str] = field(default_factory=list)
+    default_created: bool = False
+    default_rows: int = 0
+    moved_from_default: int = 0
+    skipped: Optional[str] = None
+
+
+@dataclass
+class PartitionReport:
+    dry_run: bool
+    premake_months: int
+    retention_months: int
+    tables: List[TableReport] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _month(d: date, offset: int = 0) -> date:
+    n = d.year * 12 + (d.month - 1) + offset
+    return date(n // 12, n % 12 + 1, 1)
+
+
+def partition_name(prefix: str, month: date) -> str:
+    return f"{prefix}_y{month.year:04d}m{month.month:02d}"
+
+
+def _parse_month(prefix: str, name: str) -> Optional[date]:
+    m = re.fullmatch(rf"{re.escape(prefix)}_y(\d{{4}})m(\d{{2}})", name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def _qn(name: str) -> str:
+    return f'"{DEFAULT_SCHEMA}".{name}'
+
+
+def _begin_step(conn: Connection, table: str) -> bool:
+    """lock_timeout + advisory lock per tabel (tranzacțional). False → altă rulare e în curs."""
+    conn.execute(text(f"SET LOCAL lock_timeout = {max(0, LOCK_TIMEOUT_MS)}"))
+    return bool(
+        conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:k))"), {"k": f"partition_manager:{table}"}).scalar()
+    )
+
+
+def _partitions(conn: Connection, table: str) -> List[Tuple[str, bool]]:
+    rows = conn.execute(_PARTITIONS_SQL, {"parent": _qn(table)}).all()
+    return [(r[0], bool(r[1])) for r in rows]
+
+
+def _ensure_default(conn: Connection, table: str, prefix: str, rep: TableReport, dry_run: bool) -> None:
+    parts = _partitions(conn, table)
+    default = next((name for name, is_default in parts if is_default), None)
+    if default is None:
+        rep.default_created = True
+        if not dry_run:
+            conn.execute(text(f"CREATE TABLE {_qn(f'{prefix}_default')} PARTITION OF {_qn(table)} DEFAULT"))
+        return
+    rep.default_rows = int(conn.execute(text(f"SELECT count(*) FROM {_qn(default)}")).scalar() or 0)
+    if rep.default_rows:
+        logger.warning("%s: %d rânduri în partiția default %s", table, rep.default_rows, default)
+
+
+def _create_month(conn: Connection, table: str, prefix: str, month: date, rep: TableReport) -> None:
+    name = partition_name(prefix, month)
+    lo, hi = month.isoformat(), _month(month, 1).isoformat()
+    conn.execute(text(f"CREATE TABLE {_qn(name)} (LIKE {_qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    default = next((n for n, is_default in _partitions(conn, table) if is_default), None)
+    if default is not None:
+        moved = conn.execute(
+            text(f"""
+            WITH moved AS (
+              DELETE FROM {_qn(default)}
+               WHERE recorded_at >= CAST(:lo AS date) AND recorded_at < CAST(:hi AS date)
+              RETURNING *
+            )
+            INSERT INTO {_qn(name)} SELECT * FROM moved
+            """),
+            {"lo": lo, "hi": hi},
+        ).rowcount
+        rep.moved_from_default += max(0, moved or 0)
+    conn.execute(text(f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(name)} FOR VALUES FROM ('{lo}') TO ('{hi}')"))
+
+
+def _ensure_brin(conn: Connection, table: str, rep: TableReport, dry_run: bool) -> None:
+    pidx = f"ix_{table}_recorded_at_brin"
+    if dry_run:
+        exists = conn.execute(text("SELECT to_regclass(:i) IS NOT NULL"), {"i": _qn(pidx)}).scalar()
+        if not exists:
+            rep.brin_attached = [n for n, _ in _partitions(conn, table)]
+            return
+    else:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {pidx} ON ONLY {_qn(table)} USING brin (recorded_at)"))
+    for (part,) in conn.execute(_MISSING_BRIN_SQL, {"parent": _qn(table), "pidx": _qn(pidx)}).all():
+        rep.brin_attached.append(part)
+        if dry_run:
+            continue
+        idx = f"{part}_recorded_at_brin"
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {idx} ON {_qn(part)} USING brin (recorded_at)"))
+        conn.execute(text(f"ALTER INDEX {_qn(pidx)} ATTACH PARTITION {_qn(idx)}"))
+
+
+def _maintain_table(
+    eng: Engine, table: str, prefix: str, *, today: date, premake: int, retention: int, dry_run: bool
+) -> TableReport:
+    rep = TableReport(table=table)
+    with eng.connect() as conn:
+        missing = conn.execute(text("SELECT to_regclass(:t) IS NULL"), {"t": _qn(table)}).scalar()
+        conn.rollback()
+        if missing:
+            rep.skipped = "missing"
+            return rep
+
+        def step(fn, *args) -> bool:
+            with conn.begin() as trans:
+                if not _begin_step(conn, table):
+                    rep.skipped = "locked"
+                    return False
+                fn(*args)
+                if dry_run:
+                    trans.rollback()
+            return True
+
+        if not step(_ensure_default, conn, table, prefix, rep, dry_run):
+            return rep
+
+        existing = {name for name, _ in _partitions(conn, table)}
+        conn.rollback()
+        for i in range(0, max(0, premake) + 1):
+            month = _month(today, i)
+            name = partition_name(prefix, month)
+            if name in existing:
+                continue
+            rep.created.append(name)
+            if not dry_run and not step(_create_month, conn, table, prefix, month, rep):
+                return rep
+
+        if not step(_ensure_brin, conn, table, rep, dry_run):
+            return rep
+
+        if retention > 0:
+            cutoff = _month(today, -retention)
+            months = {name: _parse_month(prefix, name) for name, _ in _partitions(conn, table)}
+            expired = sorted(name for name, m in months.items() if m is not None and m < cutoff)
+            conn.rollback()
+            for name in expired:
+                rep.dropped.append(name)
+                if dry_run:
+                    continue
+
+                def _drop(n: str = name) -> None:
+                    conn.execute(text(f"ALTER TABLE {_qn(table)} DETACH PARTITION {_qn(n)}"))
+                    conn.execute(text(f"DROP TABLE {_qn(n)}"))
+
+                if not step(_drop):
+                    return rep
+    return rep
+
+
+def run_maintenance(
+    eng: Optional[Engine] = None,
+    *,
+    premake: int = PREMAKE_MONTHS,
+    retention: int = RETENTION_MONTHS,
+    dry_run: bool = False,
+    today: Optional[date] = None,
+) -> PartitionReport:
+    eng = eng or default_engine
+    t0 = time.perf_counter()
+    report = PartitionReport(dry_run=dry_run, premake_months=premake, retention_months=retention)
+    day = today or date.today()
+    for table, prefix in HIST_TABLES.items():
+        rep = _maintain_table(eng, table, prefix, today=day, premake=premake, retention=retention, dry_run=dry_run)
+        report.tables.append(rep)
+        if rep.created or rep.dropped or rep.default_created:
+            logger.info(
+                "%s: create=%s drop=%s default=%s moved=%d",
+                table, rep.created, rep.dropped, rep.default_created, rep.moved_from_default,
+            )
+    report.elapsed_ms = (time.perf_counter() - t0) * 1000
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Partiții lunare pentru istoricele eMAG (pre-creare, BRIN, retenție)")
+    ap.add_argument("--premake", type=int, default=PREMAKE_MONTHS, help="luni viitoare pre-create")
+    ap.add_argument("--retention", type=int, default=RETENTION_MONTHS, help="luni păstrate (0 = toate)")
+    ap.add_argument("--dry-run", action="store_true", help="doar raportează ce s-ar face")
+    args = ap.parse_args(argv)
+
+    report = run_maintenance(premake=args.premake, retention=args.retention, dry_run=args.dry_run)
+    json.dump(report.as_dict(), sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 0 if not any(t.skipped == "locked" for t in report.tables) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,483 @@
+# app/services/product_import.py
+"""
+Import bulk (CSV / NDJSON / Parquet) pentru produse și oferte eMAG.
+
+Pipeline per job (o singură tranzacție):
+  1) parse streamed al fișierului → tupluri text (line_no + coloane);
+  2) COPY FROM STDIN în tabelul UNLOGGED de staging (migrarea b1c2d3e4f5a6);
+  3) validare set-based: un singur UPDATE ... SET error = CASE ... + duplicate (window);
+  4) merge: un singur INSERT ... SELECT ... ON CONFLICT ... DO UPDATE din rândurile valide;
+  5) raport per rând (line_no, sku, error) și curățarea staging-ului pentru job.
+
+CLI:
+  python -m app.services.product_import products catalog.csv
+  python -m app.services.product_import offers offers.ndjson --format ndjson
+"""
+from __future__ import annotations
+
+import argparse
+import codecs
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import IO, Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.database import DEFAULT_SCHEMA, engine as default_engine
+
+IMPORT_FORMATS = {"csv", "ndjson", "parquet"}
+MAX_ERRORS_DEFAULT = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+# 0 = fără limită pentru job (statement_timeout global al conexiunii s-ar aplica altfel)
+IMPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("IMPORT_STATEMENT_TIMEOUT_MS", "0"))
+
+# SKU: aceeași regulă ca app.schemas.product.SKU_RE, în dialectul regex Postgres
+_SKU_PG_RX = r"^[A-Za-z0-9._-]{1,64}$"
+_NUM_PG_RX = r"^\s*[0-9]+(\.[0-9]+)?\s*$"
+_INT_PG_RX = r"^\s*[0-9]+\s*$"
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    kind: str
+    staging: str
+    columns: Tuple[str, ...]  # coloanele din fișier (în ordinea COPY, după job_id/line_no)
+    aliases: Dict[str, str] = field(default_factory=dict)  # nume alternative în fișier
+
+
+PRODUCTS = ImportSpec(
+    kind="products",
+    staging="import_products_staging",
+    columns=("name", "description", "price_raw", "sku"),
+    aliases={"price": "price_raw"},
+)
+
+OFFERS = ImportSpec(
+    kind="offers",
+    staging="import_offers_staging",
+    columns=("account", "country", "sku", "currency", "sale_price_raw", "stock_total_raw"),
+    aliases={"sale_price": "sale_price_raw", "stock_total": "stock_total_raw", "part_number": "sku"},
+)
+
+SPECS = {"products": PRODUCTS, "offers": OFFERS}
+
+# Content-Type -> format (când clientul nu trimite ?format=)
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/vnd.apache.parquet": "parquet",
+}
+# corpul request-ului e ținut în RAM până la pragul ăsta, apoi pe disc
+SPOOL_MAX_MEMORY = int(os.getenv("IMPORT_SPOOL_MAX_MEMORY", str(16 * 1024 * 1024)))
+
+
+@dataclass
+class ImportReport:
+    job_id: str
+    kind: str
+    received: int = 0
+    valid: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors_total: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        rpm = (self.received / (self.elapsed_ms / 60000.0)) if self.elapsed_ms else None
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "received": self.received,
+            "valid": self.valid,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "errors_total": self.errors_total,
+            "errors": self.errors,
+            "errors_truncated": self.errors_total > len(self.errors),
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "rows_per_minute": int(rpm) if rpm else None,
+        }
+
+
+# ----------------------------------------------------------------------------
+# Parsare (streamed) → (line_no, valori text) + erori de parsare
+# ----------------------------------------------------------------------------
+def _cell(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    s = v if isinstance(v, str) else str(v)
+    s = s.strip()
+    return s if s != "" else None
+
+
+def _normalize_record(spec: ImportSpec, rec: Dict[str, Any]) -> Tuple[Optional[str], ...]:
+    norm: Dict[str, Any] = {}
+    for k, v in rec.items():
+        if k is None:
+            continue
+        key = str(k).strip().lower()
+        norm[spec.aliases.get(key, key)] = v
+    return tuple(_cell(norm.get(c)) for c in spec.columns)
+
+
+def iter_records(
+    spec: ImportSpec, fp: IO[bytes], fmt: str, parse_errors: List[Dict[str, Any]]
+) -> Iterator[Tuple[int, Tuple[Optional[str], ...]]]:
+    """Generator (line_no, valori). Rândurile ne-parsabile ajung în `parse_errors`."""
+    if fmt == "csv":
+        # line_num = linia fizică din fișier (antetul e linia 1), ca la NDJSON
+        reader = csv.DictReader(codecs.getreader("utf-8-sig")(fp))
+        for rec in reader:
+            yield reader.line_num, _normalize_record(spec, rec)
+    elif fmt == "ndjson":
+        for i, raw in enumerate(fp, start=1):
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+                if not isinstance(rec, dict):
+                    raise ValueError("not an object")
+            except ValueError as e:
+                parse_errors.append({"line": i, "sku": None, "error": f"malformed_row: {e}"})
+                continue
+            yield i, _normalize_record(spec, rec)
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except Exception as e:  # pragma: no cover
+            raise RuntimeError("format=parquet requires pyarrow") from e
+        pf = pq.ParquetFile(fp)
+        i = 0
+        for batch in pf.iter_batches(batch_size=10000):
+            for rec in batch.to_pylist():
+                i += 1
+                yield i, _normalize_record(spec, rec)
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+
+
+# ----------------------------------------------------------------------------
+# COPY FROM STDIN (psycopg 3 sau psycopg2)
+# ----------------------------------------------------------------------------
+def _copy_escape(v: Optional[str]) -> str:
+    if v is None:
+        return r"\N"
+    return v.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class _IterTextFile(io.RawIOBase):
+    """File-like read() peste un iterator de linii (pentru psycopg2.copy_expert)."""
+
+    def __init__(self, lines: Iterator[str]):
+        self._it = lines
+        self._buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while len(self._buf) < len(b):
+            try:
+                self._buf += next(self._it).encode("utf-8")
+            except StopIteration:
+                break
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def _copy_rows(dbapi_conn, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    cols = ", ".join(columns)
+    sql = f'COPY "{DEFAULT_SCHEMA}".{table} ({cols}) FROM STDIN'
+    count = 0
+
+    def counted():
+        nonlocal count
+        for r in rows:
+            count += 1
+            yield r
+
+    cur = dbapi_conn.cursor()
+    try:
+        if hasattr(cur, "copy"):  # psycopg 3
+            with cur.copy(sql) as cp:
+                for r in counted():
+                    cp.write_row(r)
+        else:  # psycopg2
+            lines = ("\t".join(_copy_escape(None if v is None else str(v)) for v in r) + "\n" for r in counted())
+            cur.copy_expert(sql, _IterTextFile(lines), size=65536)
+    finally:
+        cur.close()
+    return count
+
+
+# ----------------------------------------------------------------------------
+# Validare set-based + merge
+# ----------------------------------------------------------------------------
+def _validate_products_sql(s: str) -> List[str]:
+    st = f'"{s}".import_products_staging'
+    return [
+        f"""
+        UPDATE {st} SET error = CASE
+            WHEN sku IS NULL THEN 'missing_sku'
+            WHEN sku !~ '{_SKU_PG_RX}' THEN 'invalid_sku'
+            WHEN name IS NULL THEN 'missing_name'
+            WHEN length(name) > 255 THEN 'name_too_long'
+            WHEN price_raw ~ '^\\s*-' THEN 'negative_price'
+            WHEN price_raw IS NOT NULL AND price_raw !~ '{_NUM_PG_RX}' THEN 'invalid_price'
+            WHEN price_raw IS NOT NULL AND round(price_raw::numeric, 2) >= 10000000000 THEN 'price_out_of_range'
+          END
+        WHERE job_id = :job
+        """,
+        # duplicate în fișier: păstrăm ultima apariție a SKU-ului
+        f"""
+        UPDATE {st} s SET error = 'duplicate_sku_in_file'
+          FROM (
+            SELECT line_no, row_number() OVER (PARTITION BY sku ORDER BY line_no DESC) AS rn
+              FROM {st} WHERE job_id = :job AND error IS NULL
+          ) d
+         WHERE s.job_id = :job AND s.line_no = d.line_no AND d.rn > 1
+        """,
+    ]
+
+
+def _merge_products_sql(s: str) -> str:
+    return f"""
+    WITH src AS (
+      SELECT name, description, round(price_raw::numeric, 2) AS price, sku
+        FROM "{s}".import_products_staging
+       WHERE job_id = :job AND error IS NULL
+    ), up AS (
+      INSERT INTO "{s}".products AS p (name, description, price, sku)
+      SELECT name, description, price, sku FROM src
+      ON CONFLICT (sku) WHERE sku IS NOT NULL DO UPDATE
+         SET name = EXCLUDED.name,
+             description = EXCLUDED.description,
+             price = EXCLUDED.price
+       WHERE (p.name, p.description, p.price) IS DISTINCT FROM
+             (EXCLUDED.name, EXCLUDED.description, EXCLUDED.price)
+      RETURNING (xmax = 0) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted)     AS inserted,
+           count(*) FILTER (WHERE NOT inserted) AS updated
+      FROM up
+    """
+
+
+def _validate_offers_sql(s: str) -> List[str]:
+    st = f'"{s}".import_offers_staging'
+    return [
+        f"""
+        UPDATE {st} o SET error = CASE
+            WHEN o.sku IS NULL THEN 'missing_sku'
+            WHEN o.account IS NULL THEN 'missing_account'
+            WHEN upper(coalesce(o.country, 'RO')) NOT IN ('RO', 'BG', 'HU') THEN 'invalid_country'
+            WHEN o.currency IS NOT NULL AND o.currency !~ '^[A-Za-z]{{3}}$' THEN 'invalid_currency'
+            WHEN o.sale_price_raw ~ '^\\s*-' THEN 'negative_price'
+            WHEN o.sale_price_raw IS NOT NULL AND o.sale_price_raw !~ '{_NUM_PG_RX}' THEN 'invalid_price'
+            WHEN o.stock_total_raw IS NOT NULL AND o.stock_total_raw !~ '{_INT_PG_RX}' THEN 'invalid_stock'
+            -- limitele coloanelor țintă (NUMERIC(12,2), int4): altfel cast-ul din merge pică tot job-ul
+            WHEN o.sale_price_raw IS NOT NULL AND round(o.sale_price_raw::numeric, 2) >= 10000000000 THEN 'price_out_of_range'
+            WHEN o.stock_total_raw IS NOT NULL AND o.stock_total_raw::numeric > 2147483647 THEN 'stock_out_of_range'
+            WHEN NOT EXISTS (SELECT 1 FROM "{s}".emag_account a WHERE lower(a.code) = lower(o.account)) THEN 'unknown_account'
+            WHEN NOT EXISTS (SELECT 1 FROM "{s}".products p WHERE p.sku = o.sku) THEN 'unknown_sku'
+          END
+        WHERE o.job_id = :job
+        """,
+        f"""
+        UPDATE {st} s SET error = 'duplicate_offer_in_file'
+          FROM (
+            SELECT line_no,
+                   row_number() OVER (
+                     PARTITION BY lower(account), upper(coalesce(country, 'RO')), sku
+                     ORDER BY line_no DESC
+                   ) AS rn
+              FROM {st} WHERE job_id = :job AND error IS NULL
+          ) d
+         WHERE s.job_id = :job AND s.line_no = d.line_no AND d.rn > 1
+        """,
+    ]
+
+
+def _merge_offers_sql(s: str) -> str:
+    return f"""
+    WITH src AS (
+      SELECT a.id AS account_id,
+             upper(coalesce(o.country, 'RO'))::"{s}".country_code AS country,
+             p.id AS product_id,
+             upper(o.currency)::char(3) AS currency,
+             round(o.sale_price_raw::numeric, 2) AS sale_price,
+             o.stock_total_raw::int AS stock_total
+        FROM "{s}".import_offers_staging o
+        JOIN "{s}".emag_account a ON lower(a.code) = lower(o.account)
+        JOIN "{s}".products p ON p.sku = o.sku
+       WHERE o.job_id = :job AND o.error IS NULL
+    ), up AS (
+      INSERT INTO "{s}".emag_offers AS e (account_id, country, product_id, currency, sale_price, stock_total)
+      SELECT account_id, country, product_id, currency, sale_price, stock_total FROM src
+      ON CONFLICT (account_id, country, product_id) DO UPDATE
+         SET currency = COALESCE(EXCLUDED.currency, e.currency),
+             sale_price = COALESCE(EXCLUDED.sale_price, e.sale_price),
+             stock_total = COALESCE(EXCLUDED.stock_total, e.stock_total)
+       WHERE (e.currency, e.sale_price, e.stock_total) IS DISTINCT FROM
+             (COALESCE(EXCLUDED.currency, e.currency),
+              COALESCE(EXCLUDED.sale_price, e.sale_price),
+              COALESCE(EXCLUDED.stock_total, e.stock_total))
+      RETURNING (xmax = 0) AS inserted
+    )
+    SELECT count(*) FILTER (WHERE inserted)     AS inserted,
+           count(*) FILTER (WHERE NOT inserted) AS updated
+      FROM up
+    """
+
+
+_SQL = {
+    "products": (_validate_products_sql, _merge_products_sql),
+    "offers": (_validate_offers_sql, _merge_offers_sql),
+}
+
+
+def run_import(
+    kind: str,
+    fp: IO[bytes],
+    fmt: str,
+    *,
+    engine: Optional[Engine] = None,
+    max_errors: int = MAX_ERRORS_DEFAULT,
+    dry_run: bool = False,
+) -> ImportReport:
+    """
+    Rulează un job complet de import. `fp` e un fișier binar (seekable pentru Parquet).
+    dry_run=True validează și raportează, fără merge (rollback la final).
+    """
+    if kind not in SPECS:
+        raise ValueError(f"unknown import kind: {kind}")
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"unsupported format: {fmt}")
+
+    spec = SPECS[kind]
+    validate_sql, merge_sql = _SQL[kind]
+    eng = engine or default_engine
+    job = uuid.uuid4()
+    report = ImportReport(job_id=str(job), kind=kind)
+    parse_errors: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+
+    with eng.connect() as conn:
+        trans = conn.begin()
+        try:
+            # jobul e lung prin natura lui; nu moștenim statement_timeout-ul conexiunii
+            conn.execute(text(f"SET LOCAL statement_timeout = {max(0, IMPORT_STATEMENT_TIMEOUT_MS)}"))
+
+            rows = (
+                (str(job), line_no, *values)
+                for line_no, values in iter_records(spec, fp, fmt, parse_errors)
+            )
+            dbapi = conn.connection.driver_connection
+            copied = _copy_rows(dbapi, spec.staging, ("job_id", "line_no", *spec.columns), rows)
+            report.received = copied + len(parse_errors)
+
+            params = {"job": str(job)}
+            for stmt in validate_sql(DEFAULT_SCHEMA):
+                conn.execute(text(stmt), params)
+
+            st = f'"{DEFAULT_SCHEMA}".{spec.staging}'
+            report.valid = int(
+                conn.execute(text(f"SELECT count(*) FROM {st} WHERE job_id = :job AND error IS NULL"), params).scalar() or 0
+            )
+            staged_errors = int(
+                conn.execute(text(f"SELECT count(*) FROM {st} WHERE job_id = :job AND error IS NOT NULL"), params).scalar() or 0
+            )
+            report.errors_total = staged_errors + len(parse_errors)
+            err_rows = conn.execute(
+                text(
+                    f"SELECT line_no, sku, error FROM {st} WHERE job_id = :job AND error IS NOT NULL "
+                    f"ORDER BY line_no LIMIT :lim"
+                ),
+                {**params, "lim": max_errors},
+            ).all()
+            merged = sorted(
+                parse_errors + [{"line": r[0], "sku": r[1], "error": r[2]} for r in err_rows],
+                key=lambda e: e["line"],
+            )
+            report.errors = merged[:max_errors]
+
+            if not dry_run and report.valid:
+                res = conn.execute(text(merge_sql(DEFAULT_SCHEMA)), params).mappings().one()
+                report.inserted = int(res["inserted"] or 0)
+                report.updated = int(res["updated"] or 0)
+                report.unchanged = report.valid - report.inserted - report.updated
+
+            conn.execute(text(f"DELETE FROM {st} WHERE job_id = :job"), params)
+            if dry_run:
+                trans.rollback()
+            else:
+                trans.commit()
+        except Exception:
+            trans.rollback()
+            raise
+
+    report.elapsed_ms = (time.perf_counter() - t0) * 1000
+    return report
+
+
+def format_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    base = (content_type or "").split(";", 1)[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(base)
+
+
+async def spool_stream(chunks: AsyncIterator[bytes]) -> IO[bytes]:
+    """Copiază un body streamed într-un fișier temporar (RAM → disc), poziționat la început."""
+    tmp = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+b")
+    async for chunk in chunks:
+        if chunk:
+            tmp.write(chunk)
+    tmp.seek(0)
+    return tmp  # type: ignore[return-value]
+
+
+def _guess_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"jsonl": "ndjson", "json": "ndjson", "pq": "parquet"}.get(ext, ext)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Bulk import produse / oferte eMAG (COPY + merge set-based)")
+    ap.add_argument("kind", choices=sorted(SPECS))
+    ap.add_argument("path", help="fișier CSV / NDJSON / Parquet ('-' = stdin)")
+    ap.add_argument("--format", dest="fmt", choices=sorted(IMPORT_FORMATS))
+    ap.add_argument("--max-errors", type=int, default=MAX_ERRORS_DEFAULT)
+    ap.add_argument("--dry-run", action="store_true", help="doar validare, fără merge")
+    args = ap.parse_args(argv)
+
+    fmt = args.fmt or (_guess_format(args.path) if args.path != "-" else "csv")
+    if fmt not in IMPORT_FORMATS:
+        ap.error(f"nu pot deduce formatul din '{args.path}', folosește --format")
+
+    if args.path == "-":
+        report = run_import(args.kind, sys.stdin.buffer, fmt, max_errors=args.max_errors, dry_run=args.dry_run)
+    else:
+        with open(args.path, "rb") as fp:
+            report = run_import(args.kind, fp, fmt, max_errors=args.max_errors, dry_run=args.dry_run)
+
+    json.dump(report.as_dict(), sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 0 if report.errors_total == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
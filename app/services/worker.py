@@ -0,0 +1,110 @@
+# app/services/worker.py
+"""
+Procesul worker (serviciul `worker` din docker-compose): rulează periodic job-urile de
+mentenanță, fiecare cu intervalul lui (0 = dezactivat).
+
+Job-uri:
+  - partitions → app.services.partition_manager.run_maintenance (WORKER_PARTITIONS_INTERVAL_S)
+
+În paralel (thread separat, MV_REFRESH_ENABLED): app.services.mv_refresher – refresh
+debounced al MV-urilor eMAG, declanșat de NOTIFY.
+
+Un job care eșuează e logat și reîncercat la următorul interval; SIGTERM/SIGINT opresc
+bucla între job-uri.
+
+CLI:
+  python -m app.services.worker            # buclă
+  python -m app.services.worker --once     # fiecare job activ o singură dată
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+logger = logging.getLogger("emag-db-api.worker")
+
+PARTITIONS_INTERVAL_S = float(os.getenv("WORKER_PARTITIONS_INTERVAL_S", "21600"))
+# pasul maxim de așteptare între verificări (răspuns rapid la SIGTERM)
+TICK_S = float(os.getenv("WORKER_TICK_S", "5"))
+
+
+@dataclass
+class Job:
+    name: str
+    interval_s: float
+    fn: Callable[[], object]
+    next_run: float = 0.0
+
+
+def _partitions() -> object:
+    from app.services.partition_manager import run_maintenance
+
+    return run_maintenance()
+
+
+def default_jobs() -> List[Job]:
+    jobs = [Job("partitions", PARTITIONS_INTERVAL_S, _partitions)]
+    return [j for j in jobs if j.interval_s > 0]
+
+
+def _run_job(job: Job) -> None:
+    t0 = time.perf_counter()
+    try:
+        job.fn()
+        logger.info("job %s ok în %.0fms", job.name, (time.perf_counter() - t0) * 1000)
+    except Exception:
+        logger.exception("job %s eșuat", job.name)
+
+
+def run(jobs: List[Job], stop: threading.Event, *, once: bool = False) -> None:
+    if once:
+        for job in jobs:
+            _run_job(job)
+        return
+    while not stop.is_set():
+        now = time.monotonic()
+        for job in jobs:
+            if stop.is_set():
+                break
+            if now >= job.next_run:
+                _run_job(job)
+                job.next_run = time.monotonic() + job.interval_s
+        due = min((j.next_run for j in jobs), default=time.monotonic() + TICK_S)
+        stop.wait(max(0.0, min(TICK_S, due - time.monotonic())))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Worker de mentenanță (partiții, refresh MV-uri)")
+    ap.add_argument("--once", action="store_true", help="rulează fiecare job o dată și ieși")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    jobs = default_jobs()
+    logger.info("worker pornit: %s", ", ".join(f"{j.name}/{j.interval_s:.0f}s" for j in jobs) or "niciun job")
+    refresher = None
+    if not args.once:
+        from app.services import mv_refresher
+
+        refresher = mv_refresher.start(stop)
+    run(jobs, stop, once=args.once)
+    if refresher is not None:
+        refresher.join(timeout=10)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# migrations/versions/a2c3d4e5f6a7_emag_summary_triggers_opt_in.py
+"""Install the eMAG summary triggers only when EMAG_SUMMARY_SOURCE=incremental
+
+Revision ID: a2c3d4e5f6a7
+Revises: f1a2b3c4d5e6
+Create Date: 2025-09-21
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "a2c3d4e5f6a7"
+down_revision = "f1a2b3c4d5e6"
+branch_labels = None
+depends_on = None
+
+# Trigger-ele din b7c8d9e0f1a2 fac scrierile de stoc de 3–5× mai lente (scripts/bench_emag_summary.py),
+# iar implicit cititorii folosesc MV-urile. Funcțiile rămân; trigger-ele se (re)instalează cu
+# `python -m app.services.emag_summary enable` (care face și rebuild).
+
+_TABLES = (("emag_offer_stock_by_wh", "tg_emag_offer_stock_by_wh_summary"), ("emag_offers", "tg_emag_offers_summary"))
+_OPS = (
+    ("INSERT", "ins", "NEW TABLE AS new_rows"),
+    ("UPDATE", "upd", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    ("DELETE", "del", "OLD TABLE AS old_rows"),
+)
+
+
+def _incremental() -> bool:
+    return os.getenv("EMAG_SUMMARY_SOURCE", "mv").strip().lower() == "incremental"
+
+
+def _drop(schema: str) -> None:
+    for table, fn in _TABLES:
+        for _, suffix, _ in _OPS:
+            op.execute(f'DROP TRIGGER IF EXISTS {fn}_{suffix} ON "{schema}".{table};')
+
+
+def _create(schema: str) -> None:
+    _drop(schema)
+    for table, fn in _TABLES:
+        for op_name, suffix, tables in _OPS:
+            op.execute(
+                f'CREATE TRIGGER {fn}_{suffix} AFTER {op_name} ON "{schema}".{table} '
+                f'REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION "{schema}".{fn}();'
+            )
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    if _incremental():
+        _create(schema)
+    else:
+        _drop(schema)
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    _create(schema)
@@ -0,0 +1,186 @@
+# migrations/versions/a6b7c8d9e0f1_emag_history_capture.py
+"""Change-only price/stock history: statement-level triggers into emag_offer_*_hist
+
+Revision ID: a6b7c8d9e0f1
+Revises: f5a6b7c8d9e0
+Create Date: 2025-09-16
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "a6b7c8d9e0f1"
+down_revision = "f5a6b7c8d9e0"
+branch_labels = None
+depends_on = None
+
+# tabel istoric → prefixul partițiilor (ca în app.services.partition_manager)
+_HIST = {"emag_offer_prices_hist": "p", "emag_offer_stock_hist": "s"}
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # Trigger-ele scriu în istorice la fiecare INSERT/UPDATE: fără partiție pentru luna
+    # curentă, scrierea ofertei ar eșua → partiția DEFAULT e obligatorie de aici înainte.
+    for table, prefix in _HIST.items():
+        op.execute(f"""
+        DO $$
+        BEGIN
+          IF NOT EXISTS (
+               SELECT 1 FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = '"{schema}".{table}'::regclass
+                  AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT') THEN
+            CREATE TABLE "{schema}".{prefix}_default PARTITION OF "{schema}".{table} DEFAULT;
+          END IF;
+        END$$;
+        """)
+
+    # Contoare cumulative: rânduri scrise în tabelele curente vs. rânduri istorice înregistrate
+    op.execute(f"""
+    CREATE TABLE IF NOT EXISTS "{schema}".emag_hist_capture_stats (
+      kind          text        PRIMARY KEY,
+      statements    bigint      NOT NULL DEFAULT 0,
+      rows_seen     bigint      NOT NULL DEFAULT 0,
+      rows_recorded bigint      NOT NULL DEFAULT 0,
+      updated_at    timestamptz NOT NULL DEFAULT now()
+    );
+    """)
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".emag_hist_capture_count(p_kind text, p_seen bigint, p_recorded bigint)
+    RETURNS void LANGUAGE sql AS $$
+      INSERT INTO "{schema}".emag_hist_capture_stats AS s (kind, statements, rows_seen, rows_recorded, updated_at)
+      VALUES (p_kind, 1, p_seen, p_recorded, now())
+      ON CONFLICT (kind) DO UPDATE
+         SET statements    = s.statements + 1,
+             rows_seen     = s.rows_seen + EXCLUDED.rows_seen,
+             rows_recorded = s.rows_recorded + EXCLUDED.rows_recorded,
+             updated_at    = EXCLUDED.updated_at;
+    $$;
+    """)
+
+    # Prețuri: o linie doar când (sale_price, currency) se schimbă. Un singur INSERT ... SELECT
+    # per statement (tabele de tranziție); recorded_at = now() → două schimbări în aceeași
+    # tranzacție păstrează ultima valoare.
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_emag_offers_price_hist() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+      v_seen bigint;
+      v_rec  bigint;
+    BEGIN
+      SELECT count(*) INTO v_seen FROM new_rows;
+      IF v_seen = 0 THEN
+        RETURN NULL;
+      END IF;
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO "{schema}".emag_offer_prices_hist (offer_id, recorded_at, currency, sale_price)
+        SELECT n.id, now(), n.currency, n.sale_price
+          FROM new_rows n
+         WHERE n.currency IS NOT NULL AND n.sale_price IS NOT NULL
+        ON CONFLICT (offer_id, recorded_at) DO UPDATE
+           SET currency = EXCLUDED.currency, sale_price = EXCLUDED.sale_price;
+      ELSE
+        INSERT INTO "{schema}".emag_offer_prices_hist (offer_id, recorded_at, currency, sale_price)
+        SELECT n.id, now(), n.currency, n.sale_price
+          FROM new_rows n
+          JOIN old_rows o ON o.id = n.id
+         WHERE n.currency IS NOT NULL AND n.sale_price IS NOT NULL
+           AND (n.sale_price, n.currency) IS DISTINCT FROM (o.sale_price, o.currency)
+        ON CONFLICT (offer_id, recorded_at) DO UPDATE
+           SET currency = EXCLUDED.currency, sale_price = EXCLUDED.sale_price;
+      END IF;
+      GET DIAGNOSTICS v_rec = ROW_COUNT;
+      PERFORM "{schema}".emag_hist_capture_count('prices', v_seen, v_rec);
+      RETURN NULL;
+    END
+    $$;
+    """)
+
+    # Stoc per depozit: o linie doar când (stock, reserved, incoming) se schimbă.
+    # Istoricul are CHECK >= 0, tabela curentă nu → valorile negative se înregistrează ca 0.
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_emag_stock_by_wh_hist() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+      v_seen bigint;
+      v_rec  bigint;
+    BEGIN
+      SELECT count(*) INTO v_seen FROM new_rows;
+      IF v_seen = 0 THEN
+        RETURN NULL;
+      END IF;
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO "{schema}".emag_offer_stock_hist
+               (offer_id, warehouse_code, recorded_at, stock, reserved, incoming)
+        SELECT n.offer_id, n.warehouse_code, now(),
+               greatest(n.stock, 0), greatest(n.reserved, 0), greatest(n.incoming, 0)
+          FROM new_rows n
+        ON CONFLICT (offer_id, warehouse_code, recorded_at) DO UPDATE
+           SET stock = EXCLUDED.stock, reserved = EXCLUDED.reserved, incoming = EXCLUDED.incoming;
+      ELSE
+        INSERT INTO "{schema}".emag_offer_stock_hist
+               (offer_id, warehouse_code, recorded_at, stock, reserved, incoming)
+        SELECT n.offer_id, n.warehouse_code, now(),
+               greatest(n.stock, 0), greatest(n.reserved, 0), greatest(n.incoming, 0)
+          FROM new_rows n
+          -- LEFT JOIN: un UPDATE care schimbă warehouse_code apare ca depozit nou
+          LEFT JOIN old_rows o ON o.offer_id = n.offer_id AND o.warehouse_code = n.warehouse_code
+         WHERE o.offer_id IS NULL
+            OR (n.stock, n.reserved, n.incoming) IS DISTINCT FROM (o.stock, o.reserved, o.incoming)
+        ON CONFLICT (offer_id, warehouse_code, recorded_at) DO UPDATE
+           SET stock = EXCLUDED.stock, reserved = EXCLUDED.reserved, incoming = EXCLUDED.incoming;
+      END IF;
+      GET DIAGNOSTICS v_rec = ROW_COUNT;
+      PERFORM "{schema}".emag_hist_capture_count('stock', v_seen, v_rec);
+      RETURN NULL;
+    END
+    $$;
+    """)
+
+    for table, fn in (
+        ("emag_offers", "tg_emag_offers_price_hist"),
+        ("emag_offer_stock_by_wh", "tg_emag_stock_by_wh_hist"),
+    ):
+        for op_name, tables in (
+            ("INSERT", "NEW TABLE AS new_rows"),
+            ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ):
+            tg = f"{fn}_{op_name.lower()[:3]}"
+            op.execute(f'DROP TRIGGER IF EXISTS {tg} ON "{schema}".{table};')
+            op.execute(f"""
+            CREATE TRIGGER {tg}
+              AFTER {op_name} ON "{schema}".{table}
+              REFERENCING {tables}
+              FOR EACH STATEMENT EXECUTE FUNCTION "{schema}".{fn}();
+            """)
+
+    # Punctul de plecare: valorile curente (altfel prima schimbare n-ar avea „înainte”)
+    op.execute(f"""
+    INSERT INTO "{schema}".emag_offer_prices_hist (offer_id, recorded_at, currency, sale_price)
+    SELECT id, now(), currency, sale_price FROM "{schema}".emag_offers
+     WHERE currency IS NOT NULL AND sale_price IS NOT NULL
+    ON CONFLICT DO NOTHING;
+    """)
+    op.execute(f"""
+    INSERT INTO "{schema}".emag_offer_stock_hist (offer_id, warehouse_code, recorded_at, stock, reserved, incoming)
+    SELECT offer_id, warehouse_code, now(), greatest(stock, 0), greatest(reserved, 0), greatest(incoming, 0)
+      FROM "{schema}".emag_offer_stock_by_wh
+    ON CONFLICT DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    for table, tg_prefix in (
+        ("emag_offers", "tg_emag_offers_price_hist"),
+        ("emag_offer_stock_by_wh", "tg_emag_stock_by_wh_hist"),
+    ):
+        for suffix in ("ins", "upd"):
+            op.execute(f'DROP TRIGGER IF EXISTS {tg_prefix}_{suffix} ON "{schema}".{table};')
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".tg_emag_stock_by_wh_hist();')
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".tg_emag_offers_price_hist();')
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".emag_hist_capture_count(text, bigint, bigint);')
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".emag_hist_capture_stats;')
+    # Istoricele și partițiile DEFAULT rămân (date + plasă de siguranță pentru partition_manager).
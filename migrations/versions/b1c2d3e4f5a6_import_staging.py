@@ -0,0 +1,56 @@
+# migrations/versions/b1c2d3e4f5a6_import_staging.py
+"""UNLOGGED staging tables for COPY-based bulk import (products, eMAG offers)
+
+Revision ID: b1c2d3e4f5a6
+Revises: cb8d65506439
+Create Date: 2025-09-10
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "b1c2d3e4f5a6"
+down_revision = "cb8d65506439"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # UNLOGGED: fără WAL (date tranzitorii, se pierd la crash – jobul se reia oricum).
+    # Coloanele sunt TEXT: validarea/cast-ul se fac set-based, după COPY.
+    op.execute(f"""
+    CREATE UNLOGGED TABLE IF NOT EXISTS "{schema}".import_products_staging (
+      job_id      uuid   NOT NULL,
+      line_no     bigint NOT NULL,
+      name        text,
+      description text,
+      price_raw   text,
+      sku         text,
+      error       text
+    );
+    """)
+    op.execute(f'CREATE INDEX IF NOT EXISTS ix_import_products_staging_job ON "{schema}".import_products_staging (job_id, line_no);')
+
+    op.execute(f"""
+    CREATE UNLOGGED TABLE IF NOT EXISTS "{schema}".import_offers_staging (
+      job_id          uuid   NOT NULL,
+      line_no         bigint NOT NULL,
+      account         text,
+      country         text,
+      sku             text,
+      currency        text,
+      sale_price_raw  text,
+      stock_total_raw text,
+      error           text
+    );
+    """)
+    op.execute(f'CREATE INDEX IF NOT EXISTS ix_import_offers_staging_job ON "{schema}".import_offers_staging (job_id, line_no);')
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".import_offers_staging;')
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".import_products_staging;')
@@ -0,0 +1,145 @@
+# migrations/versions/b3d4e5f6a7b8_category_product_counts_table.py
+"""Move the per-category product counter to category_product_counts; triggers only in column mode
+
+Revision ID: b3d4e5f6a7b8
+Revises: a2c3d4e5f6a7
+Create Date: 2025-09-21
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "b3d4e5f6a7b8"
+down_revision = "a2c3d4e5f6a7"
+branch_labels = None
+depends_on = None
+
+# Contorul din e4f5a6b7c8d9 făcea UPDATE pe categories la fiecare attach/detach: bump de
+# updated_at (tg_categories_set_timestamps) și lock pe rândul categoriei, deci scriitorii pe
+# categorii populare se serializau chiar cu CATEGORY_COUNTS_SOURCE=join (implicit). Contorul
+# stă acum în tabela separată category_product_counts, iar trigger-ele există doar în modul
+# column (`python -m app.services.category_counts enable` le instalează ulterior).
+
+_OPS = (
+    ("INSERT", "NEW TABLE AS new_rows"),
+    ("DELETE", "OLD TABLE AS old_rows"),
+    ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+)
+
+
+def _column_mode() -> bool:
+    return os.getenv("CATEGORY_COUNTS_SOURCE", "join").strip().lower() == "column"
+
+
+def _drop_triggers(schema: str) -> None:
+    for op_name, _ in _OPS:
+        op.execute(f'DROP TRIGGER IF EXISTS tg_product_categories_count_{op_name.lower()} ON "{schema}".product_categories;')
+
+
+def _create_triggers(schema: str) -> None:
+    _drop_triggers(schema)
+    for op_name, tables in _OPS:
+        op.execute(f"""
+        CREATE TRIGGER tg_product_categories_count_{op_name.lower()}
+          AFTER {op_name} ON "{schema}".product_categories
+          REFERENCING {tables}
+          FOR EACH STATEMENT EXECUTE FUNCTION "{schema}".tg_category_product_count();
+        """)
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    _drop_triggers(schema)
+
+    op.execute(f"""
+    CREATE TABLE IF NOT EXISTS "{schema}".category_product_counts (
+      category_id   integer PRIMARY KEY REFERENCES "{schema}".categories(id) ON DELETE CASCADE,
+      product_count integer NOT NULL DEFAULT 0
+    );
+    """)
+
+    # Delta-urile agregate per statement, upsert în ordinea category_id (lock-uri în aceeași
+    # ordine între tranzacții). DELETE face doar UPDATE: la ștergerea unei categorii, cascada pe
+    # product_categories rulează după ce rândul categoriei (și contorul ei) au dispărut.
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_category_product_count() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO "{schema}".category_product_counts AS c (category_id, product_count)
+        SELECT category_id, count(*) FROM new_rows GROUP BY category_id ORDER BY category_id
+        ON CONFLICT (category_id) DO UPDATE SET product_count = c.product_count + EXCLUDED.product_count;
+      ELSIF TG_OP = 'DELETE' THEN
+        UPDATE "{schema}".category_product_counts c SET product_count = c.product_count - d.n
+          FROM (SELECT category_id, count(*) AS n FROM old_rows GROUP BY category_id) d
+         WHERE c.category_id = d.category_id;
+      ELSE
+        INSERT INTO "{schema}".category_product_counts AS c (category_id, product_count)
+        SELECT d.category_id, d.n FROM (
+          SELECT category_id, sum(n)::integer AS n FROM (
+            SELECT category_id, count(*) AS n FROM new_rows GROUP BY category_id
+            UNION ALL
+            SELECT category_id, -count(*) AS n FROM old_rows GROUP BY category_id
+          ) x GROUP BY category_id
+        ) d
+         WHERE d.n <> 0
+         ORDER BY d.category_id
+        ON CONFLICT (category_id) DO UPDATE SET product_count = c.product_count + EXCLUDED.product_count;
+      END IF;
+      RETURN NULL;
+    END
+    $$;
+    """)
+    op.execute(f'ALTER TABLE "{schema}".categories DROP COLUMN IF EXISTS product_count;')
+
+    if _column_mode():
+        _create_triggers(schema)
+        op.execute(f"""
+        INSERT INTO "{schema}".category_product_counts (category_id, product_count)
+        SELECT category_id, count(*) FROM "{schema}".product_categories GROUP BY category_id
+        ON CONFLICT (category_id) DO UPDATE SET product_count = EXCLUDED.product_count;
+        """)
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    _drop_triggers(schema)
+    op.execute(
+        f'ALTER TABLE "{schema}".categories ADD COLUMN IF NOT EXISTS product_count integer NOT NULL DEFAULT 0;'
+    )
+    op.execute(f"""
+    UPDATE "{schema}".categories c
+       SET product_count = s.n
+      FROM (SELECT category_id, count(*) AS n FROM "{schema}".product_categories GROUP BY category_id) s
+     WHERE s.category_id = c.id AND c.product_count IS DISTINCT FROM s.n;
+    """)
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_category_product_count() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        UPDATE "{schema}".categories c SET product_count = c.product_count + d.n
+          FROM (SELECT category_id, count(*) AS n FROM new_rows GROUP BY category_id) d
+         WHERE c.id = d.category_id;
+      ELSIF TG_OP = 'DELETE' THEN
+        UPDATE "{schema}".categories c SET product_count = c.product_count - d.n
+          FROM (SELECT category_id, count(*) AS n FROM old_rows GROUP BY category_id) d
+         WHERE c.id = d.category_id;
+      ELSE
+        UPDATE "{schema}".categories c SET product_count = c.product_count + d.n
+          FROM (
+            SELECT category_id, sum(n) AS n FROM (
+              SELECT category_id, count(*) AS n FROM new_rows GROUP BY category_id
+              UNION ALL
+              SELECT category_id, -count(*) AS n FROM old_rows GROUP BY category_id
+            ) x GROUP BY category_id
+          ) d
+         WHERE c.id = d.category_id AND d.n <> 0;
+      END IF;
+      RETURN NULL;
+    END
+    $$;
+    """)
+    _create_triggers(schema)
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".category_product_counts;')
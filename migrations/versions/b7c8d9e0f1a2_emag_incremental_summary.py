@@ -0,0 +1,158 @@
+# migrations/versions/b7c8d9e0f1a2_emag_incremental_summary.py
+"""Incremental summary tables for mv_emag_stock_summary / mv_emag_best_offer
+
+Revision ID: b7c8d9e0f1a2
+Revises: a6b7c8d9e0f1
+Create Date: 2025-09-17
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "b7c8d9e0f1a2"
+down_revision = "a6b7c8d9e0f1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # Tabele cu exact coloanele MV-urilor (LIKE copiază tipurile, inclusiv country_code).
+    # MV-urile rămân ca fallback (EMAG_SUMMARY_SOURCE=mv) și pentru verificare.
+    for table, mv in (
+        ("emag_stock_summary", "mv_emag_stock_summary"),
+        ("emag_best_offer", "mv_emag_best_offer"),
+    ):
+        op.execute(f'CREATE TABLE IF NOT EXISTS "{schema}".{table} (LIKE "{schema}".{mv}, PRIMARY KEY (offer_id));')
+    op.execute(
+        f'CREATE INDEX IF NOT EXISTS ix_emag_best_offer_acc_country_price '
+        f'ON "{schema}".emag_best_offer (account_id, country, sale_price, product_id);'
+    )
+
+    # Recalculează doar ofertele date: aceleași agregări ca definițiile MV-urilor, limitate
+    # la p_ids; rândurile neschimbate nu sunt rescrise (IS DISTINCT FROM).
+    # Advisory lock per ofertă (ordonat → fără deadlock-uri): două tranzacții care ating
+    # depozite diferite ale aceleiași oferte se serializează, iar a doua recalculează cu un
+    # snapshot nou (READ COMMITTED) care include scrierea primei.
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".emag_summary_apply(p_ids bigint[]) RETURNS void
+    LANGUAGE plpgsql AS $$
+    BEGIN
+      PERFORM pg_advisory_xact_lock(4901, (x.id % 2147483647)::int)
+         FROM (SELECT DISTINCT unnest(p_ids) AS id ORDER BY 1) x;
+
+      DELETE FROM "{schema}".emag_stock_summary t
+       WHERE t.offer_id = ANY(p_ids)
+         AND NOT EXISTS (SELECT 1 FROM "{schema}".emag_offer_stock_by_wh w WHERE w.offer_id = t.offer_id);
+
+      INSERT INTO "{schema}".emag_stock_summary AS t (offer_id, stock_total, reserved_total, last_update)
+      SELECT offer_id, sum(stock), sum(reserved), max(updated_at)
+        FROM "{schema}".emag_offer_stock_by_wh
+       WHERE offer_id = ANY(p_ids)
+       GROUP BY offer_id
+      ON CONFLICT (offer_id) DO UPDATE
+         SET stock_total = EXCLUDED.stock_total,
+             reserved_total = EXCLUDED.reserved_total,
+             last_update = EXCLUDED.last_update
+       WHERE (t.stock_total, t.reserved_total, t.last_update)
+             IS DISTINCT FROM (EXCLUDED.stock_total, EXCLUDED.reserved_total, EXCLUDED.last_update);
+
+      DELETE FROM "{schema}".emag_best_offer t
+       WHERE t.offer_id = ANY(p_ids)
+         AND NOT EXISTS (SELECT 1 FROM "{schema}".emag_offers o WHERE o.id = t.offer_id);
+
+      INSERT INTO "{schema}".emag_best_offer AS t
+             (offer_id, account_id, country, product_id, currency, sale_price, stock_total, as_of)
+      SELECT o.id, o.account_id, o.country, o.product_id, o.currency, o.sale_price,
+             COALESCE(s.stock_total, o.stock_total),
+             GREATEST(o.updated_at, COALESCE(s.last_update, o.updated_at))
+        FROM "{schema}".emag_offers o
+        LEFT JOIN "{schema}".emag_stock_summary s ON s.offer_id = o.id
+       WHERE o.id = ANY(p_ids)
+      ON CONFLICT (offer_id) DO UPDATE
+         SET account_id = EXCLUDED.account_id,
+             country = EXCLUDED.country,
+             product_id = EXCLUDED.product_id,
+             currency = EXCLUDED.currency,
+             sale_price = EXCLUDED.sale_price,
+             stock_total = EXCLUDED.stock_total,
+             as_of = EXCLUDED.as_of
+       WHERE (t.account_id, t.country, t.product_id, t.currency, t.sale_price, t.stock_total, t.as_of)
+             IS DISTINCT FROM
+             (EXCLUDED.account_id, EXCLUDED.country, EXCLUDED.product_id, EXCLUDED.currency,
+              EXCLUDED.sale_price, EXCLUDED.stock_total, EXCLUDED.as_of);
+    END
+    $$;
+    """)
+
+    # Trigger-e la nivel de statement: ofertele atinse se adună din tabelele de tranziție
+    # și se recalculează o singură dată per statement.
+    for table, key in (("emag_offer_stock_by_wh", "offer_id"), ("emag_offers", "id")):
+        fn = f"tg_{table}_summary"
+        op.execute(f"""
+        CREATE OR REPLACE FUNCTION "{schema}".{fn}() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+          v_ids bigint[];
+        BEGIN
+          IF TG_OP = 'INSERT' THEN
+            SELECT array_agg(DISTINCT {key}) INTO v_ids FROM new_rows;
+          ELSIF TG_OP = 'DELETE' THEN
+            SELECT array_agg(DISTINCT {key}) INTO v_ids FROM old_rows;
+          ELSE
+            SELECT array_agg(DISTINCT k) INTO v_ids
+              FROM (SELECT {key} AS k FROM new_rows UNION SELECT {key} FROM old_rows) x;
+          END IF;
+          IF v_ids IS NOT NULL THEN
+            PERFORM "{schema}".emag_summary_apply(v_ids);
+          END IF;
+          RETURN NULL;
+        END
+        $$;
+        """)
+        for op_name, tables in (
+            ("INSERT", "NEW TABLE AS new_rows"),
+            ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+            ("DELETE", "OLD TABLE AS old_rows"),
+        ):
+            tg = f"{fn}_{op_name.lower()[:3]}"
+            op.execute(f'DROP TRIGGER IF EXISTS {tg} ON "{schema}".{table};')
+            op.execute(f"""
+            CREATE TRIGGER {tg}
+              AFTER {op_name} ON "{schema}".{table}
+              REFERENCING {tables}
+              FOR EACH STATEMENT EXECUTE FUNCTION "{schema}".{fn}();
+            """)
+
+    # Populare inițială (același SQL ca la rebuild: app.services.emag_summary)
+    op.execute(f"""
+    INSERT INTO "{schema}".emag_stock_summary (offer_id, stock_total, reserved_total, last_update)
+    SELECT offer_id, sum(stock), sum(reserved), max(updated_at)
+      FROM "{schema}".emag_offer_stock_by_wh
+     GROUP BY offer_id
+    ON CONFLICT (offer_id) DO NOTHING;
+    """)
+    op.execute(f"""
+    INSERT INTO "{schema}".emag_best_offer
+           (offer_id, account_id, country, product_id, currency, sale_price, stock_total, as_of)
+    SELECT o.id, o.account_id, o.country, o.product_id, o.currency, o.sale_price,
+           COALESCE(s.stock_total, o.stock_total),
+           GREATEST(o.updated_at, COALESCE(s.last_update, o.updated_at))
+      FROM "{schema}".emag_offers o
+      LEFT JOIN "{schema}".emag_stock_summary s ON s.offer_id = o.id
+    ON CONFLICT (offer_id) DO NOTHING;
+    """)
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    for table in ("emag_offer_stock_by_wh", "emag_offers"):
+        fn = f"tg_{table}_summary"
+        for suffix in ("ins", "upd", "del"):
+            op.execute(f'DROP TRIGGER IF EXISTS {fn}_{suffix} ON "{schema}".{table};')
+        op.execute(f'DROP FUNCTION IF EXISTS "{schema}".{fn}();')
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".emag_summary_apply(bigint[]);')
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".emag_best_offer;')
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".emag_stock_summary;')
@@ -0,0 +1,73 @@
+# migrations/versions/c2d3e4f5a6b7_products_fulltext.py
+"""Full-text search on products: unaccent configs, generated tsvector + GIN
+
+Revision ID: c2d3e4f5a6b7
+Revises: b1c2d3e4f5a6
+Create Date: 2025-09-12
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "c2d3e4f5a6b7"
+down_revision = "b1c2d3e4f5a6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # unaccent în aceeași schemă ca pg_trgm (dicționarul devine "{schema}".unaccent)
+    op.execute(f'CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA "{schema}";')
+
+    # Configurații proprii: diacriticele se elimină în dicționar → to_tsvector(regconfig, text)
+    # rămâne IMMUTABLE și poate fi folosit într-o coloană generată.
+    #  - ro_unaccent: stemming românesc (name, description)
+    #  - simple_unaccent: fără stemming (SKU-uri, coduri de model)
+    op.execute(f"""
+    DO $$
+    BEGIN
+      IF NOT EXISTS (SELECT 1 FROM pg_ts_config c JOIN pg_namespace n ON n.oid = c.cfgnamespace
+                     WHERE n.nspname = '{schema}' AND c.cfgname = 'ro_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION "{schema}".ro_unaccent (COPY = pg_catalog.romanian);
+        ALTER TEXT SEARCH CONFIGURATION "{schema}".ro_unaccent
+          ALTER MAPPING FOR hword, hword_part, word WITH "{schema}".unaccent, romanian_stem;
+      END IF;
+      IF NOT EXISTS (SELECT 1 FROM pg_ts_config c JOIN pg_namespace n ON n.oid = c.cfgnamespace
+                     WHERE n.nspname = '{schema}' AND c.cfgname = 'simple_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION "{schema}".simple_unaccent (COPY = pg_catalog.simple);
+        ALTER TEXT SEARCH CONFIGURATION "{schema}".simple_unaccent
+          ALTER MAPPING FOR hword, hword_part, word WITH "{schema}".unaccent, simple;
+      END IF;
+    END$$;
+    """)
+
+    # Coloana generată (STORED): DB-ul o ține la zi la INSERT/UPDATE, fără cod în aplicație.
+    # Notă: ADD COLUMN ... GENERATED rescrie tabelul (ACCESS EXCLUSIVE pe durata rescrierii).
+    op.execute(f"""
+    ALTER TABLE "{schema}".products
+      ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('"{schema}".simple_unaccent'::regconfig, coalesce(sku, '')), 'A') ||
+        setweight(to_tsvector('"{schema}".ro_unaccent'::regconfig, coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('"{schema}".simple_unaccent'::regconfig, coalesce(name, '')), 'B') ||
+        setweight(to_tsvector('"{schema}".ro_unaccent'::regconfig, coalesce(description, '')), 'C')
+      ) STORED;
+    """)
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_search_tsv '
+            f'ON "{schema}".products USING gin (search_tsv);'
+        )
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    with op.get_context().autocommit_block():
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{schema}".ix_products_search_tsv;')
+    op.execute(f'ALTER TABLE "{schema}".products DROP COLUMN IF EXISTS search_tsv;')
+    op.execute(f'DROP TEXT SEARCH CONFIGURATION IF EXISTS "{schema}".simple_unaccent;')
+    op.execute(f'DROP TEXT SEARCH CONFIGURATION IF EXISTS "{schema}".ro_unaccent;')
+    # Extensia unaccent rămâne instalată (ca pg_trgm).
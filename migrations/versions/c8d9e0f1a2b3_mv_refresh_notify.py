@@ -0,0 +1,70 @@
+# migrations/versions/c8d9e0f1a2b3_mv_refresh_notify.py
+"""MV dirtiness via NOTIFY from offer/stock writers + mv_refresh_status
+
+Revision ID: c8d9e0f1a2b3
+Revises: b7c8d9e0f1a2
+Create Date: 2025-09-18
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "c8d9e0f1a2b3"
+down_revision = "b7c8d9e0f1a2"
+branch_labels = None
+depends_on = None
+
+CHANNEL = "emag_mv_dirty"
+# tabel sursă → MV-ul marcat „murdar” (dependențele între MV-uri le rezolvă refresher-ul)
+_SOURCES = (
+    ("emag_offer_stock_by_wh", "mv_emag_stock_summary"),
+    ("emag_offers", "mv_emag_best_offer"),
+)
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # Starea publicată de app.services.mv_refresher (citită de /observability/v2/mviews)
+    op.execute(f"""
+    CREATE TABLE IF NOT EXISTS "{schema}".mv_refresh_status (
+      mv              text        PRIMARY KEY,
+      last_refresh_at timestamptz,
+      duration_ms     double precision,
+      concurrent      boolean,
+      refreshes       bigint      NOT NULL DEFAULT 0,
+      failures        bigint      NOT NULL DEFAULT 0,
+      last_error      text,
+      last_error_at   timestamptz,
+      updated_at      timestamptz NOT NULL DEFAULT now()
+    );
+    """)
+
+    # NOTIFY la nivel de statement: un singur mesaj per statement; Postgres comasează
+    # mesajele identice din aceeași tranzacție și le livrează doar la COMMIT.
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_notify_mv_dirty() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+      PERFORM pg_notify('{CHANNEL}', TG_ARGV[0]);
+      RETURN NULL;
+    END
+    $$;
+    """)
+    for table, mv in _SOURCES:
+        tg = f"tg_{table}_mv_dirty"
+        op.execute(f'DROP TRIGGER IF EXISTS {tg} ON "{schema}".{table};')
+        op.execute(f"""
+        CREATE TRIGGER {tg}
+          AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "{schema}".{table}
+          FOR EACH STATEMENT EXECUTE FUNCTION "{schema}".tg_notify_mv_dirty('{mv}');
+        """)
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    for table, _mv in _SOURCES:
+        op.execute(f'DROP TRIGGER IF EXISTS tg_{table}_mv_dirty ON "{schema}".{table};')
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".tg_notify_mv_dirty();')
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".mv_refresh_status;')
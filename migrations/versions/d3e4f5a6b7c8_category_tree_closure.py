@@ -0,0 +1,125 @@
+# migrations/versions/d3e4f5a6b7c8_category_tree_closure.py
+"""Category hierarchy: categories.parent_id + closure table maintained by triggers
+
+Revision ID: d3e4f5a6b7c8
+Revises: c2d3e4f5a6b7
+Create Date: 2025-09-13
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "d3e4f5a6b7c8"
+down_revision = "c2d3e4f5a6b7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # 1) parent_id (ștergerea părintelui → copiii devin rădăcini; trigger-ul refac closure-ul)
+    op.execute(f"""
+    ALTER TABLE "{schema}".categories
+      ADD COLUMN IF NOT EXISTS parent_id integer
+        REFERENCES "{schema}".categories(id) ON DELETE SET NULL;
+    """)
+    op.execute(f'CREATE INDEX IF NOT EXISTS ix_categories_parent_id ON "{schema}".categories (parent_id);')
+
+    # 2) Closure table: o linie pentru fiecare pereche (strămoș, descendent), inclusiv (x, x, 0)
+    op.execute(f"""
+    CREATE TABLE IF NOT EXISTS "{schema}".category_closure (
+      ancestor_id   integer  NOT NULL REFERENCES "{schema}".categories(id) ON DELETE CASCADE,
+      descendant_id integer  NOT NULL REFERENCES "{schema}".categories(id) ON DELETE CASCADE,
+      depth         smallint NOT NULL,
+      PRIMARY KEY (ancestor_id, descendant_id)
+    );
+    """)
+    op.execute(
+        f'CREATE INDEX IF NOT EXISTS ix_category_closure_descendant '
+        f'ON "{schema}".category_closure (descendant_id, ancestor_id);'
+    )
+
+    # 3) Backfill (arborele existent, pornind de la rădăcini)
+    op.execute(f"""
+    INSERT INTO "{schema}".category_closure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE t AS (
+      SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM "{schema}".categories
+      UNION ALL
+      SELECT t.ancestor_id, c.id, t.depth + 1
+        FROM t JOIN "{schema}".categories c ON c.parent_id = t.descendant_id
+    )
+    SELECT ancestor_id, descendant_id, depth FROM t
+    ON CONFLICT DO NOTHING;
+    """)
+
+    # 4) Întreținere: INSERT → căile părintelui + (id, id, 0); mutare → se taie subarborele de
+    #    vechii strămoși și se lipește sub noul părinte. Ciclurile sunt respinse.
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_category_closure() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO "{schema}".category_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, NEW.id, depth + 1
+          FROM "{schema}".category_closure
+         WHERE descendant_id = NEW.parent_id
+        UNION ALL
+        SELECT NEW.id, NEW.id, 0;
+        RETURN NEW;
+      END IF;
+
+      IF NEW.parent_id IS NOT DISTINCT FROM OLD.parent_id THEN
+        RETURN NEW;
+      END IF;
+
+      IF NEW.parent_id IS NOT NULL AND EXISTS (
+           SELECT 1 FROM "{schema}".category_closure
+            WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_id) THEN
+        RAISE EXCEPTION 'category % cannot be moved under its own descendant %', NEW.id, NEW.parent_id
+          USING ERRCODE = 'check_violation';
+      END IF;
+
+      -- desprinde subarborele de vechii strămoși
+      DELETE FROM "{schema}".category_closure cc
+       USING "{schema}".category_closure sub, "{schema}".category_closure anc
+       WHERE sub.ancestor_id = NEW.id
+         AND anc.descendant_id = NEW.id AND anc.ancestor_id <> NEW.id
+         AND cc.descendant_id = sub.descendant_id
+         AND cc.ancestor_id = anc.ancestor_id;
+
+      -- atașează-l sub noul părinte
+      IF NEW.parent_id IS NOT NULL THEN
+        INSERT INTO "{schema}".category_closure (ancestor_id, descendant_id, depth)
+        SELECT p.ancestor_id, sub.descendant_id, p.depth + sub.depth + 1
+          FROM "{schema}".category_closure p
+          JOIN "{schema}".category_closure sub ON sub.ancestor_id = NEW.id
+         WHERE p.descendant_id = NEW.parent_id;
+      END IF;
+      RETURN NEW;
+    END
+    $$;
+    """)
+    op.execute(f'DROP TRIGGER IF EXISTS tg_categories_closure_ins ON "{schema}".categories;')
+    op.execute(f"""
+    CREATE TRIGGER tg_categories_closure_ins
+      AFTER INSERT ON "{schema}".categories
+      FOR EACH ROW EXECUTE FUNCTION "{schema}".tg_category_closure();
+    """)
+    op.execute(f'DROP TRIGGER IF EXISTS tg_categories_closure_move ON "{schema}".categories;')
+    op.execute(f"""
+    CREATE TRIGGER tg_categories_closure_move
+      AFTER UPDATE OF parent_id ON "{schema}".categories
+      FOR EACH ROW EXECUTE FUNCTION "{schema}".tg_category_closure();
+    """)
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(f'DROP TRIGGER IF EXISTS tg_categories_closure_move ON "{schema}".categories;')
+    op.execute(f'DROP TRIGGER IF EXISTS tg_categories_closure_ins ON "{schema}".categories;')
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".tg_category_closure();')
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".category_closure;')
+    op.execute(f'DROP INDEX IF EXISTS "{schema}".ix_categories_parent_id;')
+    op.execute(f'ALTER TABLE "{schema}".categories DROP COLUMN IF EXISTS parent_id;')
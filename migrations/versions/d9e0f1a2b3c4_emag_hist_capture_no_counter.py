@@ -0,0 +1,136 @@
+# migrations/versions/d9e0f1a2b3c4_emag_hist_capture_no_counter.py
+"""Drop the shared emag_hist_capture_stats counter row from the history triggers
+
+Revision ID: d9e0f1a2b3c4
+Revises: c8d9e0f1a2b3
+Create Date: 2025-09-19
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "d9e0f1a2b3c4"
+down_revision = "c8d9e0f1a2b3"
+branch_labels = None
+depends_on = None
+
+# Contorul din a6b7c8d9e0f1 făcea UPSERT pe un singur rând per tip la fiecare statement:
+# lock-ul pe rând ținut până la COMMIT serializa toți scriitorii de preț/stoc, chiar și pe
+# oferte diferite. dedup_ratio se calculează acum din pg_stat_user_tables
+# (/observability/v2/history-capture), fără nicio scriere suplimentară.
+
+
+def _price_fn(schema: str, count: bool) -> str:
+    tail = f"""
+      GET DIAGNOSTICS v_rec = ROW_COUNT;
+      PERFORM "{schema}".emag_hist_capture_count('prices', v_seen, v_rec);""" if count else ""
+    return f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_emag_offers_price_hist() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+      v_seen bigint;
+      v_rec  bigint;
+    BEGIN
+      SELECT count(*) INTO v_seen FROM new_rows;
+      IF v_seen = 0 THEN
+        RETURN NULL;
+      END IF;
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO "{schema}".emag_offer_prices_hist (offer_id, recorded_at, currency, sale_price)
+        SELECT n.id, now(), n.currency, n.sale_price
+          FROM new_rows n
+         WHERE n.currency IS NOT NULL AND n.sale_price IS NOT NULL
+        ON CONFLICT (offer_id, recorded_at) DO UPDATE
+           SET currency = EXCLUDED.currency, sale_price = EXCLUDED.sale_price;
+      ELSE
+        INSERT INTO "{schema}".emag_offer_prices_hist (offer_id, recorded_at, currency, sale_price)
+        SELECT n.id, now(), n.currency, n.sale_price
+          FROM new_rows n
+          JOIN old_rows o ON o.id = n.id
+         WHERE n.currency IS NOT NULL AND n.sale_price IS NOT NULL
+           AND (n.sale_price, n.currency) IS DISTINCT FROM (o.sale_price, o.currency)
+        ON CONFLICT (offer_id, recorded_at) DO UPDATE
+           SET currency = EXCLUDED.currency, sale_price = EXCLUDED.sale_price;
+      END IF;{tail}
+      RETURN NULL;
+    END
+    $$;
+    """
+
+
+def _stock_fn(schema: str, count: bool) -> str:
+    tail = f"""
+      GET DIAGNOSTICS v_rec = ROW_COUNT;
+      PERFORM "{schema}".emag_hist_capture_count('stock', v_seen, v_rec);""" if count else ""
+    return f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_emag_stock_by_wh_hist() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+      v_seen bigint;
+      v_rec  bigint;
+    BEGIN
+      SELECT count(*) INTO v_seen FROM new_rows;
+      IF v_seen = 0 THEN
+        RETURN NULL;
+      END IF;
+      IF TG_OP = 'INSERT' THEN
+        INSERT INTO "{schema}".emag_offer_stock_hist
+               (offer_id, warehouse_code, recorded_at, stock, reserved, incoming)
+        SELECT n.offer_id, n.warehouse_code, now(),
+               greatest(n.stock, 0), greatest(n.reserved, 0), greatest(n.incoming, 0)
+          FROM new_rows n
+        ON CONFLICT (offer_id, warehouse_code, recorded_at) DO UPDATE
+           SET stock = EXCLUDED.stock, reserved = EXCLUDED.reserved, incoming = EXCLUDED.incoming;
+      ELSE
+        INSERT INTO "{schema}".emag_offer_stock_hist
+               (offer_id, warehouse_code, recorded_at, stock, reserved, incoming)
+        SELECT n.offer_id, n.warehouse_code, now(),
+               greatest(n.stock, 0), greatest(n.reserved, 0), greatest(n.incoming, 0)
+          FROM new_rows n
+          -- LEFT JOIN: un UPDATE care schimbă warehouse_code apare ca depozit nou
+          LEFT JOIN old_rows o ON o.offer_id = n.offer_id AND o.warehouse_code = n.warehouse_code
+         WHERE o.offer_id IS NULL
+            OR (n.stock, n.reserved, n.incoming) IS DISTINCT FROM (o.stock, o.reserved, o.incoming)
+        ON CONFLICT (offer_id, warehouse_code, recorded_at) DO UPDATE
+           SET stock = EXCLUDED.stock, reserved = EXCLUDED.reserved, incoming = EXCLUDED.incoming;
+      END IF;{tail}
+      RETURN NULL;
+    END
+    $$;
+    """
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(_price_fn(schema, count=False))
+    op.execute(_stock_fn(schema, count=False))
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".emag_hist_capture_count(text, bigint, bigint);')
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".emag_hist_capture_stats;')
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(f"""
+    CREATE TABLE IF NOT EXISTS "{schema}".emag_hist_capture_stats (
+      kind          text        PRIMARY KEY,
+      statements    bigint      NOT NULL DEFAULT 0,
+      rows_seen     bigint      NOT NULL DEFAULT 0,
+      rows_recorded bigint      NOT NULL DEFAULT 0,
+      updated_at    timestamptz NOT NULL DEFAULT now()
+    );
+    """)
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".emag_hist_capture_count(p_kind text, p_seen bigint, p_recorded bigint)
+    RETURNS void LANGUAGE sql AS $$
+      INSERT INTO "{schema}".emag_hist_capture_stats AS s (kind, statements, rows_seen, rows_recorded, updated_at)
+      VALUES (p_kind, 1, p_seen, p_recorded, now())
+      ON CONFLICT (kind) DO UPDATE
+         SET statements    = s.statements + 1,
+             rows_seen     = s.rows_seen + EXCLUDED.rows_seen,
+             rows_recorded = s.rows_recorded + EXCLUDED.rows_recorded,
+             updated_at    = EXCLUDED.updated_at;
+    $$;
+    """)
+    op.execute(_price_fn(schema, count=True))
+    op.execute(_stock_fn(schema, count=True))
@@ -0,0 +1,99 @@
+# migrations/versions/e0f1a2b3c4d5_emag_summary_lock_buckets.py
+"""Bound the advisory locks taken by emag_summary_apply (bucketed + global for bulk)
+
+Revision ID: e0f1a2b3c4d5
+Revises: d9e0f1a2b3c4
+Create Date: 2025-09-19
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "e0f1a2b3c4d5"
+down_revision = "d9e0f1a2b3c4"
+branch_labels = None
+depends_on = None
+
+# Un advisory lock per ofertă umplea tabela de lock-uri partajată (max_locks_per_transaction ×
+# max_connections) la statement-uri cu mii de oferte: „out of shared memory” la importuri
+# bulk și la emag_summary rebuild. Acum:
+#   - până la _SMALL oferte: lock partajat global (4901, 0) + lock exclusiv pe găleți
+#     (4902, offer_id % _BUCKETS), ordonate → cel mult _BUCKETS lock-uri per tranzacție;
+#   - peste: lock exclusiv global (4901, 0) → statement-urile bulk se serializează cu toți
+#     ceilalți scriitori, cu un singur lock.
+_SMALL = 32
+_BUCKETS = 1024
+
+_LOCK_BUCKETED = f"""      IF cardinality(p_ids) > {_SMALL} THEN
+        PERFORM pg_advisory_xact_lock(4901, 0);
+      ELSE
+        PERFORM pg_advisory_xact_lock_shared(4901, 0);
+        PERFORM pg_advisory_xact_lock(4902, b.bucket)
+           FROM (SELECT DISTINCT (id % {_BUCKETS})::int AS bucket FROM unnest(p_ids) AS id ORDER BY 1) b;
+      END IF;
+"""
+_LOCK_PER_OFFER = """      PERFORM pg_advisory_xact_lock(4901, (x.id % 2147483647)::int)
+         FROM (SELECT DISTINCT unnest(p_ids) AS id ORDER BY 1) x;
+"""
+
+
+def _apply_fn(schema: str, lock: str) -> str:
+    return f"""
+    CREATE OR REPLACE FUNCTION "{schema}".emag_summary_apply(p_ids bigint[]) RETURNS void
+    LANGUAGE plpgsql AS $$
+    BEGIN
+{lock}
+      DELETE FROM "{schema}".emag_stock_summary t
+       WHERE t.offer_id = ANY(p_ids)
+         AND NOT EXISTS (SELECT 1 FROM "{schema}".emag_offer_stock_by_wh w WHERE w.offer_id = t.offer_id);
+
+      INSERT INTO "{schema}".emag_stock_summary AS t (offer_id, stock_total, reserved_total, last_update)
+      SELECT offer_id, sum(stock), sum(reserved), max(updated_at)
+        FROM "{schema}".emag_offer_stock_by_wh
+       WHERE offer_id = ANY(p_ids)
+       GROUP BY offer_id
+      ON CONFLICT (offer_id) DO UPDATE
+         SET stock_total = EXCLUDED.stock_total,
+             reserved_total = EXCLUDED.reserved_total,
+             last_update = EXCLUDED.last_update
+       WHERE (t.stock_total, t.reserved_total, t.last_update)
+             IS DISTINCT FROM (EXCLUDED.stock_total, EXCLUDED.reserved_total, EXCLUDED.last_update);
+
+      DELETE FROM "{schema}".emag_best_offer t
+       WHERE t.offer_id = ANY(p_ids)
+         AND NOT EXISTS (SELECT 1 FROM "{schema}".emag_offers o WHERE o.id = t.offer_id);
+
+      INSERT INTO "{schema}".emag_best_offer AS t
+             (offer_id, account_id, country, product_id, currency, sale_price, stock_total, as_of)
+      SELECT o.id, o.account_id, o.country, o.product_id, o.currency, o.sale_price,
+             COALESCE(s.stock_total, o.stock_total),
+             GREATEST(o.updated_at, COALESCE(s.last_update, o.updated_at))
+        FROM "{schema}".emag_offers o
+        LEFT JOIN "{schema}".emag_stock_summary s ON s.offer_id = o.id
+       WHERE o.id = ANY(p_ids)
+      ON CONFLICT (offer_id) DO UPDATE
+         SET account_id = EXCLUDED.account_id,
+             country = EXCLUDED.country,
+             product_id = EXCLUDED.product_id,
+             currency = EXCLUDED.currency,
+             sale_price = EXCLUDED.sale_price,
+             stock_total = EXCLUDED.stock_total,
+             as_of = EXCLUDED.as_of
+       WHERE (t.account_id, t.country, t.product_id, t.currency, t.sale_price, t.stock_total, t.as_of)
+             IS DISTINCT FROM
+             (EXCLUDED.account_id, EXCLUDED.country, EXCLUDED.product_id, EXCLUDED.currency,
+              EXCLUDED.sale_price, EXCLUDED.stock_total, EXCLUDED.as_of);
+    END
+    $$;
+    """
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(_apply_fn(schema, _LOCK_BUCKETED))
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(_apply_fn(schema, _LOCK_PER_OFFER))
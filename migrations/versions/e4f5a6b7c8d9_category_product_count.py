@@ -0,0 +1,82 @@
+# migrations/versions/e4f5a6b7c8d9_category_product_count.py
+"""categories.product_count maintained by statement-level triggers on product_categories
+
+Revision ID: e4f5a6b7c8d9
+Revises: d3e4f5a6b7c8
+Create Date: 2025-09-14
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "e4f5a6b7c8d9"
+down_revision = "d3e4f5a6b7c8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # Folosit doar cu CATEGORY_COUNTS_SOURCE=column (implicit: agregare la citire)
+    op.execute(
+        f'ALTER TABLE "{schema}".categories ADD COLUMN IF NOT EXISTS product_count integer NOT NULL DEFAULT 0;'
+    )
+    op.execute(f"""
+    UPDATE "{schema}".categories c
+       SET product_count = s.n
+      FROM (SELECT category_id, count(*) AS n FROM "{schema}".product_categories GROUP BY category_id) s
+     WHERE s.category_id = c.id AND c.product_count IS DISTINCT FROM s.n;
+    """)
+
+    # Trigger-e la nivel de statement cu tabele de tranziție: un singur UPDATE agregat per
+    # statement (attach/detach bulk, ștergeri în cascadă), nu unul per rând.
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION "{schema}".tg_category_product_count() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        UPDATE "{schema}".categories c SET product_count = c.product_count + d.n
+          FROM (SELECT category_id, count(*) AS n FROM new_rows GROUP BY category_id) d
+         WHERE c.id = d.category_id;
+      ELSIF TG_OP = 'DELETE' THEN
+        UPDATE "{schema}".categories c SET product_count = c.product_count - d.n
+          FROM (SELECT category_id, count(*) AS n FROM old_rows GROUP BY category_id) d
+         WHERE c.id = d.category_id;
+      ELSE
+        UPDATE "{schema}".categories c SET product_count = c.product_count + d.n
+          FROM (
+            SELECT category_id, sum(n) AS n FROM (
+              SELECT category_id, count(*) AS n FROM new_rows GROUP BY category_id
+              UNION ALL
+              SELECT category_id, -count(*) AS n FROM old_rows GROUP BY category_id
+            ) x GROUP BY category_id
+          ) d
+         WHERE c.id = d.category_id AND d.n <> 0;
+      END IF;
+      RETURN NULL;
+    END
+    $$;
+    """)
+    for op_name, tables in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+    ):
+        tg = f"tg_product_categories_count_{op_name.lower()}"
+        op.execute(f'DROP TRIGGER IF EXISTS {tg} ON "{schema}".product_categories;')
+        op.execute(f"""
+        CREATE TRIGGER {tg}
+          AFTER {op_name} ON "{schema}".product_categories
+          REFERENCING {tables}
+          FOR EACH STATEMENT EXECUTE FUNCTION "{schema}".tg_category_product_count();
+        """)
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    for op_name in ("insert", "delete", "update"):
+        op.execute(f'DROP TRIGGER IF EXISTS tg_product_categories_count_{op_name} ON "{schema}".product_categories;')
+    op.execute(f'DROP FUNCTION IF EXISTS "{schema}".tg_category_product_count();')
+    op.execute(f'ALTER TABLE "{schema}".categories DROP COLUMN IF EXISTS product_count;')
@@ -0,0 +1,96 @@
+# migrations/versions/f1a2b3c4d5e6_emag_summary_row_locks.py
+"""emag_summary_apply: serialize per offer with parent row locks instead of advisory locks
+
+Revision ID: f1a2b3c4d5e6
+Revises: e0f1a2b3c4d5
+Create Date: 2025-09-20
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "f1a2b3c4d5e6"
+down_revision = "e0f1a2b3c4d5"
+branch_labels = None
+depends_on = None
+
+# Varianta cu găleți (e0f1a2b3c4d5) amesteca lock partajat și exclusiv pe aceeași cheie în
+# aceeași tranzacție: un INSERT ... ON CONFLICT DO UPDATE declanșează separat trigger-ele de
+# UPDATE (puține oferte → shared) și de INSERT (multe → exclusive) → două upsert-uri
+# concurente fără oferte comune ajungeau la deadlock.
+# Acum: FOR NO KEY UPDATE pe rândurile emag_offers ale ofertelor atinse, în ordinea id-ului.
+# Lock-urile pe tuple stau în rând (xmax), nu în tabela de lock-uri partajată → fără
+# „out of shared memory” la statement-uri bulk; nu blochează FK-urile (KEY SHARE) din
+# emag_offer_stock_by_wh. Ofertele șterse nu mai au rând de blocat și nici ce recalcula.
+_LOCK_ROWS = """      PERFORM 1 FROM "{schema}".emag_offers WHERE id = ANY(p_ids) ORDER BY id FOR NO KEY UPDATE;
+"""
+_LOCK_BUCKETED = """      IF cardinality(p_ids) > 32 THEN
+        PERFORM pg_advisory_xact_lock(4901, 0);
+      ELSE
+        PERFORM pg_advisory_xact_lock_shared(4901, 0);
+        PERFORM pg_advisory_xact_lock(4902, b.bucket)
+           FROM (SELECT DISTINCT (id % 1024)::int AS bucket FROM unnest(p_ids) AS id ORDER BY 1) b;
+      END IF;
+"""
+
+
+def _apply_fn(schema: str, lock: str) -> str:
+    return f"""
+    CREATE OR REPLACE FUNCTION "{schema}".emag_summary_apply(p_ids bigint[]) RETURNS void
+    LANGUAGE plpgsql AS $$
+    BEGIN
+{lock}
+      DELETE FROM "{schema}".emag_stock_summary t
+       WHERE t.offer_id = ANY(p_ids)
+         AND NOT EXISTS (SELECT 1 FROM "{schema}".emag_offer_stock_by_wh w WHERE w.offer_id = t.offer_id);
+
+      INSERT INTO "{schema}".emag_stock_summary AS t (offer_id, stock_total, reserved_total, last_update)
+      SELECT offer_id, sum(stock), sum(reserved), max(updated_at)
+        FROM "{schema}".emag_offer_stock_by_wh
+       WHERE offer_id = ANY(p_ids)
+       GROUP BY offer_id
+      ON CONFLICT (offer_id) DO UPDATE
+         SET stock_total = EXCLUDED.stock_total,
+             reserved_total = EXCLUDED.reserved_total,
+             last_update = EXCLUDED.last_update
+       WHERE (t.stock_total, t.reserved_total, t.last_update)
+             IS DISTINCT FROM (EXCLUDED.stock_total, EXCLUDED.reserved_total, EXCLUDED.last_update);
+
+      DELETE FROM "{schema}".emag_best_offer t
+       WHERE t.offer_id = ANY(p_ids)
+         AND NOT EXISTS (SELECT 1 FROM "{schema}".emag_offers o WHERE o.id = t.offer_id);
+
+      INSERT INTO "{schema}".emag_best_offer AS t
+             (offer_id, account_id, country, product_id, currency, sale_price, stock_total, as_of)
+      SELECT o.id, o.account_id, o.country, o.product_id, o.currency, o.sale_price,
+             COALESCE(s.stock_total, o.stock_total),
+             GREATEST(o.updated_at, COALESCE(s.last_update, o.updated_at))
+        FROM "{schema}".emag_offers o
+        LEFT JOIN "{schema}".emag_stock_summary s ON s.offer_id = o.id
+       WHERE o.id = ANY(p_ids)
+      ON CONFLICT (offer_id) DO UPDATE
+         SET account_id = EXCLUDED.account_id,
+             country = EXCLUDED.country,
+             product_id = EXCLUDED.product_id,
+             currency = EXCLUDED.currency,
+             sale_price = EXCLUDED.sale_price,
+             stock_total = EXCLUDED.stock_total,
+             as_of = EXCLUDED.as_of
+       WHERE (t.account_id, t.country, t.product_id, t.currency, t.sale_price, t.stock_total, t.as_of)
+             IS DISTINCT FROM
+             (EXCLUDED.account_id, EXCLUDED.country, EXCLUDED.product_id, EXCLUDED.currency,
+              EXCLUDED.sale_price, EXCLUDED.stock_total, EXCLUDED.as_of);
+    END
+    $$;
+    """
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(_apply_fn(schema, _LOCK_ROWS.format(schema=schema)))
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(_apply_fn(schema, _LOCK_BUCKETED))
@@ -0,0 +1,45 @@
+# migrations/versions/f5a6b7c8d9e0_query_plans.py
+"""query_plans: EXPLAIN plans captured for slow application queries
+
+Revision ID: f5a6b7c8d9e0
+Revises: e4f5a6b7c8d9
+Create Date: 2025-09-15
+"""
+from __future__ import annotations
+
+import os
+from alembic import op
+
+revision = "f5a6b7c8d9e0"
+down_revision = "e4f5a6b7c8d9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+
+    # O linie per (interogare, rută); captura nouă o suprascrie pe cea veche.
+    # Dimensiunea e ținută sub QUERY_PLAN_MAX_ROWS de aplicație (ștergere după captured_at).
+    op.execute(f"""
+    CREATE TABLE IF NOT EXISTS "{schema}".query_plans (
+      id          bigserial PRIMARY KEY,
+      fingerprint text        NOT NULL,
+      route       text        NOT NULL,
+      queryid     bigint,
+      query       text        NOT NULL,
+      duration_ms double precision NOT NULL,
+      analyzed    boolean     NOT NULL DEFAULT false,
+      plan        jsonb       NOT NULL,
+      captures    integer     NOT NULL DEFAULT 1,
+      captured_at timestamptz NOT NULL DEFAULT now(),
+      CONSTRAINT uq_query_plans_fingerprint_route UNIQUE (fingerprint, route)
+    );
+    """)
+    op.execute(f'CREATE INDEX IF NOT EXISTS ix_query_plans_captured_at ON "{schema}".query_plans (captured_at DESC);')
+    op.execute(f'CREATE INDEX IF NOT EXISTS ix_query_plans_queryid ON "{schema}".query_plans (queryid);')
+
+
+def downgrade() -> None:
+    schema = op.get_context().version_table_schema or os.getenv("DB_SCHEMA", "app")
+    op.execute(f'DROP TABLE IF EXISTS "{schema}".query_plans;')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# scripts/bench_bulk_products.py
+"""
+Compară calea single-row (POST /products + PUT /products/{id}) cu /products/bulk
+(POST = upsert, PATCH = patch) pe același număr de produse.
+
+Raportează timpul total, produse/s și numărul de request-uri HTTP pentru fiecare variantă.
+Produsele create sunt șterse la final (DELETE /products/{id}).
+
+Exemplu:
+  BASE_URL=http://127.0.0.1:8001 python scripts/bench_bulk_products.py --count 2000 --batch 500
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import uuid
+from typing import Callable, Dict, List
+
+import httpx
+
+
+def _items(prefix: str, n: int, price: str) -> List[Dict[str, str]]:
+    return [{"name": f"Bench {prefix} {i}", "price": price, "sku": f"{prefix}-{i}"} for i in range(n)]
+
+
+def _timed(label: str, n: int, fn: Callable[[], int]) -> None:
+    t0 = time.perf_counter()
+    requests = fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<22} n={n:<6} {dt:8.2f}s  {n / dt:9.1f} produse/s  requests={requests}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base-url", default=os.getenv("BASE_URL", "http://127.0.0.1:8001"))
+    ap.add_argument("--count", type=int, default=1000)
+    ap.add_argument("--batch", type=int, default=500, help="elemente per request bulk")
+    args = ap.parse_args()
+
+    run = uuid.uuid4().hex[:6].upper()
+    single, bulk = _items(f"BS-{run}", args.count, "10.00"), _items(f"BB-{run}", args.count, "10.00")
+    ids: List[int] = []
+
+    with httpx.Client(base_url=args.base_url, timeout=60) as c:
+        def single_create() -> int:
+            for it in single:
+                r = c.post("/products", json=it)
+                r.raise_for_status()
+                ids.append(r.json()["id"])
+            return len(single)
+
+        def single_update() -> int:
+            for pid, it in zip(ids[: len(single)], single):
+                c.put(f"/products/{pid}", json={"price": "12.00"}).raise_for_status()
+            return len(single)
+
+        def bulk_call(method: str, items: List[Dict[str, str]]) -> Callable[[], int]:
+            def _run() -> int:
+                n = 0
+                for i in range(0, len(items), args.batch):
+                    r = c.request(method, "/products/bulk", json={"items": items[i : i + args.batch]})
+                    r.raise_for_status()
+                    if method == "POST":
+                        ids.extend(o["id"] for o in r.json()["items"] if o.get("id"))
+                    n += 1
+                return n
+            return _run
+
+        try:
+            _timed("single POST", args.count, single_create)
+            _timed("single PUT", args.count, single_update)
+            _timed("bulk POST (upsert)", args.count, bulk_call("POST", bulk))
+            _timed(
+                "bulk PATCH",
+                args.count,
+                bulk_call("PATCH", [{"sku": it["sku"], "price": "12.00"} for it in bulk]),
+            )
+            # aceleași valori ca după PATCH → unchanged (fără UPDATE efectiv)
+            same = [{**it, "price": "12.00"} for it in bulk]
+            _timed("bulk POST (unchanged)", args.count, bulk_call("POST", same))
+        finally:
+            for pid in set(ids):
+                try:
+                    c.delete(f"/products/{pid}")
+                except Exception:
+                    pass
+
+
+if __name__ == "__main__":
+    main()
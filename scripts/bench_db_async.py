@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# scripts/bench_db_async.py
+"""
+Benchmark: engine sync (threadpool) vs engine async (event loop) la concurență mare.
+
+Rulează aceeași interogare de listare (crud.list_products / crud.alist_products)
+de N ori, cu C „request-uri” simultane:
+  - sync:  ThreadPoolExecutor(max_workers=THREADS) – echivalentul threadpool-ului Starlette (40 implicit)
+  - async: asyncio.gather sub un semafor de C
+
+Exemplu (în containerul app):
+  python scripts/bench_db_async.py --requests 5000 --concurrency 200
+  python scripts/bench_db_async.py --mode http --base-url http://localhost:8001 --concurrency 200
+
+Notă: ambele variante sunt limitate de pool (DB_POOL_SIZE + DB_MAX_OVERFLOW);
+diferența măsurată e overhead-ul threadpool vs event loop la aceeași capacitate de pool.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def _report(label: str, lat: List[float], wall: float) -> None:
+    lat_ms = sorted(x * 1000 for x in lat)
+    p = lambda q: lat_ms[min(len(lat_ms) - 1, int(q * len(lat_ms)))]  # noqa: E731
+    print(
+        f"{label:<6} n={len(lat_ms):>6}  rps={len(lat_ms) / wall:>9.1f}  "
+        f"p50={p(0.50):>7.2f}ms  p95={p(0.95):>7.2f}ms  p99={p(0.99):>7.2f}ms  "
+        f"mean={statistics.fmean(lat_ms):>7.2f}ms"
+    )
+
+
+def bench_sync(n: int, threads: int, page_size: int) -> None:
+    from app.database import SessionLocal
+    from app.crud import product as crud
+
+    def one() -> float:
+        t0 = time.perf_counter()
+        with SessionLocal() as db:
+            crud.list_products(db, page=1, page_size=page_size)
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        lat = list(ex.map(lambda _: one(), range(n)))
+    _report("sync", lat, time.perf_counter() - t0)
+
+
+async def bench_async(n: int, concurrency: int, page_size: int) -> None:
+    from app.database import AsyncSessionLocal, dispose_async_engine
+    from app.crud import product as crud
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with sem:
+            t0 = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                await crud.alist_products(db, page=1, page_size=page_size)
+            return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    lat = await asyncio.gather(*(one() for _ in range(n)))
+    _report("async", list(lat), time.perf_counter() - t0)
+    await dispose_async_engine()
+
+
+async def bench_http(base_url: str, path: str, n: int, concurrency: int) -> None:
+    import httpx
+
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def one() -> float:
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.get(path)
+                r.raise_for_status()
+                return time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        lat = await asyncio.gather(*(one() for _ in range(n)))
+        _report("http", list(lat), time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mode", choices=["db", "http"], default="db")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--threads", type=int, default=40, help="dimensiunea threadpool-ului pentru varianta sync")
+    ap.add_argument("--page-size", type=int, default=50)
+    ap.add_argument("--base-url", default=os.getenv("BASE_URL", "http://localhost:8001"))
+    ap.add_argument("--path", default="/products?page_size=50")
+    args = ap.parse_args()
+
+    if args.mode == "http":
+        asyncio.run(bench_http(args.base_url, args.path, args.requests, args.concurrency))
+        return
+
+    bench_sync(args.requests, args.threads, args.page_size)
+    asyncio.run(bench_async(args.requests, args.concurrency, args.page_size))
+
+
+if __name__ == "__main__":
+    main()
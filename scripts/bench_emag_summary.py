@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# scripts/bench_emag_summary.py
+"""
+Costul menținerii sumarelor eMAG în funcție de numărul de rânduri schimbate:
+incremental (trigger-e + emag_summary_apply) vs. REFRESH MATERIALIZED VIEW CONCURRENTLY.
+
+Pentru fiecare N din --changed, într-o singură tranzacție (rollback la final → datele rămân
+neatinse):
+  0) același UPDATE fără trigger-e (session_replication_role=replica, tranzacție separată;
+     necesită drepturi de superuser, altfel coloana e „-”);
+  1) UPDATE pe N rânduri din emag_offer_stock_by_wh (include trigger-ele de istoric, sumar
+     și NOTIFY; diferența față de 0) = costul menținerii incrementale);
+  2) emag_summary_apply pe ofertele atinse, a doua oară (recalcul fără scrieri);
+  3) REFRESH ... CONCURRENTLY pentru ambele MV-uri (vede modificările necomise ale tranzacției).
+
+Trigger-ele de sumar există doar în modul incremental – pe o bază în modul mv rulați întâi
+`python -m app.services.emag_summary enable` (și `disable` după).
+
+Exemplu (în containerul app, pe o bază cu date):
+  python scripts/bench_emag_summary.py --changed 1,10,100,1000,10000
+
+--check-concurrency R: regresie pentru lock-urile din emag_summary_apply – R runde cu două
+upsert-uri concurente în emag_offers (câte 5 oferte existente + 100 noi, fără oferte comune,
+rollback la final); ieșire cu cod 1 la deadlock sau altă eroare.
+
+Referință (PG16, 1 vCPU, 100k oferte / 300k rânduri de stoc, mediana din 3, după VACUUM):
+        N     update   update+trg      apply   refresh MVs   refresh/incr
+        1      1.1ms        2.9ms      1.6ms      2054.2ms        1122.1x
+       10      1.5ms        4.5ms      1.7ms      2089.7ms         693.5x
+      100      4.3ms       15.7ms      4.4ms      2119.6ms         186.9x
+     1000     23.1ms      110.8ms     40.8ms      2140.3ms          24.4x
+    10000    336.9ms     1095.7ms    315.3ms      2382.6ms           3.1x
+    30000    717.5ms     2673.5ms    715.2ms      3701.9ms           1.9x
+   100000   2403.7ms     7447.4ms   2274.4ms      4000.8ms           0.8x
+Incrementalul câștigă până la ~1/3 din rânduri schimbate într-un singur statement; peste,
+un REFRESH complet e mai ieftin (update+trg include și trigger-ele de istoric).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import text  # noqa: E402
+
+
+_UPDATE_SQL = """
+    UPDATE "{s}".emag_offer_stock_by_wh w SET stock = w.stock + 1
+      FROM unnest(CAST(:oids AS bigint[]), CAST(:whs AS text[])) AS pick(offer_id, warehouse_code)
+     WHERE w.offer_id = pick.offer_id AND w.warehouse_code = pick.warehouse_code
+    RETURNING w.offer_id
+"""
+
+
+def _ms(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+def _plain_update_ms(engine, s: str, oids: List[int], whs: List[str]) -> Optional[float]:
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.execute(text("SET LOCAL session_replication_role = replica"))
+        except Exception:
+            trans.rollback()
+            return None
+        try:
+            t0 = time.perf_counter()
+            conn.execute(text(_UPDATE_SQL.format(s=s)), {"oids": oids, "whs": whs})
+            return _ms(t0)
+        finally:
+            trans.rollback()
+
+
+_UPSERT_SQL = """
+    INSERT INTO "{s}".emag_offers AS e (account_id, country, product_id, currency, sale_price)
+    SELECT a, c::"{s}".country_code, p, 'RON', 1
+      FROM unnest(CAST(:acc AS smallint[]), CAST(:cty AS text[]), CAST(:pid AS bigint[])) AS x(a, c, p)
+    ON CONFLICT (account_id, country, product_id) DO UPDATE SET sale_price = e.sale_price + 1
+"""
+
+
+def check_concurrency(engine, s: str, rounds: int) -> bool:
+    """
+    Două tranzacții care fac simultan INSERT ... ON CONFLICT DO UPDATE (deci atât trigger-ele
+    de UPDATE cât și cele de INSERT) pe oferte disjuncte nu trebuie să se blocheze reciproc.
+    """
+    with engine.connect() as conn:
+        existing = conn.execute(text(
+            f'SELECT account_id, country::text, product_id FROM "{s}".emag_offers ORDER BY id LIMIT 10'
+        )).all()
+        conn.rollback()
+    if len(existing) < 10:
+        print("check-concurrency: sunt necesare cel puțin 10 oferte existente")
+        return False
+
+    ok = True
+    for r in range(rounds):
+        barrier = threading.Barrier(2)
+        results: List[str] = []
+
+        def worker(rows) -> None:
+            with engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    tag = uuid.uuid4().hex[:8].upper()
+                    new_pids = conn.execute(text(f"""
+                        INSERT INTO "{s}".products (name, sku)
+                        SELECT 'bench ' || g, 'BENCH-CC-{tag}-' || g FROM generate_series(1, 100) g
+                        RETURNING id
+                    """)).scalars().all()
+                    acc, cty = rows[0][0], rows[0][1]
+                    rows = list(rows) + [(acc, cty, pid) for pid in new_pids]
+                    barrier.wait(timeout=30)
+                    conn.execute(
+                        text(_UPSERT_SQL.format(s=s)),
+                        {"acc": [x[0] for x in rows], "cty": [x[1] for x in rows], "pid": [x[2] for x in rows]},
+                    )
+                    time.sleep(0.2)  # ținem lock-urile cât timp cealaltă tranzacție lucrează
+                    results.append("ok")
+                except Exception as e:
+                    results.append(type(getattr(e, "orig", e)).__name__)
+                finally:
+                    trans.rollback()
+
+        threads = [threading.Thread(target=worker, args=(existing[i * 5:(i + 1) * 5],)) for i in (0, 1)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        print(f"check-concurrency runda {r + 1}: {', '.join(results)}")
+        ok = ok and results == ["ok", "ok"]
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--changed", default="1,10,100,1000,10000", help="numere de rânduri schimbate")
+    ap.add_argument("--repeat", type=int, default=3, help="repetări per N (se raportează mediana)")
+    ap.add_argument("--check-concurrency", type=int, default=0, metavar="R",
+                    help="doar regresia de lock-uri: R runde de upsert-uri concurente")
+    args = ap.parse_args()
+
+    from app.database import DEFAULT_SCHEMA, engine
+
+    s = DEFAULT_SCHEMA
+    if args.check_concurrency:
+        sys.exit(0 if check_concurrency(engine, s, args.check_concurrency) else 1)
+    sizes = [int(x) for x in args.changed.split(",") if x.strip()]
+    with engine.connect() as conn:
+        total = conn.execute(text(f'SELECT count(*) FROM "{s}".emag_offer_stock_by_wh')).scalar() or 0
+        offers = conn.execute(text(f'SELECT count(*) FROM "{s}".emag_offers')).scalar() or 0
+        conn.rollback()
+    print(f"emag_offer_stock_by_wh={total} rânduri, emag_offers={offers}")
+    if not total:
+        sys.exit("nu există rânduri în emag_offer_stock_by_wh")
+
+    print(f"{'N':>7}  {'update':>9}  {'update+trg':>11}  {'apply':>9}  {'refresh MVs':>12}  {'refresh/incr':>13}")
+    for n in sizes:
+        plain: List[float] = []
+        upd: List[float] = []
+        apply_ms: List[float] = []
+        mv: List[float] = []
+        for _ in range(args.repeat):
+            with engine.connect() as conn:
+                trans = conn.begin()
+                try:
+                    # alegerea rândurilor (scan complet pentru random()) nu intră în măsurătoare
+                    pick = conn.execute(text(f"""
+                        SELECT array_agg(offer_id), array_agg(warehouse_code) FROM (
+                          SELECT offer_id, warehouse_code FROM "{s}".emag_offer_stock_by_wh
+                           ORDER BY random() LIMIT :n
+                        ) p
+                    """), {"n": n}).one()
+
+                    ms = _plain_update_ms(engine, s, pick[0], pick[1])
+                    if ms is not None:
+                        plain.append(ms)
+
+                    t0 = time.perf_counter()
+                    ids = conn.execute(
+                        text(_UPDATE_SQL.format(s=s)), {"oids": pick[0], "whs": pick[1]}
+                    ).scalars().all()
+                    upd.append(_ms(t0))
+
+                    t0 = time.perf_counter()
+                    conn.execute(
+                        text(f'SELECT "{s}".emag_summary_apply(CAST(:ids AS bigint[]))'),
+                        {"ids": sorted(set(ids))},
+                    )
+                    apply_ms.append(_ms(t0))
+
+                    t0 = time.perf_counter()
+                    for name in ("mv_emag_stock_summary", "mv_emag_best_offer"):
+                        conn.execute(text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY "{s}".{name}'))
+                    mv.append(_ms(t0))
+                finally:
+                    trans.rollback()
+
+        med = lambda xs: sorted(xs)[len(xs) // 2]  # noqa: E731
+        # costul incremental: overhead-ul trigger-elor dacă avem baza fără trigger-e, altfel apply
+        incr = med(upd) - med(plain) if plain else med(apply_ms)
+        ratio = med(mv) / incr if incr > 0 else float("inf")
+        base = f"{med(plain):>7.1f}ms" if plain else f"{'-':>9}"
+        print(f"{n:>7}  {base}  {med(upd):>9.1f}ms  {med(apply_ms):>7.1f}ms  {med(mv):>10.1f}ms  {ratio:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -48,4 +48,10 @@ jq -e '
 ' < <(curl -fsS "$BASE/top-queries?exclude_self=false&search=pg_stat_statements&limit=100&order_by=calls&order_dir=desc") >/dev/null
 echo "✓ include self on demand"
 
+# 8) planuri capturate (lista poate fi goală dacă QUERY_PLAN_CAPTURE=0)
+jq -e '
+  (.capture.enabled|type=="boolean") and (.items|type=="array") and ([.items[] | .plan == null] | all)
+' < <(curl -fsS "$BASE/plans?include_plan=false&order_by=duration_ms") >/dev/null
+echo "✓ plans"
+
 echo "All checks passed ✓"
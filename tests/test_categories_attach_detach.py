@@ -141,3 +141,31 @@ def test_attach_detach_idempotent(client: httpx.Client):
     # nu mai apare în listare după detach
     items_after = list_products_for_category(client, cid)
     assert all(p.get("id") != pid for p in items_after), items_after
+
+
+@pytest.mark.timeout(15)
+def test_bulk_attach_detach_counts(client: httpx.Client):
+    cat = create_category(client)
+    prods = [create_product(client) for _ in range(3)]
+    cid, pids = cat["id"], [p["id"] for p in prods]
+    missing_pid = max(pids) + 1_000_000
+
+    # un produs deja atașat → unchanged; un id inexistent → invalid
+    attach_product(client, cid, pids[0])
+    r = client.post(f"/categories/{cid}/products/attach", json={"product_ids": pids + [missing_pid]})
+    _assert_status(r, 200)
+    j = r.json()
+    assert (j["requested"], j["attached"], j["unchanged"], j["invalid"]) == (4, 2, 1, 1), j
+    assert j["invalid_pairs"] == [{"product_id": missing_pid, "category_id": cid}], j
+
+    ids = [p["id"] for p in list_products_for_category(client, cid)]
+    assert sorted(ids) == sorted(pids), ids
+
+    pairs = [{"product_id": pid, "category_id": cid} for pid in pids[:2]]
+    r = client.post("/categories/products/detach", json={"pairs": pairs + pairs})
+    _assert_status(r, 200)
+    j = r.json()
+    assert (j["requested"], j["detached"], j["unchanged"], j["invalid"]) == (2, 2, 0, 0), j
+
+    ids = [p["id"] for p in list_products_for_category(client, cid)]
+    assert ids == [pids[2]], ids
@@ -0,0 +1,83 @@
+# tests/test_category_tree.py
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:8001")
+REQ_TIMEOUT = float(os.getenv("TEST_HTTP_TIMEOUT", "5"))
+HEALTH_PATH = os.getenv("TEST_HEALTH_PATH", "/health")
+RETRY_ATTEMPTS = int(os.getenv("TEST_HEALTH_RETRIES", "10"))
+RETRY_SLEEP = float(os.getenv("TEST_HEALTH_SLEEP", "0.5"))
+
+
+def _wait_until_healthy(c: httpx.Client):
+    for _ in range(RETRY_ATTEMPTS):
+        try:
+            if c.get(HEALTH_PATH).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(RETRY_SLEEP)
+    pytest.fail(f"API at {BASE_URL} not healthy after {RETRY_ATTEMPTS} attempts")
+
+
+@pytest.fixture(scope="session")
+def client() -> httpx.Client:
+    with httpx.Client(base_url=BASE_URL, timeout=REQ_TIMEOUT) as c:
+        _wait_until_healthy(c)
+        yield c
+
+
+def _create(c: httpx.Client, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    r = c.post(path, json=payload)
+    assert r.status_code == 201, r.text
+    return r.json()
+
+
+@pytest.mark.timeout(15)
+def test_subtree_filter_and_cycle_guard(client: httpx.Client):
+    tag = uuid.uuid4().hex[:6]
+    cats: List[int] = []
+    prods: List[int] = []
+    try:
+        root = _create(client, "/categories", {"name": f"PyTest Root {tag}"})
+        cats.append(root["id"])
+        child = _create(client, "/categories", {"name": f"PyTest Child {tag}", "parent_id": root["id"]})
+        cats.append(child["id"])
+        leaf = _create(client, "/categories", {"name": f"PyTest Leaf {tag}", "parent_id": child["id"]})
+        cats.append(leaf["id"])
+        assert leaf["parent_id"] == child["id"]
+
+        p = _create(client, "/products", {"name": f"PyTest Tree {tag}", "price": "1.00"})
+        prods.append(p["id"])
+        assert client.post(f"/categories/{leaf['id']}/products/{p['id']}").status_code == 204
+
+        # fără descendenți: produsul nu e direct în root
+        j = client.get("/products", params={"category_id": root["id"]}).json()
+        assert p["id"] not in [it["id"] for it in j["items"]]
+        j = client.get("/products", params={"category_id": root["id"], "include_descendants": True}).json()
+        assert [it["id"] for it in j["items"]] == [p["id"]]
+
+        sub = client.get(f"/categories/{root['id']}/descendants").json()
+        assert [(n["id"], n["depth"]) for n in sub] == [(root["id"], 0), (child["id"], 1), (leaf["id"], 2)]
+
+        # root sub propriul descendent → respins
+        r = client.put(f"/categories/{root['id']}", json={"parent_id": leaf["id"]})
+        assert r.status_code == 400, r.text
+
+        # mutare leaf la rădăcină → nu mai apare sub root
+        r = client.put(f"/categories/{leaf['id']}", json={"parent_id": None})
+        assert r.status_code == 200, r.text
+        j = client.get("/products", params={"category_id": root["id"], "include_descendants": True}).json()
+        assert j["items"] == []
+    finally:
+        for pid in prods:
+            client.delete(f"/products/{pid}")
+        for cid in reversed(cats):
+            client.delete(f"/categories/{cid}")
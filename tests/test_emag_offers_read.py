@@ -30,3 +30,10 @@ def test_openapi_has_params():
     params = [p["name"] for p in schema["paths"]["/integrations/emag/product_offer/read"]["post"]["parameters"]]
     for expected in ["format", "filename", "account", "country", "compact", "fields", "sort"]:
         assert expected in params
+
+def test_max_items_beyond_page_cap_is_rejected():
+    # limit=5 → 1000 oferte ar cere 200 pagini upstream, peste EMAG_OFFERS_AGG_MAX_PAGES
+    q = "?account=fbe&country=ro"
+    r = httpx.post(f"{BASE}/integrations/emag/product_offer/read{q}", json={"page": 1, "limit": 5, "max_items": 1000})
+    assert r.status_code == 422
+    assert "max_items" in r.json()["detail"]
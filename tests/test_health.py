@@ -123,3 +123,16 @@ def test_migrations_endpoint(client: httpx.Client):
 
     if EXPECT_MIGRATIONS:
         assert body["present"] is True, f"migrations expected to be present, got: {body!r}"
+
+
+@pytest.mark.timeout(5)
+def test_server_timing_reports_db_queries(client: httpx.Client):
+    r = client.get("/products", params={"limit": 1})
+    assert r.status_code == 200, _dump_response(r)
+    st = r.headers.get("server-timing", "")
+    entries = {e.strip().split(";", 1)[0]: e.strip() for e in st.split(",") if e.strip()}
+    for name in ("app", "db", "emag", "ser"):
+        assert name in entries, f"Server-Timing fără '{name}': {st!r}"
+    # listarea face cel puțin o interogare (pagina)
+    n = int(entries["db"].split('desc="', 1)[1].split(" ", 1)[0])
+    assert n >= 1, st
@@ -0,0 +1,111 @@
+# tests/test_products_bulk.py
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+BASE_URL = os.getenv("BASE_URL", "http://127.0.0.1:8001")
+REQ_TIMEOUT = float(os.getenv("TEST_HTTP_TIMEOUT", "10"))
+HEALTH_PATH = os.getenv("TEST_HEALTH_PATH", "/health")
+RETRY_ATTEMPTS = int(os.getenv("TEST_HEALTH_RETRIES", "10"))
+RETRY_SLEEP = float(os.getenv("TEST_HEALTH_SLEEP", "0.5"))
+
+
+def _wait_until_healthy(c: httpx.Client):
+    for _ in range(RETRY_ATTEMPTS):
+        try:
+            if c.get(HEALTH_PATH).status_code == 200:
+                return
+        except Exception:
+            pass
+        time.sleep(RETRY_SLEEP)
+    pytest.fail(f"API at {BASE_URL} not healthy after {RETRY_ATTEMPTS} attempts")
+
+
+@pytest.fixture(scope="session")
+def client() -> httpx.Client:
+    with httpx.Client(base_url=BASE_URL, timeout=REQ_TIMEOUT) as c:
+        _wait_until_healthy(c)
+        yield c
+
+
+def _statuses(j: Dict[str, Any]) -> List[str]:
+    return [o["status"] for o in j["items"]]
+
+
+def _cleanup(c: httpx.Client, j: Dict[str, Any]) -> None:
+    for o in j["items"]:
+        if o.get("id"):
+            try:
+                c.delete(f"/products/{o['id']}")
+            except Exception:
+                pass
+
+
+@pytest.mark.timeout(15)
+def test_bulk_upsert_then_patch(client: httpx.Client):
+    p = f"PYT-BULK-{uuid.uuid4().hex[:6].upper()}"
+    items = [{"name": f"Bulk {i}", "price": "10.00", "sku": f"{p}-{i}"} for i in range(3)]
+
+    r = client.post("/products/bulk", json={"items": items})
+    assert r.status_code == 200, r.text
+    first = r.json()
+    try:
+        assert _statuses(first) == ["created"] * 3
+        assert first["summary"] == {"created": 3}
+
+        # re-trimitere: același conținut → unchanged; preț diferit → updated; SKU repetat → duplicate
+        again = [items[0], {**items[1], "price": "11.50"}, items[2], items[2]]
+        j = client.post("/products/bulk", json={"items": again}).json()
+        assert _statuses(j) == ["unchanged", "updated", "duplicate", "unchanged"]
+        assert j["items"][1]["id"] == first["items"][1]["id"]
+
+        # patch: doar câmpurile trimise; SKU necunoscut → not_found
+        patch = [
+            {"sku": f"{p}-0", "price": "9.99"},
+            {"sku": f"{p}-1", "price": "11.50"},
+            {"sku": f"{p}-missing", "name": "x"},
+        ]
+        j = client.patch("/products/bulk", json={"items": patch}).json()
+        assert _statuses(j) == ["updated", "unchanged", "not_found"]
+
+        prod = client.get(f"/products/by-sku/{p}-0").json()
+        assert prod["price"] in ("9.99", 9.99) and prod["name"] == "Bulk 0"
+    finally:
+        _cleanup(client, first)
+
+
+@pytest.mark.timeout(15)
+def test_bulk_patch_single_field(client: httpx.Client):
+    # batch-uri fără niciun preț: coloanele VALUES netrimise trebuie să rămână tipate
+    p = f"PYT-BULKP-{uuid.uuid4().hex[:6].upper()}"
+    items = [{"name": f"Bulk {i}", "description": "d", "price": "5.00", "sku": f"{p}-{i}"} for i in range(2)]
+    first = client.post("/products/bulk", json={"items": items}).json()
+    try:
+        r = client.patch("/products/bulk", json={"items": [{"sku": f"{p}-0", "name": "doar nume"}]})
+        assert r.status_code == 200, r.text
+        assert _statuses(r.json()) == ["updated"]
+
+        r = client.patch("/products/bulk", json={"items": [{"sku": f"{p}-1", "description": "doar descriere"}]})
+        assert r.status_code == 200, r.text
+        assert _statuses(r.json()) == ["updated"]
+
+        p0 = client.get(f"/products/by-sku/{p}-0").json()
+        p1 = client.get(f"/products/by-sku/{p}-1").json()
+        assert p0["name"] == "doar nume" and p0["price"] in ("5.00", 5.0)
+        assert p1["description"] == "doar descriere" and p1["name"] == "Bulk 1"
+    finally:
+        _cleanup(client, first)
+
+
+@pytest.mark.timeout(10)
+def test_bulk_requires_sku(client: httpx.Client):
+    r = client.post("/products/bulk", json={"items": [{"name": "fara sku", "price": "1.00"}]})
+    assert r.status_code == 422
+    r = client.post("/products/bulk", json={"items": []})
+    assert r.status_code == 422